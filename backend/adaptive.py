@@ -0,0 +1,161 @@
+"""
+Load-adaptive YOLO inference tiers.
+
+Tiers are ordered from most to least accurate, e.g. yolov8s at 640 px, then yolov8n at
+640, 480 and 320 px. The controller watches how many YOLO calls are in flight and the
+p95 of recent inference latency: it steps one tier down when p95 breaks the latency SLO
+or the queue is too deep, and one tier back up once p95 has fallen well below the SLO
+and the queue has drained. A cooldown after every change keeps it from flapping.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from detect import YOLO_IMGSZ, YOLO_MODEL
+from metrics import counter, gauge
+
+ADAPTIVE_INFERENCE = os.getenv("ADAPTIVE_INFERENCE", "true").lower() == "true"
+# Comma-separated model@imgsz tiers, most accurate first
+ADAPTIVE_TIERS = os.getenv("ADAPTIVE_TIERS", "")
+# Target p95 of YOLO inference latency; the controller steps down when it is exceeded
+ADAPTIVE_LATENCY_SLO_MS = float(os.getenv("ADAPTIVE_LATENCY_SLO_MS", "250"))
+# Step back up once p95 is below this fraction of the SLO
+ADAPTIVE_RECOVER_RATIO = float(os.getenv("ADAPTIVE_RECOVER_RATIO", "0.5"))
+# YOLO calls in flight plus calls queued for a slot above which the controller steps down regardless of latency
+ADAPTIVE_MAX_QUEUE = int(os.getenv("ADAPTIVE_MAX_QUEUE", "16"))
+ADAPTIVE_WINDOW = int(os.getenv("ADAPTIVE_WINDOW", "50"))
+ADAPTIVE_MIN_SAMPLES = int(os.getenv("ADAPTIVE_MIN_SAMPLES", "10"))
+ADAPTIVE_COOLDOWN_SECONDS = float(os.getenv("ADAPTIVE_COOLDOWN_SECONDS", "5"))
+
+INFERENCE_TIER = gauge("goose_inference_tier", "Active YOLO inference tier (0 is the most accurate)")
+INFERENCE_TIER_CHANGES = counter("goose_inference_tier_changes_total", "Inference tier switches by direction", ["direction"])
+
+class Tier(NamedTuple):
+    name: str
+    model: str
+    imgsz: int
+
+def parse_tiers(spec: str) -> List[Tier]:
+    """Tiers from "model@imgsz,..."; defaults to YOLO_MODEL at YOLO_IMGSZ, 480 and 320 px"""
+    entries = [entry.strip() for entry in spec.split(",") if entry.strip()]
+    if not entries:
+        entries = [f"{YOLO_MODEL}@{size}" for size in sorted({YOLO_IMGSZ, 480, 320}, reverse=True) if size <= YOLO_IMGSZ]
+
+    tiers = []
+    for entry in entries:
+        model, _, size = entry.rpartition("@")
+        if not model:
+            model, size = size, str(YOLO_IMGSZ)
+        stem = os.path.splitext(os.path.basename(model))[0]
+        tiers.append(Tier(f"{stem}@{size}", model, int(size)))
+    return tiers
+
+def _p95(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+class AdaptiveController:
+    """Picks the inference tier for each YOLO call from queue depth and recent p95 latency"""
+
+    def __init__(self, tiers: List[Tier] = None, enabled: bool = ADAPTIVE_INFERENCE,
+                 latency_slo_ms: float = ADAPTIVE_LATENCY_SLO_MS, recover_ratio: float = ADAPTIVE_RECOVER_RATIO,
+                 max_queue: int = ADAPTIVE_MAX_QUEUE, window: int = ADAPTIVE_WINDOW,
+                 min_samples: int = ADAPTIVE_MIN_SAMPLES, cooldown_seconds: float = ADAPTIVE_COOLDOWN_SECONDS,
+                 queued: Optional[Callable[[], int]] = None):
+        self.tiers = tiers or parse_tiers(ADAPTIVE_TIERS)
+        self.enabled = enabled and len(self.tiers) > 1
+        self.latency_slo = latency_slo_ms / 1000.0
+        self.recover_ratio = recover_ratio
+        self.max_queue = max(1, max_queue)
+        self.min_samples = max(1, min_samples)
+        self.cooldown_seconds = cooldown_seconds
+        # Calls waiting for a slot upstream (the fair queue), which track() never sees
+        self.queued = queued
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=max(1, window))
+        self._index = 0
+        self._in_flight = 0
+        self._changed_at = time.monotonic()
+        self.step_downs = 0
+        self.step_ups = 0
+        INFERENCE_TIER.set(0)
+
+    def current_tier(self) -> Tier:
+        return self.tiers[self._index]
+
+    def warmup_tiers(self) -> List[Tuple[str, int]]:
+        """(model, imgsz) pairs the detectors should warm; only the first tier when adaptation is off"""
+        tiers = self.tiers if self.enabled else self.tiers[:1]
+        return [(tier.model, tier.imgsz) for tier in tiers]
+
+    @contextmanager
+    def track(self):
+        """Wrap one YOLO call: yields the tier to run it at and records its latency on success"""
+        with self._lock:
+            self._in_flight += 1
+            tier = self.tiers[self._index]
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield tier
+            ok = True
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            if ok:
+                self.observe(time.perf_counter() - start)
+
+    def observe(self, latency: float):
+        """Record one call's latency (seconds) and step the tier if load calls for it"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._latencies.append(latency)
+            now = time.monotonic()
+            if len(self._latencies) < self.min_samples or now - self._changed_at < self.cooldown_seconds:
+                return
+
+            p95 = _p95(list(self._latencies))
+            depth = self.queue_depth()
+            if (p95 > self.latency_slo or depth > self.max_queue) and self._index < len(self.tiers) - 1:
+                self._switch(self._index + 1, "down", p95, depth, now)
+            elif p95 < self.latency_slo * self.recover_ratio and depth <= self.max_queue // 2 and self._index > 0:
+                self._switch(self._index - 1, "up", p95, depth, now)
+
+    def queue_depth(self) -> int:
+        """YOLO calls in flight plus calls still waiting for a slot upstream"""
+        return self._in_flight + (self.queued() if self.queued is not None else 0)
+
+    def _switch(self, index: int, direction: str, p95: float, depth: int, now: float):
+        previous = self.tiers[self._index]
+        self._index = index
+        self._changed_at = now
+        # Latencies of the previous tier say nothing about the new one
+        self._latencies.clear()
+        if direction == "down":
+            self.step_downs += 1
+        else:
+            self.step_ups += 1
+        INFERENCE_TIER.set(index)
+        INFERENCE_TIER_CHANGES.inc(direction=direction)
+        print(f"🎚️ Inference tier {previous.name} -> {self.tiers[index].name} "
+              f"(p95 {p95 * 1000.0:.0f} ms, queue depth {depth}, SLO {self.latency_slo * 1000.0:.0f} ms)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            latencies = list(self._latencies)
+            return {
+                "enabled": self.enabled,
+                "tier": self.tiers[self._index].name,
+                "tier_index": self._index,
+                "tiers": [tier.name for tier in self.tiers],
+                "in_flight": self._in_flight,
+                "queue_depth": self.queue_depth(),
+                "p95_ms": round(_p95(latencies) * 1000.0, 1) if latencies else None,
+                "latency_slo_ms": self.latency_slo * 1000.0,
+                "step_downs": self.step_downs,
+                "step_ups": self.step_ups
+            }
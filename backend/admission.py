@@ -0,0 +1,226 @@
+"""
+Admission control for the detection endpoints.
+
+Requests are admitted before their upload is read, from the Content-Length header: a
+request is rejected straight away with 503 and a Retry-After hint when the wait queue is
+full, when its estimated wait (queue position x average service time / concurrency) is
+above the limit, or when the upload would push the bytes held by admitted requests over
+the cap. Admitted requests wait FIFO for one of ADMISSION_MAX_IN_FLIGHT slots; the body
+is only read once a slot is free, and its bytes are counted as they stream in, so an upload
+without a Content-Length (or with a wrong one) is held to the same caps and rejected with
+413 once it passes them. While a request is being served, its work is cancelled as soon as
+the client disconnects.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from metrics import counter, gauge
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+# Reject when the estimated queue wait is above this, and give up on requests that waited this long
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "5"))
+# Upload bytes held by queued and in-flight requests together
+ADMISSION_MAX_INFLIGHT_BYTES = int(os.getenv("ADMISSION_MAX_INFLIGHT_BYTES", str(64 * 1024 * 1024)))
+# Largest single upload
+ADMISSION_MAX_REQUEST_BYTES = int(os.getenv("ADMISSION_MAX_REQUEST_BYTES", str(32 * 1024 * 1024)))
+
+ADMISSION_QUEUE_DEPTH = gauge("goose_admission_queue_depth", "Admitted detection requests waiting for a slot")
+ADMISSION_IN_FLIGHT = gauge("goose_admission_in_flight", "Detection requests being served")
+ADMISSION_BYTES = gauge("goose_admission_inflight_bytes", "Upload bytes of queued and in-flight detection requests")
+ADMISSION_REJECTIONS = counter("goose_admission_rejections_total", "Detection requests shed with 503 (or 413 when too large), by reason", ["reason"])
+ADMISSION_CANCELLATIONS = counter("goose_admission_cancellations_total", "Detection work cancelled because the client disconnected")
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class UploadTooLarge(Exception):
+    def __init__(self, received: int, limit: int):
+        super().__init__(f"Upload of at least {received} bytes is over the {limit} byte limit")
+        self.received = received
+        self.limit = limit
+
+class ClientDisconnected(Exception):
+    pass
+
+class AdmissionController:
+    """Bounded FIFO admission with a concurrency limit, a wait estimate and an upload-bytes cap"""
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 max_wait_seconds: float = ADMISSION_MAX_WAIT_SECONDS, max_bytes: int = ADMISSION_MAX_INFLIGHT_BYTES,
+                 max_request_bytes: int = ADMISSION_MAX_REQUEST_BYTES, enabled: bool = ADMISSION_ENABLED):
+        self.enabled = enabled
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_seconds = max_wait_seconds
+        self.max_bytes = max_bytes
+        self.max_request_bytes = max_request_bytes
+        self.in_flight = 0
+        self.bytes = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        # Moving average of how long an admitted request holds its slot
+        self._service_seconds: Optional[float] = None
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+        self.cancelled = 0
+
+    def estimated_wait(self, position: Optional[int] = None) -> float:
+        """Seconds a request at this queue position (default: a new arrival) should expect to wait"""
+        if position is None:
+            position = len(self._waiters) + 1 if self.in_flight >= self.max_in_flight else 0
+        return position * (self._service_seconds or 0.0) / self.max_in_flight
+
+    def _count_rejection(self, reason: str):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTIONS.inc(reason=reason)
+
+    def _reject(self, reason: str, wait: float):
+        self._count_rejection(reason)
+        raise AdmissionRejected(reason, max(1, math.ceil(wait)))
+
+    def _too_large(self, received: int, limit: int):
+        self._count_rejection("too_large")
+        raise UploadTooLarge(received, limit)
+
+    async def acquire(self, size: int):
+        """Wait for a slot or raise AdmissionRejected / UploadTooLarge; pair every successful call with release(size)"""
+        if size > self.max_request_bytes:
+            self._too_large(size, self.max_request_bytes)
+        wait = self.estimated_wait()
+        if self.bytes + size > self.max_bytes and self.bytes > 0:
+            self._reject("bytes", wait)
+        if self.in_flight >= self.max_in_flight:
+            if len(self._waiters) >= self.max_queue:
+                self._reject("queue_full", wait)
+            if wait > self.max_wait_seconds:
+                self._reject("estimated_wait", wait)
+
+        self._add_bytes(size)
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self._start()
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait_seconds)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended; pass it on
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+            self._add_bytes(-size)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("timeout", self.estimated_wait())
+            raise
+
+    async def read_body(self, request, reserved: int) -> Tuple[bytes, int]:
+        """Read an admitted request's upload, counting its bytes as they arrive.
+
+        The bytes held grow past the reserved (Content-Length) size as the body streams in;
+        UploadTooLarge is raised as soon as the upload passes the per-request cap or would
+        push the held bytes over the cap. Returns the body and the size to release with.
+        """
+        chunks: List[bytes] = []
+        received = 0
+        held = reserved
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > self.max_request_bytes:
+                    self._too_large(received, self.max_request_bytes)
+                if received > held:
+                    others = self.bytes - held
+                    if others > 0 and others + received > self.max_bytes:
+                        self._too_large(received, self.max_bytes - others)
+                    self._add_bytes(received - held)
+                    held = received
+                chunks.append(chunk)
+        except BaseException:
+            self._add_bytes(reserved - held)
+            raise
+        return b"".join(chunks), held
+
+    def release(self, size: int, started: float):
+        self._add_bytes(-size)
+        elapsed = time.perf_counter() - started
+        self._service_seconds = elapsed if self._service_seconds is None else 0.8 * self._service_seconds + 0.2 * elapsed
+        self._release_slot()
+
+    def _start(self):
+        self.in_flight += 1
+        self.admitted += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+
+    def _release_slot(self):
+        # Hand the slot straight to the oldest waiter so arrivals cannot overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.admitted += 1
+                waiter.set_result(None)
+                ADMISSION_QUEUE_DEPTH.set(len(self._waiters))
+                return
+        ADMISSION_QUEUE_DEPTH.set(0)
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+
+    def _add_bytes(self, amount: int):
+        self.bytes += amount
+        ADMISSION_BYTES.set(self.bytes)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "inflight_bytes": self.bytes,
+            "estimated_wait_seconds": round(self.estimated_wait(), 3),
+            "avg_service_seconds": round(self._service_seconds or 0.0, 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "cancelled": self.cancelled,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait_seconds,
+            "max_inflight_bytes": self.max_bytes,
+            "max_request_bytes": self.max_request_bytes
+        }
+
+    async def cancel_on_disconnect(self, request, awaitable):
+        """Await the work, cancelling it and raising ClientDisconnected if the client goes away first.
+
+        Only call this once the request body has been read: the only message left to receive
+        is then the disconnect.
+        """
+        task = asyncio.ensure_future(awaitable)
+        watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if task.done():
+                return task.result()
+            task.cancel()
+            self.cancelled += 1
+            ADMISSION_CANCELLATIONS.inc()
+            raise ClientDisconnected()
+        finally:
+            for pending in (task, watcher):
+                if not pending.done():
+                    pending.cancel()
+
+async def _wait_for_disconnect(request):
+    # Request.is_disconnected() cannot see through the http middlewares, a blocking receive can
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
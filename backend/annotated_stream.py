@@ -0,0 +1,133 @@
+"""
+Annotated MJPEG stream of a live camera session, for venue displays.
+
+Live sessions publish the frames they already decoded for inference to a FrameStore, and
+their detections once inference finishes. The stream renders at its own frame rate: every
+tick it draws the newest detections onto the newest frame, so the display keeps moving
+while YOLO is busy and boxes update as soon as a result lands. Frames are only decoded
+for the store while a display is watching the session.
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from detect import DecodedFrame, _as_frame, draw_detections
+from metrics import counter, gauge
+
+ANNOTATED_STREAM_FPS = float(os.getenv("ANNOTATED_STREAM_FPS", "15"))
+ANNOTATED_STREAM_JPEG_QUALITY = int(os.getenv("ANNOTATED_STREAM_JPEG_QUALITY", "80"))
+
+STREAM_VIEWERS = gauge("goose_annotated_stream_viewers", "Clients watching /stream/annotated")
+STREAM_RENDERS = counter("goose_annotated_stream_frames_total", "Annotated stream frames sent, by whether they were re-rendered", ["rendered"])
+
+BOUNDARY = "frame"
+
+class _Session:
+    __slots__ = ("frame", "detections", "version", "viewers")
+
+    def __init__(self):
+        self.frame: Optional[DecodedFrame] = None
+        self.detections: List[Dict] = []
+        self.version = 0
+        self.viewers = 0
+
+class FrameStore:
+    """Newest decoded frame and detections of each live session that a display is watching"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, _Session] = {}
+
+    def has_viewers(self, session_id: str) -> bool:
+        session = self._sessions.get(session_id)
+        return session is not None and session.viewers > 0
+
+    def publish_frame(self, session_id: str, frame: DecodedFrame):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session.frame = frame
+            session.version += 1
+
+    def publish_detections(self, session_id: str, detections: List[Dict]):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session.detections = detections
+            session.version += 1
+
+    def latest(self, session_id: str) -> Optional[Tuple[int, DecodedFrame, List[Dict]]]:
+        """(version, frame, detections), or None until the session has sent a frame"""
+        session = self._sessions.get(session_id)
+        if session is None or session.frame is None:
+            return None
+        with self._lock:
+            return session.version, session.frame, session.detections
+
+    @contextmanager
+    def viewer(self, session_id: str):
+        """Register a display for the session while the block runs"""
+        with self._lock:
+            session = self._sessions.setdefault(session_id, _Session())
+            session.viewers += 1
+        STREAM_VIEWERS.inc()
+        try:
+            yield
+        finally:
+            STREAM_VIEWERS.dec()
+            with self._lock:
+                session.viewers -= 1
+                if session.viewers == 0:
+                    self._sessions.pop(session_id, None)
+
+class AnnotatedRenderer:
+    """Draws overlays onto a canvas that is reused across frames of the same size"""
+
+    def __init__(self, jpeg_quality: int = ANNOTATED_STREAM_JPEG_QUALITY):
+        self._canvas: Optional[np.ndarray] = None
+        self._encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+
+    def render(self, frame: DecodedFrame, detections: List[Dict]) -> bytes:
+        """One multipart MJPEG part with the detections drawn onto the frame"""
+        image = _as_frame(frame, "bgr").image
+        if self._canvas is None or self._canvas.shape != image.shape:
+            self._canvas = np.empty_like(image)
+        # The frame is shared with inference, so boxes are drawn on the canvas instead
+        np.copyto(self._canvas, image)
+        draw_detections(self._canvas, detections, frame.scale_x, frame.scale_y)
+        ok, jpeg = cv2.imencode(".jpg", self._canvas, self._encode_params)
+        if not ok:
+            raise ValueError("Could not encode annotated frame")
+        header = f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {jpeg.nbytes}\r\n\r\n".encode()
+        return header + jpeg.tobytes() + b"\r\n"
+
+async def mjpeg_frames(store: FrameStore, session_id: str, fps: float = ANNOTATED_STREAM_FPS) -> AsyncIterator[bytes]:
+    """MJPEG parts at a fixed rate; a frame is only re-rendered when the session has published something new"""
+    interval = 1.0 / max(fps, 0.1)
+    renderer = AnnotatedRenderer()
+    rendered_version = None
+    part = None
+    with store.viewer(session_id):
+        next_tick = time.perf_counter()
+        while True:
+            latest = store.latest(session_id)
+            if latest is not None:
+                version, frame, detections = latest
+                rendered = version != rendered_version
+                if rendered:
+                    part = await asyncio.to_thread(renderer.render, frame, detections)
+                    rendered_version = version
+                STREAM_RENDERS.inc(rendered=str(rendered).lower())
+                yield part
+
+            # A slow render skips ticks rather than bursting to catch up
+            next_tick = max(next_tick + interval, time.perf_counter())
+            await asyncio.sleep(next_tick - time.perf_counter())
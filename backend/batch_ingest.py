@@ -0,0 +1,190 @@
+"""
+Batch ingestion of a zip of photos or a recorded video, for post-event sponsor analysis.
+
+Frames are read lazily from the upload: zip members one at a time, video frames with
+cv2.VideoCapture at BATCH_VIDEO_SAMPLE_FPS (skipped frames are grabbed, never decoded).
+Every frame is downscaled to the detector's decode size as soon as it is read. Frames go to
+the detector BATCH_SIZE at a time, concurrently, so the micro-batching scheduler or the
+inference workers put them through YOLO together, while the next batch is read in the
+background. Results stream out as NDJSON lines in completion order, so memory is bounded
+by two batches of small frames whatever the size of the upload.
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import cv2
+
+from detect import DecodedFrame, decode_frame
+from metrics import counter, stage_timer
+
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "8"))
+BATCH_VIDEO_SAMPLE_FPS = float(os.getenv("BATCH_VIDEO_SAMPLE_FPS", "1"))
+# Frames analysed per upload at most; sampling stops there
+BATCH_MAX_FRAMES = int(os.getenv("BATCH_MAX_FRAMES", "5000"))
+# Zip members larger than this (uncompressed) are reported as errors and not read
+BATCH_MAX_IMAGE_BYTES = int(os.getenv("BATCH_MAX_IMAGE_BYTES", str(32 * 1024 * 1024)))
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "2"))
+
+BATCH_FRAMES = counter("goose_batch_frames_total", "Frames analysed by /batch/analyze, by source and outcome", ["source", "outcome"])
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+ZIP_MAGIC = b"PK\x03\x04"
+
+# (index, source name, seconds into the video or None, decoded frame or the reason it could not be read)
+BatchItem = Tuple[int, str, Optional[float], Union[DecodedFrame, str]]
+
+def is_zip(fileobj: BinaryIO, filename: Optional[str]) -> bool:
+    position = fileobj.tell()
+    magic = fileobj.read(len(ZIP_MAGIC))
+    fileobj.seek(position)
+    return magic == ZIP_MAGIC or (filename or "").lower().endswith(".zip")
+
+def _downscale(image, decode_size: int) -> DecodedFrame:
+    """Shrink a full-resolution BGR frame so its longer side is decode_size, keeping the original size for box scaling"""
+    height, width = image.shape[:2]
+    factor = decode_size / max(width, height)
+    if factor < 1.0:
+        image = cv2.resize(image, (max(1, round(width * factor)), max(1, round(height * factor))), interpolation=cv2.INTER_AREA)
+    return DecodedFrame(image, "bgr", width, height)
+
+def iter_zip_frames(fileobj: BinaryIO, decode_size: int, max_frames: int = BATCH_MAX_FRAMES) -> Iterator[BatchItem]:
+    """Images in a zip archive, in archive order, decoded one member at a time"""
+    with zipfile.ZipFile(fileobj) as archive:
+        members = [member for member in archive.infolist()
+                   if not member.is_dir() and member.filename.lower().endswith(IMAGE_EXTENSIONS)
+                   and not os.path.basename(member.filename).startswith(".")]
+        for index, member in enumerate(members[:max_frames]):
+            if member.file_size > BATCH_MAX_IMAGE_BYTES:
+                yield index, member.filename, None, f"image is larger than {BATCH_MAX_IMAGE_BYTES} bytes"
+                continue
+            try:
+                with archive.open(member) as f:
+                    # The declared size is not trusted: read at most one byte past the limit
+                    data = f.read(BATCH_MAX_IMAGE_BYTES + 1)
+                if len(data) > BATCH_MAX_IMAGE_BYTES:
+                    yield index, member.filename, None, f"image is larger than {BATCH_MAX_IMAGE_BYTES} bytes"
+                    continue
+                yield index, member.filename, None, decode_frame(data, "bgr", decode_size)
+            except Exception as e:
+                yield index, member.filename, None, f"could not read image: {e}"
+
+def open_video(path: str) -> cv2.VideoCapture:
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        capture.release()
+        raise ValueError("Could not open video")
+    return capture
+
+def iter_video_frames(capture: cv2.VideoCapture, decode_size: int, sample_fps: float = BATCH_VIDEO_SAMPLE_FPS,
+                      max_frames: int = BATCH_MAX_FRAMES, source: str = "video") -> Iterator[BatchItem]:
+    """Frames sampled from an opened video at sample_fps; releases the capture when done"""
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1, round(fps / sample_fps)) if sample_fps > 0 else 1
+        position = 0
+        index = 0
+        while index < max_frames:
+            if position % step:
+                # Skipped frames are demuxed but not decoded
+                if not capture.grab():
+                    break
+            else:
+                ok, image = capture.read()
+                if not ok:
+                    break
+                yield index, source, round(position / fps, 3), _downscale(image, decode_size)
+                index += 1
+            position += 1
+    finally:
+        capture.release()
+
+def spool_to_disk(fileobj: BinaryIO, suffix: str) -> str:
+    """Copy an upload to a named temporary file (VideoCapture needs a path); the caller deletes it"""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        shutil.copyfileobj(fileobj, f, 1024 * 1024)
+        return f.name
+
+def _next_batch(items: Iterator[BatchItem], size: int) -> List[BatchItem]:
+    batch = []
+    with stage_timer("batch_read"):
+        for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                break
+    return batch
+
+def _ndjson(record: Dict) -> bytes:
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode()
+
+async def stream_batch_results(items: Iterator[BatchItem], detect: Callable[[DecodedFrame], Awaitable[Dict]],
+                               source_kind: str, batch_size: int = BATCH_SIZE) -> AsyncIterator[bytes]:
+    """NDJSON line per frame as its detection completes, then one summary line.
+
+    items is read in a worker thread, one batch ahead of the batch being detected.
+    """
+    started = time.perf_counter()
+    frames = failed = 0
+    # Frames each sponsor category appeared in
+    sponsor_counts: Dict[str, int] = {}
+    prefetch = asyncio.ensure_future(asyncio.to_thread(_next_batch, items, batch_size))
+    try:
+        while True:
+            batch = await prefetch
+            if not batch:
+                break
+            prefetch = asyncio.ensure_future(asyncio.to_thread(_next_batch, items, batch_size))
+
+            async def analyse(item: BatchItem) -> Dict:
+                index, source, timestamp, frame = item
+                record = {"index": index, "source": source}
+                if timestamp is not None:
+                    record["timestamp"] = timestamp
+                if isinstance(frame, str):
+                    record["error"] = frame
+                    return record
+                try:
+                    result = await detect(frame)
+                except Exception as e:
+                    record["error"] = f"detection failed: {e}"
+                    return record
+                record.update({
+                    "total_objects": result.get("total_objects", 0),
+                    "objects": result.get("objects", []),
+                    "sponsor_categories": result.get("sponsor_categories", []),
+                    "betting_opportunities": result.get("betting_opportunities", []),
+                    "detections": result.get("detections", [])
+                })
+                return record
+
+            for finished in asyncio.as_completed([analyse(item) for item in batch]):
+                record = await finished
+                if "error" in record:
+                    failed += 1
+                    BATCH_FRAMES.inc(source=source_kind, outcome="error")
+                else:
+                    frames += 1
+                    BATCH_FRAMES.inc(source=source_kind, outcome="ok")
+                    for category in record["sponsor_categories"]:
+                        sponsor_counts[category] = sponsor_counts.get(category, 0) + 1
+                yield _ndjson(record)
+    finally:
+        # Let a read in progress finish before closing the source under it
+        if not prefetch.done():
+            await asyncio.wait({prefetch})
+        close = getattr(items, "close", None)
+        if close is not None:
+            close()
+
+    yield _ndjson({
+        "done": True,
+        "frames": frames,
+        "failed": failed,
+        "sponsor_categories": sponsor_counts,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    })
@@ -0,0 +1,430 @@
+"""
+Benchmarks for the GooseGoGeese detection pipeline.
+
+Usage (from the backend directory):
+    python benchmark.py batching --clients 1 8 32 --requests 20
+    python benchmark.py faces --requests 50
+    python benchmark.py engines --engines torch onnx openvino openvino-int8 --frames path/to/frames
+    python benchmark.py tiles --image path/to/4k.jpg --tile-sizes 0 1920 1280 960 640
+    python benchmark.py prefork --workers 1 4 8
+    python benchmark.py faceindex --sizes 1000 10000 100000
+    python benchmark.py fairness --heavy-clients 16 --light-tenants 4
+    python benchmark.py prompts --faces 1 4 8 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+import detect
+from tracking import iou_matrix
+
+DEFAULT_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_image.jpg")
+
+def load_image_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_clients(image_bytes: bytes, clients: int, requests_per_client: int) -> Dict:
+    """Fire requests from `clients` concurrent threads and measure throughput and latency"""
+    latencies = []
+
+    def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            detect.detect_objects_yolo_v8(image_bytes)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client)
+    elapsed = time.perf_counter() - start
+
+    total = clients * requests_per_client
+    return {
+        "clients": clients,
+        "frames": total,
+        "throughput_fps": total / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000.0,
+        "p95_ms": percentile(latencies, 95) * 1000.0
+    }
+
+def bench_batching(args):
+    image_bytes = load_image_bytes(args.image)
+    if not detect.load_yolo_model():
+        return
+
+    # Warm up so model initialisation is not counted
+    detect.detect_objects_yolo_v8(image_bytes)
+
+    for batching in (False, True):
+        detect.YOLO_BATCHING_ENABLED = batching
+        label = "batched" if batching else "unbatched"
+        for clients in args.clients:
+            before = detect.get_inference_scheduler().stats() if batching else None
+            row = run_clients(image_bytes, clients, args.requests)
+            line = (f"{label:>9} | clients={row['clients']:>3} | {row['throughput_fps']:7.1f} frames/s"
+                    f" | p50={row['p50_ms']:7.1f} ms | p95={row['p95_ms']:7.1f} ms")
+            if batching:
+                after = detect.get_inference_scheduler().stats()
+                batches = after["batches_run"] - before["batches_run"]
+                frames = after["frames_run"] - before["frames_run"]
+                line += f" | avg batch={frames / batches if batches else 0.0:4.1f}"
+            print(line)
+
+def bench_faces(args):
+    frame = detect.decode_frame(load_image_bytes(args.image), "rgb", detect.FACE_DECODE_SIZE)
+    image_rgb = frame.image
+
+    # Previous behaviour: a fresh FaceDetection graph per call
+    fresh = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        with detect.get_mp_face_detection().FaceDetection(model_selection=0, min_detection_confidence=0.5) as face_detection:
+            face_detection.process(image_rgb)
+        fresh.append(time.perf_counter() - start)
+
+    pooled = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        detect.detect_faces(frame)
+        pooled.append(time.perf_counter() - start)
+
+    stats = detect.face_detector_pool.stats()
+    print(f"  fresh graph | p50={statistics.median(fresh) * 1000.0:7.2f} ms | p95={percentile(fresh, 95) * 1000.0:7.2f} ms")
+    print(f"  pooled      | p50={statistics.median(pooled) * 1000.0:7.2f} ms | p95={percentile(pooled, 95) * 1000.0:7.2f} ms")
+    print(f"  pool        | graph builds={stats['graph_builds']} over {stats['calls']} calls"
+          f" | avg build={stats['avg_graph_build_ms']:.1f} ms | avg checkout={stats['avg_checkout_ms']:.3f} ms"
+          f" | avg process={stats['avg_process_ms']:.2f} ms")
+
+def detection_drift(reference, candidate) -> Dict:
+    """Compare one frame's detections against the reference engine, matching same-class boxes by IoU"""
+    ref_xyxy, ref_conf, ref_cls = reference
+    xyxy, conf, cls = candidate
+    matched, ious, conf_deltas = 0, [], []
+    if len(ref_xyxy) and len(xyxy):
+        iou = iou_matrix(ref_xyxy, xyxy)
+        iou[ref_cls[:, None] != cls[None, :]] = 0.0
+        for r in range(len(ref_xyxy)):
+            c = int(iou[r].argmax())
+            if iou[r, c] >= 0.5:
+                matched += 1
+                ious.append(float(iou[r, c]))
+                conf_deltas.append(abs(float(ref_conf[r]) - float(conf[c])))
+                iou[:, c] = 0.0
+    return {"reference": len(ref_xyxy), "candidate": len(xyxy), "matched": matched,
+            "ious": ious, "conf_deltas": conf_deltas}
+
+def bench_engines(args):
+    if os.path.isdir(args.frames):
+        paths = sorted(os.path.join(args.frames, f) for f in os.listdir(args.frames)
+                       if f.lower().endswith((".jpg", ".jpeg", ".png")))
+    else:
+        paths = [args.frames]
+    frames = [detect.decode_frame(load_image_bytes(path), "bgr", detect.YOLO_DECODE_SIZE) for path in paths]
+    # Latency of the engine itself, without micro-batching
+    detect.YOLO_BATCHING_ENABLED = False
+
+    reference = None
+    for engine in args.engines:
+        if not detect.load_yolo_model(engine) or detect.yolo_engine != engine:
+            print(f"{engine:>14} | unavailable")
+            continue
+        detect.detect_object_arrays(frames[0], args.conf)
+
+        outputs, latencies = [], []
+        for _ in range(args.repeat):
+            for frame in frames:
+                start = time.perf_counter()
+                arrays = detect.detect_object_arrays(frame, args.conf, fallback_thresholds=[])
+                latencies.append(time.perf_counter() - start)
+                if len(outputs) < len(frames):
+                    outputs.append(arrays if arrays is not None else (np.zeros((0, 4)), np.zeros(0), np.zeros(0)))
+
+        line = (f"{engine:>14} | p50={statistics.median(latencies) * 1000.0:7.1f} ms"
+                f" | p95={percentile(latencies, 95) * 1000.0:7.1f} ms")
+        if reference is None:
+            reference = outputs
+            line += " | reference"
+        else:
+            drift = [detection_drift(ref, out) for ref, out in zip(reference, outputs)]
+            ref_total = sum(d["reference"] for d in drift)
+            matched = sum(d["matched"] for d in drift)
+            ious = [iou for d in drift for iou in d["ious"]]
+            deltas = [delta for d in drift for delta in d["conf_deltas"]]
+            line += (f" | recall vs ref={matched / ref_total if ref_total else 1.0:6.1%}"
+                     f" | boxes {sum(d['candidate'] for d in drift)}/{ref_total}"
+                     f" | mean IoU={statistics.mean(ious) if ious else 0.0:.3f}"
+                     f" | mean |dconf|={statistics.mean(deltas) if deltas else 0.0:.3f}")
+        print(line)
+
+def bench_tiles(args):
+    image_bytes = load_image_bytes(args.image)
+    if not detect.load_yolo_model():
+        return
+    # Tiles of one frame go out as a single batch; keep other clients' frames out of it
+    detect.YOLO_BATCHING_ENABLED = False
+    full = detect.decode_frame(image_bytes)
+    height, width = full.image.shape[:2]
+    print(f"  frame {width}x{height}, overlap {detect.YOLO_TILE_OVERLAP:.0%}, "
+          f"full frame pass {'on' if detect.YOLO_TILE_FULL_FRAME else 'off'}")
+
+    for tile_size in args.tile_sizes:
+        tiled = tile_size > 0
+        if tiled:
+            detect.YOLO_TILE_SIZE = tile_size
+            detect.YOLO_TILE_MIN_SIDE = 0
+            tiles = len(detect.tile_grid(width, height))
+            tiles += 1 if detect.YOLO_TILE_FULL_FRAME and tiles > 1 else 0
+        else:
+            tiles = 1
+        detect.detect_object_arrays(image_bytes, args.conf, fallback_thresholds=[], tiled=tiled)
+
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            arrays = detect.detect_object_arrays(image_bytes, args.conf, fallback_thresholds=[], tiled=tiled)
+            latencies.append(time.perf_counter() - start)
+        xyxy = arrays[0] if arrays is not None else np.zeros((0, 4))
+        # Objects under 1% of the frame area, the cups and phones lost to the downscale
+        small = int((np.prod(xyxy[:, 2:] - xyxy[:, :2], axis=1) < 0.01 * width * height).sum())
+        label = f"tile {tile_size}" if tiled else "whole frame"
+        print(f"{label:>12} | tiles={tiles:>3} | p50={statistics.median(latencies) * 1000.0:7.1f} ms"
+              f" | p95={percentile(latencies, 95) * 1000.0:7.1f} ms | boxes={len(xyxy):>3} | small={small:>3}")
+
+def bench_prefork(args):
+    import urllib.error
+    import urllib.request
+
+    import serve
+
+    base = f"http://127.0.0.1:{args.port}"
+    mib = 1024 * 1024
+    single_rss = None
+    for workers in args.workers:
+        started = time.perf_counter()
+        server = subprocess.Popen([sys.executable, "serve.py", "--workers", str(workers), "--port", str(args.port),
+                                   "--host", "127.0.0.1", "--log-level", "warning"],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            # Requests land on a random worker, so keep going until every worker has answered a few
+            ready = 0
+            while ready < 4 * workers:
+                if server.poll() is not None:
+                    print(f"  {workers} workers: server exited with {server.returncode}")
+                    return
+                try:
+                    # /ready turns 200 once the worker's startup warmup has run its models
+                    with urllib.request.urlopen(base + "/ready", timeout=5):
+                        ready += 1
+                except (urllib.error.URLError, OSError):
+                    ready = 0
+                    time.sleep(0.5)
+            startup = time.perf_counter() - started
+
+            with open(f"/proc/{server.pid}/task/{server.pid}/children") as f:
+                children = [int(pid) for pid in f.read().split()]
+            report = serve.memory_report(server.pid, children)
+            per_worker = list(report["workers"].values())
+            rss = statistics.mean(m["rss"] for m in per_worker)
+            single_rss = single_rss or rss
+            print(f"{workers:>3} workers | startup {startup:5.1f}s"
+                  f" | per worker RSS {rss / mib:6.0f} MiB"
+                  f" shared {statistics.mean(m['shared'] for m in per_worker) / mib:6.0f} MiB"
+                  f" private {statistics.mean(m['private'] for m in per_worker) / mib:6.0f} MiB"
+                  f" | total PSS {report['total_pss'] / mib:6.0f} MiB"
+                  f" | unshared estimate {workers * single_rss / mib:6.0f} MiB")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+def bench_face_index(args):
+    from face_index import FaceIndex
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        stored = rng.standard_normal((size, 128)).astype(np.float32)
+        # Re-sightings of stored faces: similarity to the original around 0.95
+        picks = rng.choice(size, args.queries)
+        unit = stored[picks] / np.linalg.norm(stored[picks], axis=1, keepdims=True)
+        queries = unit + rng.standard_normal((args.queries, 128)).astype(np.float32) * 0.03
+
+        reference = None
+        for label, ann_min_size in (("exact", size + 1), ("ivf", 0)):
+            index = FaceIndex(max_size=size, ann_min_size=ann_min_size, ann_probes=args.probes)
+            start = time.perf_counter()
+            face_ids = index.add(stored)
+            build = time.perf_counter() - start
+            latencies, found = [], []
+            for query in queries:
+                start = time.perf_counter()
+                match = index.search(query[None, :])[0]
+                latencies.append(time.perf_counter() - start)
+                found.append(match[0] if match is not None else None)
+            expected = [face_ids[pick] for pick in picks]
+            recall = sum(f == e for f, e in zip(found, expected)) / len(expected)
+            line = (f"{size:>7} faces | {label:>5} | build {build * 1000.0:8.1f} ms"
+                    f" | lookup p50={statistics.median(latencies) * 1000.0:7.3f} ms"
+                    f" p95={percentile(latencies, 95) * 1000.0:7.3f} ms | recall {recall:6.1%}")
+            if reference is None:
+                reference = found
+            else:
+                line += f" | agrees with exact {sum(a == b for a, b in zip(found, reference)) / len(found):6.1%}"
+            print(line)
+
+def bench_fairness(args):
+    from fair_queue import FairQueue
+
+    async def run(fair: bool) -> Dict[str, List[float]]:
+        queue = FairQueue(concurrency=args.concurrency, weights={"fun": 1.0})
+        waits: Dict[str, List[float]] = {}
+        deadline = time.perf_counter() + args.seconds
+
+        async def client(tenant: str, think_seconds: float):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                # FIFO is the same queue with every call in one flow
+                async with queue.slot(tenant if fair else "everyone", "fun"):
+                    waits.setdefault(tenant, []).append(time.perf_counter() - start)
+                    await asyncio.sleep(args.service_ms / 1000.0)
+                await asyncio.sleep(think_seconds)
+
+        clients = [client("kiosk", 0.0) for _ in range(args.heavy_clients)]
+        clients += [client(f"attendee-{i}", args.think_ms / 1000.0) for i in range(args.light_tenants)]
+        await asyncio.gather(*clients)
+        return waits
+
+    print(f"  {args.heavy_clients} kiosk streams vs {args.light_tenants} attendees, {args.concurrency} slots,"
+          f" {args.service_ms:.0f} ms per call")
+    for label, fair in (("fifo", False), ("drr", True)):
+        waits = asyncio.run(run(fair))
+        attendees = [wait for tenant, values in waits.items() if tenant != "kiosk" for wait in values]
+        for tenant, values in (("kiosk", waits.get("kiosk", [])), ("attendees", attendees)):
+            print(f"{label:>5} | {tenant:>9} | calls={len(values):>5}"
+                  f" | wait p50={statistics.median(values) * 1000.0 if values else 0.0:7.1f} ms"
+                  f" p95={percentile(values, 95) * 1000.0:7.1f} ms")
+
+def bench_prompts(args):
+    import llm
+
+    class SimulatedProvider(llm.AsyncProvider):
+        """Round trip plus generation time for the quests written"""
+
+        def available(self) -> bool:
+            return True
+
+        async def _complete(self, prompt: str, **options) -> str:
+            count = re.match(r"Create (\d+) different", prompt)
+            quests = int(count.group(1)) if count else 1
+            await asyncio.sleep((args.rtt_ms + args.ms_per_token * args.tokens_per_quest * quests) / 1000.0)
+            if count is None:
+                return "Ask them about their project"
+            # Distinct across calls, as the real prompt asks for
+            return json.dumps([f"Quest {id(prompt)}.{i}" for i in range(quests)])
+
+    async def run(mode: str, faces: List[Dict]) -> float:
+        llm.cohere_provider = SimulatedProvider("cohere", args.concurrency)
+        start = time.perf_counter()
+        if mode == "sequential":
+            for face in faces:
+                await llm.create_networking_prompt_async(face, 60.0)
+        elif mode == "gather":
+            limit = asyncio.Semaphore(llm.LLM_PROMPT_PARALLELISM)
+
+            async def single(face: Dict) -> str:
+                async with limit:
+                    return await llm.create_networking_prompt_async(face, 60.0)
+            await asyncio.gather(*(single(face) for face in faces))
+        else:
+            await llm.create_networking_prompts_async(faces, 60.0)
+        return time.perf_counter() - start
+
+    print(f"  simulated provider: {args.rtt_ms:.0f} ms to first token + {args.ms_per_token:.1f} ms/token"
+          f" x {args.tokens_per_quest} tokens per quest,"
+          f" {args.concurrency} concurrent calls")
+    for count in args.faces:
+        faces = [{"confidence": 0.5 + 0.5 * i / max(1, count)} for i in range(count)]
+        timings = {mode: asyncio.run(run(mode, faces)) for mode in ("sequential", "gather", "batched")}
+        print(f"faces={count:>3} | " + " | ".join(f"{mode} {seconds * 1000.0:7.0f} ms" for mode, seconds in timings.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="GooseGoGeese detection benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batching = subparsers.add_parser("batching", help="YOLO micro-batching throughput at N concurrent clients")
+    batching.add_argument("--image", default=DEFAULT_IMAGE)
+    batching.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    batching.add_argument("--requests", type=int, default=20, help="requests per client")
+    batching.set_defaults(func=bench_batching)
+
+    faces = subparsers.add_parser("faces", help="MediaPipe per-call timing, fresh graph vs detector pool")
+    faces.add_argument("--image", default=DEFAULT_IMAGE)
+    faces.add_argument("--requests", type=int, default=50)
+    faces.set_defaults(func=bench_faces)
+
+    engines = subparsers.add_parser("engines", help="YOLO latency and detection drift across inference engines")
+    engines.add_argument("--frames", default=DEFAULT_IMAGE, help="an image or a directory of frames")
+    engines.add_argument("--engines", nargs="+", default=list(detect.YOLO_ENGINES))
+    engines.add_argument("--conf", type=float, default=0.5)
+    engines.add_argument("--repeat", type=int, default=5, help="passes over the frames per engine")
+    engines.set_defaults(func=bench_engines)
+
+    tiles = subparsers.add_parser("tiles", help="Tiled-mode latency and detections against tile count")
+    tiles.add_argument("--image", default=DEFAULT_IMAGE, help="a high-resolution still")
+    tiles.add_argument("--tile-sizes", type=int, nargs="+", default=[0, 1920, 1280, 960, 640],
+                       help="tile sizes in original pixels; 0 detects on the whole frame")
+    tiles.add_argument("--conf", type=float, default=0.5)
+    tiles.add_argument("--repeat", type=int, default=10)
+    tiles.set_defaults(func=bench_tiles)
+
+    prefork = subparsers.add_parser("prefork", help="Per-worker and total memory of serve.py at N workers")
+    prefork.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    prefork.add_argument("--port", type=int, default=8077)
+    prefork.set_defaults(func=bench_prefork)
+
+    faceindex = subparsers.add_parser("faceindex", help="Face index lookup cost, exact scan vs IVF, at N stored faces")
+    faceindex.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    faceindex.add_argument("--queries", type=int, default=200)
+    faceindex.add_argument("--probes", type=int, default=8, help="IVF lists scanned per lookup")
+    faceindex.set_defaults(func=bench_face_index)
+
+    fairness = subparsers.add_parser("fairness", help="Per-tenant wait under a skewed synthetic load, FIFO vs fair queue")
+    fairness.add_argument("--heavy-clients", type=int, default=16, help="concurrent streams of the one busy kiosk")
+    fairness.add_argument("--light-tenants", type=int, default=4, help="attendees sending one frame at a time")
+    fairness.add_argument("--concurrency", type=int, default=2)
+    fairness.add_argument("--service-ms", type=float, default=20.0)
+    fairness.add_argument("--think-ms", type=float, default=100.0, help="pause between an attendee's frames")
+    fairness.add_argument("--seconds", type=float, default=5.0)
+    fairness.set_defaults(func=bench_fairness)
+
+    prompts = subparsers.add_parser("prompts", help="Networking quest latency at N faces: sequential, gathered and batched calls")
+    prompts.add_argument("--faces", type=int, nargs="+", default=[1, 4, 8, 16])
+    prompts.add_argument("--rtt-ms", type=float, default=600.0, help="simulated time to first token")
+    prompts.add_argument("--ms-per-token", type=float, default=15.0, help="simulated generation time per token")
+    prompts.add_argument("--tokens-per-quest", type=int, default=25)
+    prompts.add_argument("--concurrency", type=int, default=int(os.getenv("LLM_COHERE_MAX_CONCURRENCY", "4")), help="provider concurrency limit")
+    prompts.set_defaults(func=bench_prompts)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,10 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import os
 
+from metrics import counter, timed_stage
+
+DB_ERRORS = counter("goose_db_errors_total", "DynamoDB operations that failed and fell back to a default", ["operation"])
+
 class DatabaseManager:
     def __init__(self):
         """Initialize DynamoDB connection"""
@@ -113,6 +117,7 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error creating tables: {e}")
+            DB_ERRORS.inc(operation="create_tables")
             # For demo purposes, we'll use in-memory storage
             self._use_memory_storage()
     
@@ -126,6 +131,7 @@ class DatabaseManager:
         }
         print("Using in-memory storage for demo")
     
+    @timed_stage("db.get_user_balance")
     async def get_user_balance(self, user_id: str) -> int:
         """Get user's current GooseToken balance"""
         try:
@@ -141,8 +147,10 @@ class DatabaseManager:
                 return 100
         except Exception as e:
             print(f"Error getting user balance: {e}")
+            DB_ERRORS.inc(operation="get_user_balance")
             return 100
     
+    @timed_stage("db.create_user")
     async def create_user(self, user_id: str, initial_balance: int = 100) -> Dict:
         """Create a new user with initial GooseToken balance"""
         try:
@@ -192,8 +200,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error creating user: {e}")
+            DB_ERRORS.inc(operation="create_user")
             return {'user_id': user_id, 'balance': initial_balance}
     
+    @timed_stage("db.award_tokens")
     async def award_tokens(self, user_id: str, amount: int) -> int:
         """Award GooseTokens to a user"""
         try:
@@ -218,8 +228,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error awarding tokens: {e}")
+            DB_ERRORS.inc(operation="award_tokens")
             return await self.get_user_balance(user_id)
     
+    @timed_stage("db.deduct_tokens")
     async def deduct_tokens(self, user_id: str, amount: int) -> int:
         """Deduct GooseTokens from a user"""
         try:
@@ -245,8 +257,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error deducting tokens: {e}")
+            DB_ERRORS.inc(operation="deduct_tokens")
             return await self.get_user_balance(user_id)
     
+    @timed_stage("db.complete_quest")
     async def complete_quest(self, quest_id: str, user_id: str) -> Dict:
         """Mark a quest as completed"""
         try:
@@ -266,12 +280,15 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error completing quest: {e}")
+            DB_ERRORS.inc(operation="complete_quest")
             return {'quest_id': quest_id, 'status': 'completed'}
     
+    @timed_stage("db.create_bet")
     async def create_bet(self, user_id: str, betting_line: str, stake: int) -> str:
         """Create a new bet (legacy function)"""
         return await self.create_enhanced_bet(user_id, betting_line, stake, "General", 1.0, stake)
 
+    @timed_stage("db.create_enhanced_bet")
     async def create_enhanced_bet(self, user_id: str, betting_line: str, stake: int, 
                                 sponsor: str, multiplier: float, potential_winnings: int) -> str:
         """Create an enhanced bet with sponsor information and money tracking"""
@@ -301,8 +318,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error creating enhanced bet: {e}")
+            DB_ERRORS.inc(operation="create_enhanced_bet")
             return str(uuid.uuid4())
     
+    @timed_stage("db.get_user_quests")
     async def get_user_quests(self, user_id: str) -> List[Dict]:
         """Get all quests for a user"""
         try:
@@ -320,8 +339,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error getting user quests: {e}")
+            DB_ERRORS.inc(operation="get_user_quests")
             return []
     
+    @timed_stage("db.get_user_bets")
     async def get_user_bets(self, user_id: str) -> List[Dict]:
         """Get all bets for a user"""
         try:
@@ -339,8 +360,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error getting user bets: {e}")
+            DB_ERRORS.inc(operation="get_user_bets")
             return []
     
+    @timed_stage("db.resolve_bet")
     async def resolve_bet(self, bet_id: str, won: bool) -> Dict:
         """Resolve a bet (win/lose) with money tracking"""
         try:
@@ -402,8 +425,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error resolving bet: {e}")
+            DB_ERRORS.inc(operation="resolve_bet")
             return {}
     
+    @timed_stage("db.update_money_stats")
     async def update_money_stats(self, user_id: str, bet_data: Dict):
         """Update user's money tracking statistics"""
         try:
@@ -478,7 +503,9 @@ class DatabaseManager:
                 
         except Exception as e:
             print(f"Error updating money stats: {e}")
+            DB_ERRORS.inc(operation="update_money_stats")
     
+    @timed_stage("db.get_money_stats")
     async def get_money_stats(self, user_id: str) -> Dict:
         """Get user's money tracking statistics"""
         try:
@@ -513,6 +540,7 @@ class DatabaseManager:
                 
         except Exception as e:
             print(f"Error getting money stats: {e}")
+            DB_ERRORS.inc(operation="get_money_stats")
             return {
                 'user_id': user_id,
                 'total_wagered': 0,
@@ -524,6 +552,7 @@ class DatabaseManager:
                 'sponsor_breakdown': {}
             }
     
+    @timed_stage("db.create_quest_batch")
     async def create_quest_batch(self, user_id: str, quests: List[Dict]) -> List[Dict]:
         """Create a batch of quests for a user to choose from"""
         try:
@@ -553,8 +582,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error creating quest batch: {e}")
+            DB_ERRORS.inc(operation="create_quest_batch")
             return []
     
+    @timed_stage("db.accept_quest")
     async def accept_quest(self, quest_id: str, user_id: str) -> Dict:
         """Accept a quest from a batch (change status from pending to active)"""
         try:
@@ -586,8 +617,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error accepting quest: {e}")
+            DB_ERRORS.inc(operation="accept_quest")
             return {}
     
+    @timed_stage("db.reject_quest")
     async def reject_quest(self, quest_id: str, user_id: str) -> bool:
         """Reject a quest from a batch (remove it)"""
         try:
@@ -614,8 +647,10 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error rejecting quest: {e}")
+            DB_ERRORS.inc(operation="reject_quest")
             return False
     
+    @timed_stage("db.get_pending_quests")
     async def get_pending_quests(self, user_id: str) -> List[Dict]:
         """Get all pending quests for a user (from quest batches)"""
         try:
@@ -639,4 +674,5 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"Error getting pending quests: {e}")
+            DB_ERRORS.inc(operation="get_pending_quests")
             return []
\ No newline at end of file
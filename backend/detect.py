@@ -1,19 +1,76 @@
 import cv2
+import fcntl
 import numpy as np
-from ultralytics import YOLO
-import mediapipe as mp
-import face_recognition
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, NamedTuple, Tuple, Optional, Union
 import os
 from PIL import Image
 import io
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 
-# Initialize YOLO v8 model
+from metrics import histogram, stage_timer, timed_stage
+from sponsors import SponsorMapping
+
+# Initialize YOLO v8 model. Ultralytics and MediaPipe are imported on first use (or by the
+# startup warmup) so importing this module stays cheap.
 yolo_model = None
+yolo_engine = None
+# Every loaded model by weights name; yolo_model is the one for YOLO_MODEL
+yolo_models: Dict[str, object] = {}
+_yolo_load_lock = threading.Lock()
+
+# Inference engine for YOLO: "torch" runs the PyTorch weights; "onnx", "openvino" and
+# "openvino-int8" export the model once and cache the artefact in YOLO_EXPORT_DIR
+YOLO_MODEL = os.getenv("YOLO_MODEL", "yolov8n.pt")
+YOLO_ENGINE = os.getenv("YOLO_ENGINE", "torch").lower()
+YOLO_IMGSZ = int(os.getenv("YOLO_IMGSZ", "640"))
+YOLO_EXPORT_DIR = os.getenv("YOLO_EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+# Sample camera frames used to calibrate the INT8 model
+YOLO_CALIBRATION_DIR = os.getenv("YOLO_CALIBRATION_DIR", os.path.join(YOLO_EXPORT_DIR, "calibration"))
+
+# Micro-batching of concurrent YOLO requests (see InferenceScheduler)
+YOLO_BATCHING_ENABLED = os.getenv("YOLO_BATCHING", "true").lower() == "true"
+YOLO_BATCH_SIZE = int(os.getenv("YOLO_BATCH_SIZE", "8"))
+YOLO_BATCH_WAIT_MS = float(os.getenv("YOLO_BATCH_WAIT_MS", "5"))
+YOLO_QUEUE_DEPTH = int(os.getenv("YOLO_QUEUE_DEPTH", "64"))
+
+# Confidence fallback chain for detect_objects_enhanced. In single-pass mode YOLO runs once
+# at the lowest threshold and the higher thresholds are applied by filtering the boxes.
+YOLO_FALLBACK_THRESHOLDS = [float(t) for t in os.getenv("YOLO_FALLBACK_THRESHOLDS", "0.3").split(",") if t.strip()]
+YOLO_SINGLE_PASS_FALLBACK = os.getenv("YOLO_SINGLE_PASS_FALLBACK", "true").lower() == "true"
+
+# Shared decode stage: JPEGs much larger than the model input are decoded at 1/2, 1/4 or 1/8
+# scale straight from the DCT coefficients, and coordinates are mapped back to the original size
+DECODE_REDUCED_JPEG = os.getenv("DECODE_REDUCED_JPEG", "true").lower() == "true"
+YOLO_DECODE_SIZE = int(os.getenv("YOLO_DECODE_SIZE", "640"))
+FACE_DECODE_SIZE = int(os.getenv("FACE_DECODE_SIZE", "640"))
+
+# Tiled mode for high-resolution stills: the full-resolution frame is cut into overlapping
+# tiles that run as one YOLO batch, so small objects are not lost to the downscale.
+# Opt-in per call (tiled=True) or for every object detection with YOLO_TILED_MODE.
+YOLO_TILED_MODE = os.getenv("YOLO_TILED_MODE", "false").lower() == "true"
+YOLO_TILE_SIZE = int(os.getenv("YOLO_TILE_SIZE", "1280"))
+YOLO_TILE_OVERLAP = float(os.getenv("YOLO_TILE_OVERLAP", "0.2"))
+# Frames whose long side is below this are detected whole
+YOLO_TILE_MIN_SIDE = int(os.getenv("YOLO_TILE_MIN_SIDE", "1920"))
+# Also run the whole frame so objects larger than a tile are still found
+YOLO_TILE_FULL_FRAME = os.getenv("YOLO_TILE_FULL_FRAME", "true").lower() == "true"
+YOLO_TILE_NMS_IOU = float(os.getenv("YOLO_TILE_NMS_IOU", "0.5"))
 
-# Initialize MediaPipe face detection
-mp_face_detection = mp.solutions.face_detection
-mp_drawing = mp.solutions.drawing_utils
+# MediaPipe face detection solution, imported on first use
+mp_face_detection = None
+
+# face_recognition (dlib) embeddings of detected faces, used to recognise repeat people.
+# The module is imported on first use; False once the import has failed.
+FACE_EMBEDDINGS_ENABLED = os.getenv("FACE_EMBEDDINGS", "true").lower() == "true"
+face_recognition_module = None
+
+# Long-lived FaceDetection instances per (model_selection, confidence); one per concurrent job
+FACE_DETECTOR_POOL_SIZE = int(os.getenv("FACE_DETECTOR_POOL_SIZE", os.getenv("INFERENCE_JOBS_PER_WORKER", "4")))
 
 # COCO class names for YOLO v8
 COCO_CLASSES = [
@@ -29,225 +86,633 @@ COCO_CLASSES = [
     'refrigerator', 'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier', 'toothbrush'
 ]
 
-def load_yolo_model():
-    """Load YOLO v8 model for object detection"""
-    global yolo_model
+def _yolo_class():
+    from ultralytics import YOLO
+    return YOLO
+
+def get_mp_face_detection():
+    """MediaPipe's face detection solution, importing mediapipe on first use"""
+    global mp_face_detection
+    if mp_face_detection is None:
+        import mediapipe as mp
+        mp_face_detection = mp.solutions.face_detection
+    return mp_face_detection
+
+def get_face_recognition():
+    """The face_recognition module, imported on first use; None when embeddings are off or it is not installed"""
+    global face_recognition_module
+    if not FACE_EMBEDDINGS_ENABLED or face_recognition_module is False:
+        return None
+    if face_recognition_module is None:
+        try:
+            import face_recognition
+            face_recognition_module = face_recognition
+        except ImportError as e:
+            print(f"⚠️ face_recognition is not available, repeat faces will not be recognised: {e}")
+            face_recognition_module = False
+            return None
+    return face_recognition_module
+
+class YoloEngine(NamedTuple):
+    export_format: Optional[str]  # None runs the PyTorch weights directly
+    int8: bool = False
+
+YOLO_ENGINES = {
+    "torch": YoloEngine(None),
+    "onnx": YoloEngine("onnx"),
+    "openvino": YoloEngine("openvino"),
+    "openvino-int8": YoloEngine("openvino", int8=True)
+}
+
+def yolo_engine_artefact(engine: str, model: Optional[str] = None) -> str:
+    """Path of the cached export for an engine; Ultralytics picks the runtime from the suffix"""
+    stem = os.path.splitext(os.path.basename(model or YOLO_MODEL))[0]
+    spec = YOLO_ENGINES[engine]
+    name = f"{stem}_{YOLO_IMGSZ}" + ("_int8" if spec.int8 else "")
+    if spec.export_format == "onnx":
+        return os.path.join(YOLO_EXPORT_DIR, f"{name}.onnx")
+    return os.path.join(YOLO_EXPORT_DIR, f"{name}_openvino_model")
+
+def _calibration_data_yaml() -> str:
+    """Dataset yaml over the unlabeled calibration frames, as the INT8 exporter expects"""
+    frames = [f for f in os.listdir(YOLO_CALIBRATION_DIR)
+              if f.lower().endswith((".jpg", ".jpeg", ".png"))] if os.path.isdir(YOLO_CALIBRATION_DIR) else []
+    if not frames:
+        raise FileNotFoundError(f"No calibration frames in {YOLO_CALIBRATION_DIR}")
+
+    path = os.path.join(YOLO_EXPORT_DIR, "calibration.yaml")
+    with open(path, "w") as f:
+        f.write(f"path: {os.path.abspath(YOLO_CALIBRATION_DIR)}\ntrain: .\nval: .\nnames:\n")
+        for class_id, name in enumerate(COCO_CLASSES):
+            f.write(f"  {class_id}: {name}\n")
+    print(f"📐 Calibrating INT8 model on {len(frames)} frames from {YOLO_CALIBRATION_DIR}")
+    return path
+
+def export_yolo_model(engine: str, force: bool = False, model: Optional[str] = None) -> str:
+    """Export a model (YOLO_MODEL by default) for an engine, reusing the cached artefact unless force is set"""
+    model = model or YOLO_MODEL
+    spec = YOLO_ENGINES[engine]
+    if spec.export_format is None:
+        return model
+
+    artefact = yolo_engine_artefact(engine, model)
+    if os.path.exists(artefact) and not force:
+        return artefact
+
+    os.makedirs(YOLO_EXPORT_DIR, exist_ok=True)
+    # Inference workers start together; only one of them exports, the others wait and reuse it
+    with open(f"{artefact}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(artefact) and not force:
+            return artefact
+
+        start = time.perf_counter()
+        options = {"format": spec.export_format, "imgsz": YOLO_IMGSZ, "dynamic": True}
+        if spec.int8:
+            options.update(int8=True, data=_calibration_data_yaml())
+        exported = _yolo_class()(model).export(**options)
+
+        if os.path.isdir(artefact):
+            shutil.rmtree(artefact)
+        elif os.path.exists(artefact):
+            os.remove(artefact)
+        shutil.move(str(exported), artefact)
+        print(f"✅ Exported YOLO model for {engine} to {artefact} in {time.perf_counter() - start:.1f}s")
+        return artefact
+
+def load_yolo_model(engine: Optional[str] = None, model: Optional[str] = None):
+    """Load YOLO v8 model for object detection with the configured engine"""
+    global yolo_model, yolo_engine
+    engine = engine or YOLO_ENGINE
+    model = model or YOLO_MODEL
+    if engine not in YOLO_ENGINES:
+        print(f"⚠️ Unknown YOLO_ENGINE '{engine}', using torch")
+        engine = "torch"
     try:
         # Use YOLOv8n (nano) for faster inference, or YOLOv8s/m/l for better accuracy
-        yolo_model = YOLO('yolov8n.pt')  # This will auto-download the model
-        print("✅ YOLO v8 model loaded successfully!")
+        loaded = _yolo_class()(export_yolo_model(engine, model=model), task="detect")  # This will auto-download the model
+        yolo_models[model] = loaded
+        if model == YOLO_MODEL:
+            yolo_model = loaded
+            yolo_engine = engine
+        print(f"✅ YOLO v8 model loaded successfully! ({model}, engine: {engine})")
         return True
     except Exception as e:
-        print(f"❌ Error loading YOLO v8 model: {e}")
+        print(f"❌ Error loading YOLO v8 model {model} with engine {engine}: {e}")
+        if engine != "torch":
+            return load_yolo_model("torch", model)
         return False
 
+def get_yolo_model(model: Optional[str] = None):
+    """Loaded model for the given weights (YOLO_MODEL by default), loading it on first use; None if it cannot load"""
+    model = model or YOLO_MODEL
+    loaded = yolo_models.get(model)
+    if loaded is None:
+        with _yolo_load_lock:
+            if model not in yolo_models and not load_yolo_model(model=model):
+                return None
+            loaded = yolo_models[model]
+    return loaded
+
+def yolo_decode_size(imgsz: int) -> int:
+    """Decode size for an inference size, keeping YOLO_DECODE_SIZE's ratio to YOLO_IMGSZ"""
+    return max(1, round(YOLO_DECODE_SIZE * imgsz / YOLO_IMGSZ))
+
 def get_sponsor_category(object_name: str) -> Optional[Dict]:
     """Map detected objects to sponsor categories and betting opportunities"""
-    sponsor_mapping = {
-        # Tech Giants
-        'laptop': {"category": "tech_giants", "sponsor": "Tech Giants", "multiplier": 1.5},
-        'mouse': {"category": "tech_giants", "sponsor": "Tech Giants", "multiplier": 1.3},
-        'keyboard': {"category": "tech_giants", "sponsor": "Tech Giants", "multiplier": 1.3},
-        'cell phone': {"category": "tech_giants", "sponsor": "Tech Giants", "multiplier": 1.4},
-        'tv': {"category": "tech_giants", "sponsor": "Tech Giants", "multiplier": 1.2},
-        'remote': {"category": "tech_giants", "sponsor": "Tech Giants", "multiplier": 1.1},
-        'monitor': {"category": "tech_giants", "sponsor": "Tech Giants", "multiplier": 1.3},
-        'computer': {"category": "tech_giants", "sponsor": "Tech Giants", "multiplier": 1.4},
-        'tablet': {"category": "tech_giants", "sponsor": "Tech Giants", "multiplier": 1.3},
-        
-        # Food & Beverage
-        'bottle': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.2},
-        'wine glass': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.3},
-        'cup': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'coffee cup': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.2},
-        'water bottle': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.2},
-        'mug': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'thermos': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.2},
-        'fork': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'knife': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'spoon': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'bowl': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.2},
-        'banana': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'apple': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'sandwich': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.2},
-        'orange': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'broccoli': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'carrot': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.1},
-        'hot dog': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.2},
-        'pizza': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.3},
-        'donut': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.2},
-        'cake': {"category": "food_beverage", "sponsor": "Food & Beverage", "multiplier": 1.3},
-        
-        # Transportation
-        'car': {"category": "transportation", "sponsor": "Transportation", "multiplier": 1.8},
-        'motorcycle': {"category": "transportation", "sponsor": "Transportation", "multiplier": 1.6},
-        'airplane': {"category": "transportation", "sponsor": "Transportation", "multiplier": 2.0},
-        'bus': {"category": "transportation", "sponsor": "Transportation", "multiplier": 1.7},
-        'train': {"category": "transportation", "sponsor": "Transportation", "multiplier": 1.8},
-        'truck': {"category": "transportation", "sponsor": "Transportation", "multiplier": 1.7},
-        'boat': {"category": "transportation", "sponsor": "Transportation", "multiplier": 1.8},
-        'bicycle': {"category": "transportation", "sponsor": "Transportation", "multiplier": 1.4},
-        
-        # Sports & Recreation
-        'sports ball': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.5},
-        'frisbee': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.3},
-        'skis': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.6},
-        'snowboard': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.6},
-        'kite': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.2},
-        'baseball bat': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.4},
-        'baseball glove': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.3},
-        'skateboard': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.4},
-        'surfboard': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.6},
-        'tennis racket': {"category": "sports", "sponsor": "Sports & Recreation", "multiplier": 1.4},
-        
-        # Animals
-        'bird': {"category": "animals", "sponsor": "Wildlife", "multiplier": 1.2},
-        'cat': {"category": "animals", "sponsor": "Pet Care", "multiplier": 1.3},
-        'dog': {"category": "animals", "sponsor": "Pet Care", "multiplier": 1.4},
-        'horse': {"category": "animals", "sponsor": "Wildlife", "multiplier": 1.5},
-        'sheep': {"category": "animals", "sponsor": "Wildlife", "multiplier": 1.3},
-        'cow': {"category": "animals", "sponsor": "Wildlife", "multiplier": 1.4},
-        'elephant': {"category": "animals", "sponsor": "Wildlife", "multiplier": 1.8},
-        'bear': {"category": "animals", "sponsor": "Wildlife", "multiplier": 1.7},
-        'zebra': {"category": "animals", "sponsor": "Wildlife", "multiplier": 1.6},
-        'giraffe': {"category": "animals", "sponsor": "Wildlife", "multiplier": 1.7},
-        
-        # Furniture & Home
-        'chair': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.1},
-        'couch': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.2},
-        'potted plant': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.1},
-        'bed': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.2},
-        'dining table': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.2},
-        'toilet': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.1},
-        'microwave': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.2},
-        'oven': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.2},
-        'toaster': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.1},
-        'sink': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.1},
-        'refrigerator': {"category": "furniture", "sponsor": "Home & Garden", "multiplier": 1.3},
-        
-        # Personal Items
-        'backpack': {"category": "personal", "sponsor": "Fashion", "multiplier": 1.2},
-        'handbag': {"category": "personal", "sponsor": "Fashion", "multiplier": 1.3},
-        'tie': {"category": "personal", "sponsor": "Fashion", "multiplier": 1.1},
-        'suitcase': {"category": "personal", "sponsor": "Travel", "multiplier": 1.2},
-        'book': {"category": "personal", "sponsor": "Education", "multiplier": 1.1},
-        'clock': {"category": "personal", "sponsor": "Home & Garden", "multiplier": 1.1},
-        'vase': {"category": "personal", "sponsor": "Home & Garden", "multiplier": 1.1},
-        'scissors': {"category": "personal", "sponsor": "Office Supplies", "multiplier": 1.1},
-        'teddy bear': {"category": "personal", "sponsor": "Toys", "multiplier": 1.2},
-        'hair drier': {"category": "personal", "sponsor": "Beauty", "multiplier": 1.2},
-        'toothbrush': {"category": "personal", "sponsor": "Health", "multiplier": 1.1},
-        'umbrella': {"category": "personal", "sponsor": "Fashion", "multiplier": 1.1},
-        'glasses': {"category": "personal", "sponsor": "Health", "multiplier": 1.1},
-        'watch': {"category": "personal", "sponsor": "Fashion", "multiplier": 1.2},
-        
-        # People
-        'person': {"category": "people", "sponsor": "Social", "multiplier": 1.5},
+    by_name = sponsor_mapping.table().by_name
+    info = by_name.get(object_name)
+    if info is None:
+        info = by_name.get(object_name.lower())
+    return dict(info) if info is not None else None
+
+class DecodedFrame(NamedTuple):
+    """A decoded frame in the colour order a model wants, plus the size of the original upload"""
+    image: np.ndarray
+    color: str
+    original_width: int
+    original_height: int
+    
+    @property
+    def scale_x(self) -> float:
+        return self.original_width / self.image.shape[1]
+    
+    @property
+    def scale_y(self) -> float:
+        return self.original_height / self.image.shape[0]
+
+ImageInput = Union[bytes, np.ndarray, DecodedFrame]
+
+_CV2_REDUCED_COLOR_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8
+}
+
+def _jpeg_reduction_factor(image: Image.Image, target_size: Optional[int]) -> int:
+    """Largest DCT scale (1/2, 1/4, 1/8) that keeps the long side at or above target_size"""
+    if not DECODE_REDUCED_JPEG or not target_size or image.format != "JPEG":
+        return 1
+    longest = max(image.size)
+    for factor in (8, 4, 2):
+        if longest / factor >= target_size:
+            return factor
+    return 1
+
+@timed_stage("decode")
+def decode_frame(image_bytes: bytes, color: str = "bgr", target_size: Optional[int] = None) -> DecodedFrame:
+    """Decode upload bytes once, directly into the colour order the model needs.
+    
+    PIL only reads the header here to get the size and format; the pixels are decoded
+    by OpenCV for BGR (YOLO) and by PIL for RGB (MediaPipe). Alpha, palette and
+    greyscale inputs always come out as 3-channel frames.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    original_width, original_height = image.size
+    factor = _jpeg_reduction_factor(image, target_size)
+    
+    if color == "rgb":
+        if factor > 1:
+            image.draft("RGB", (-(-original_width // factor), -(-original_height // factor)))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return DecodedFrame(np.asarray(image), "rgb", original_width, original_height)
+    
+    # Orientation is ignored to match the PIL decode path
+    flags = _CV2_REDUCED_COLOR_FLAGS[factor] | cv2.IMREAD_IGNORE_ORIENTATION
+    pixels = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), flags)
+    if pixels is None:
+        # Formats OpenCV cannot read (e.g. GIF) go through PIL
+        pixels = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+    return DecodedFrame(pixels, "bgr", original_width, original_height)
+
+def decode_reduced_grey(image_bytes: bytes) -> np.ndarray:
+    """Greyscale frame for frame comparison; JPEGs are decoded at 1/8 scale"""
+    pixels = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8),
+                          cv2.IMREAD_REDUCED_GRAYSCALE_8 | cv2.IMREAD_IGNORE_ORIENTATION)
+    if pixels is None:
+        pixels = np.asarray(Image.open(io.BytesIO(image_bytes)).convert("L"))
+    return pixels
+
+def decode_thumbnail(image: Union[bytes, np.ndarray], width: int, height: int) -> np.ndarray:
+    """Cheap greyscale thumbnail of upload bytes or of a frame from decode_reduced_grey"""
+    pixels = image if isinstance(image, np.ndarray) else decode_reduced_grey(image)
+    return cv2.resize(pixels, (width, height), interpolation=cv2.INTER_AREA)
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """Decode uploaded image bytes into a full-resolution BGR frame"""
+    return decode_frame(image_bytes).image
+
+def _as_frame(image: ImageInput, color: str = "bgr", target_size: Optional[int] = None) -> DecodedFrame:
+    """Accept raw upload bytes, a decoded frame or a bare BGR array and return it in the requested colour order"""
+    if isinstance(image, DecodedFrame):
+        frame = image
+    elif isinstance(image, np.ndarray):
+        frame = DecodedFrame(image, "bgr", image.shape[1], image.shape[0])
+    else:
+        return decode_frame(image, color, target_size)
+    
+    if frame.color != color:
+        code = cv2.COLOR_BGR2RGB if color == "rgb" else cv2.COLOR_RGB2BGR
+        frame = frame._replace(image=cv2.cvtColor(frame.image, code), color=color)
+    return frame
+
+def _empty_detection_result() -> Dict:
+    """Detection result returned when the model is unavailable or inference fails"""
+    return {
+        "objects": [],
+        "sponsor_categories": [],
+        "betting_opportunities": [],
+        "total_objects": 0,
+        "detections": []
     }
+
+CLASS_NAMES = np.array(COCO_CLASSES, dtype=object)
+
+# Sponsor info per class id, compiled from sponsors.json and swapped when the file changes
+sponsor_mapping = SponsorMapping(COCO_CLASSES)
+
+@timed_stage("sponsor_mapping")
+def detection_result_from_arrays(xyxy: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray,
+                                 min_confidence: float = 0.0, track_ids: Optional[np.ndarray] = None) -> Dict:
+    """Build the detection dict from box arrays, keeping boxes at or above min_confidence.
+    
+    When track_ids is given, each detection also carries its stable "track_id".
+    """
+    class_ids = class_ids.astype(np.int64)
+    keep = (confidences >= min_confidence) & (class_ids >= 0) & (class_ids < len(COCO_CLASSES))
+    xyxy, confidences, class_ids = xyxy[keep], confidences[keep], class_ids[keep]
+    
+    # Integer geometry for all boxes at once (truncation matches int() on each value)
+    xs = xyxy[:, 0].astype(np.int64).tolist()
+    ys = xyxy[:, 1].astype(np.int64).tolist()
+    widths = (xyxy[:, 2] - xyxy[:, 0]).astype(np.int64).tolist()
+    heights = (xyxy[:, 3] - xyxy[:, 1]).astype(np.int64).tolist()
+    labels = CLASS_NAMES[class_ids].tolist()
+    confidence_list = confidences.astype(np.float64).tolist()
+    class_id_list = class_ids.tolist()
+    
+    detections = [
+        {
+            "x": x,
+            "y": y,
+            "width": width,
+            "height": height,
+            "label": label,
+            "confidence": confidence,
+            "class": label,
+            "class_id": class_id
+        }
+        for x, y, width, height, label, confidence, class_id
+        in zip(xs, ys, widths, heights, labels, confidence_list, class_id_list)
+    ]
+    if track_ids is not None:
+        for detection, track_id in zip(detections, track_ids[keep].tolist()):
+            detection["track_id"] = track_id
+    
+    # Sponsor info is resolved through the class-id tables rather than per-box dict lookups;
+    # one table reference keeps the whole result on a single mapping version
+    sponsors = sponsor_mapping.table()
+    sponsored = sponsors.has_sponsor[class_ids]
+    sponsored_ids = class_ids[sponsored]
+    betting_opportunities = [
+        {
+            "object": label,
+            "sponsor": sponsor,
+            "multiplier": multiplier,
+            "confidence": confidence
+        }
+        for label, sponsor, multiplier, confidence in zip(
+            CLASS_NAMES[sponsored_ids].tolist(),
+            sponsors.sponsor[sponsored_ids].tolist(),
+            sponsors.multiplier[sponsored_ids].tolist(),
+            confidences[sponsored].astype(np.float64).tolist()
+        )
+    ]
     
-    return sponsor_mapping.get(object_name.lower())
+    return {
+        "objects": labels,
+        "sponsor_categories": list(set(sponsors.category[sponsored_ids].tolist())),
+        "betting_opportunities": betting_opportunities,
+        "total_objects": len(labels),
+        "detections": detections
+    }
 
-def detect_objects_yolo_v8(image_bytes: bytes, confidence_threshold: float = 0.5) -> Dict:
-    """Detect objects using YOLO v8 with enhanced bounding box accuracy"""
-    global yolo_model
+def _result_arrays(results) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Copy the box tensors of YOLO results to NumPy in one transfer per tensor"""
+    xyxy_parts, confidence_parts, class_parts = [], [], []
+    for result in results:
+        boxes = result.boxes
+        if boxes is not None and len(boxes):
+            xyxy_parts.append(boxes.xyxy.cpu().numpy())
+            confidence_parts.append(boxes.conf.cpu().numpy())
+            class_parts.append(boxes.cls.cpu().numpy())
     
-    if yolo_model is None:
-        if not load_yolo_model():
-            return {
-                "objects": [],
-                "sponsor_categories": [],
-                "betting_opportunities": [],
-                "total_objects": 0,
-                "detections": []
-            }
+    if not xyxy_parts:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    return np.concatenate(xyxy_parts), np.concatenate(confidence_parts), np.concatenate(class_parts)
+
+def _frame_result_arrays(raw, frame: "DecodedFrame") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Box arrays of one frame's YOLO result, mapped back to the original image size"""
+    xyxy, confidences, class_ids = _result_arrays([raw])
+    if frame.scale_x != 1.0 or frame.scale_y != 1.0:
+        xyxy = xyxy * np.array([frame.scale_x, frame.scale_y, frame.scale_x, frame.scale_y], dtype=xyxy.dtype)
+    return xyxy, confidences, class_ids
+
+YOLO_BATCH_FRAMES = histogram("goose_yolo_batch_frames", "Frames per YOLO forward pass of the batching scheduler",
+                              buckets=(1, 2, 4, 8, 16, 32, 64))
+
+class InferenceScheduler:
+    """Collects frames from concurrent requests and runs them through YOLO as one batch.
     
-    try:
-        # Convert bytes to image
-        image = Image.open(io.BytesIO(image_bytes))
-        image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # Run YOLO v8 inference
-        results = yolo_model(image_cv, conf=confidence_threshold, verbose=False)
-        
-        detected_objects = []
-        sponsor_categories = set()
-        betting_opportunities = []
-        detections = []
-        
-        # Process results
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get bounding box coordinates
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = float(box.conf[0].cpu().numpy())
-                    class_id = int(box.cls[0].cpu().numpy())
-                    
-                    # Get class name
-                    if class_id < len(COCO_CLASSES):
-                        object_name = COCO_CLASSES[class_id]
-                        detected_objects.append(object_name)
-                        
-                        # Calculate width and height
-                        width = int(x2 - x1)
-                        height = int(y2 - y1)
-                        x = int(x1)
-                        y = int(y1)
-                        
-                        # Store detection with precise coordinates
-                        detection = {
-                            "x": x,
-                            "y": y,
-                            "width": width,
-                            "height": height,
-                            "label": object_name,
-                            "confidence": confidence,
-                            "class": object_name,
-                            "class_id": class_id
-                        }
-                        detections.append(detection)
-                        
-                        # Get sponsor category
-                    category_info = get_sponsor_category(object_name)
-                    if category_info:
-                        sponsor_categories.add(category_info["category"])
-                        betting_opportunities.append({
-                            "object": object_name,
-                            "sponsor": category_info["sponsor"],
-                            "multiplier": category_info["multiplier"],
-                                "confidence": confidence
-                        })
-        
+    A batch is closed as soon as it holds ``max_batch_size`` frames or ``max_wait_ms``
+    has passed since its first frame arrived. Callers block on a per-frame future and
+    get back the same YOLO result a single-frame call would produce.
+    """
+    
+    def __init__(self, max_batch_size: int = YOLO_BATCH_SIZE, max_wait_ms: float = YOLO_BATCH_WAIT_MS,
+                 queue_depth: int = YOLO_QUEUE_DEPTH):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        # put() blocks once queue_depth frames are waiting, which bounds memory under load
+        self._queue: "queue.Queue[Tuple[np.ndarray, Tuple[float, str, int], Future]]" = queue.Queue(maxsize=max(1, queue_depth))
+        self._stats_lock = threading.Lock()
+        self.batches_run = 0
+        self.frames_run = 0
+        self._worker = threading.Thread(target=self._run, name="yolo-batch-scheduler", daemon=True)
+        self._worker.start()
+    
+    def submit(self, image_cv: np.ndarray, confidence_threshold: float, model: Optional[str] = None,
+               imgsz: Optional[int] = None) -> Future:
+        """Queue a BGR frame for inference and return a future for its YOLO result"""
+        future = Future()
+        self._queue.put((image_cv, (confidence_threshold, model or YOLO_MODEL, imgsz or YOLO_IMGSZ), future))
+        return future
+    
+    def infer(self, image_cv: np.ndarray, confidence_threshold: float, model: Optional[str] = None,
+              imgsz: Optional[int] = None):
+        """Blocking helper around submit()"""
+        return self.submit(image_cv, confidence_threshold, model, imgsz).result()
+    
+    def stats(self) -> Dict:
+        """Batching counters for benchmarks and monitoring"""
+        with self._stats_lock:
+            batches, frames = self.batches_run, self.frames_run
         return {
-            "objects": detected_objects,
-            "sponsor_categories": list(sponsor_categories),
-            "betting_opportunities": betting_opportunities,
-            "total_objects": len(detected_objects),
-            "detections": detections
+            "batches_run": batches,
+            "frames_run": frames,
+            "avg_batch_size": frames / batches if batches else 0.0,
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0
         }
     
+    def _collect_batch(self) -> List[Tuple[np.ndarray, Tuple[float, str, int], Future]]:
+        """Block for the first frame, then gather more until the batch is full or the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            
+            # YOLO takes a single conf and size per call, so frames are grouped by those and the model
+            groups: Dict[Tuple[float, str, int], List[Tuple[np.ndarray, Future]]] = {}
+            for image_cv, key, future in batch:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(key, []).append((image_cv, future))
+            
+            for (confidence_threshold, model, imgsz), items in groups.items():
+                try:
+                    YOLO_BATCH_FRAMES.observe(len(items))
+                    results = yolo_models[model]([image_cv for image_cv, _ in items], conf=confidence_threshold,
+                                                 imgsz=imgsz, verbose=False)
+                    for (_, future), result in zip(items, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+            
+            with self._stats_lock:
+                self.batches_run += 1
+                self.frames_run += len(batch)
+
+_inference_scheduler: Optional[InferenceScheduler] = None
+_inference_scheduler_lock = threading.Lock()
+
+def get_inference_scheduler() -> InferenceScheduler:
+    """Return the process-wide batching scheduler, starting it on first use"""
+    global _inference_scheduler
+    if _inference_scheduler is None:
+        with _inference_scheduler_lock:
+            if _inference_scheduler is None:
+                _inference_scheduler = InferenceScheduler()
+    return _inference_scheduler
+
+def _yolo_results(images: List[np.ndarray], confidence_threshold: float, loaded, model: Optional[str],
+                  imgsz: int) -> List:
+    """Raw YOLO results for several frames, through the micro-batching scheduler when enabled"""
+    with stage_timer("yolo"):
+        if YOLO_BATCHING_ENABLED:
+            scheduler = get_inference_scheduler()
+            futures = [scheduler.submit(image, confidence_threshold, model, imgsz) for image in images]
+            return [future.result() for future in futures]
+        
+        return loaded(images if len(images) > 1 else images[0], conf=confidence_threshold, imgsz=imgsz, verbose=False)
+
+def tile_grid(width: int, height: int, tile_size: int = YOLO_TILE_SIZE,
+              overlap: float = YOLO_TILE_OVERLAP) -> List[Tuple[int, int, int, int]]:
+    """Overlapping xyxy tiles covering the frame, spread evenly so every overlap is at least `overlap` of a tile"""
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        count = int(np.ceil((length - tile_size * overlap) / (tile_size * (1.0 - overlap))))
+        return np.linspace(0, length - tile_size, max(2, count)).astype(int).tolist()
+    
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+def class_aware_nms(xyxy: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray,
+                    iou_threshold: float = YOLO_TILE_NMS_IOU) -> np.ndarray:
+    """Indices of the boxes kept by greedy NMS, applied within each class only"""
+    if not len(xyxy):
+        return np.zeros(0, dtype=np.int64)
+    # Shifting each class into its own coordinate range keeps boxes of different classes from overlapping
+    boxes = xyxy.astype(np.float64) + class_ids.astype(np.float64)[:, None] * (float(xyxy.max()) + 1.0)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-confidences, kind="stable")
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        top_left = np.maximum(boxes[best, :2], boxes[rest, :2])
+        bottom_right = np.minimum(boxes[best, 2:], boxes[rest, 2:])
+        intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+        iou = intersection / np.maximum(areas[best] + areas[rest] - intersection, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+YOLO_TILES_PER_FRAME = histogram("goose_yolo_tiles_per_frame", "Tiles run per frame in tiled mode",
+                                 buckets=(1, 2, 4, 6, 9, 12, 16, 25, 36))
+
+def _tiled_yolo_arrays(frame: DecodedFrame, confidence_threshold: float, loaded, model: Optional[str],
+                       imgsz: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Detect on overlapping tiles (plus the whole frame) and merge with class-aware NMS"""
+    height, width = frame.image.shape[:2]
+    tiles = tile_grid(width, height)
+    crops = [frame.image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+    offsets = [(x1, y1) for x1, y1, _, _ in tiles]
+    if YOLO_TILE_FULL_FRAME and len(tiles) > 1:
+        crops.append(frame.image)
+        offsets.append((0, 0))
+    YOLO_TILES_PER_FRAME.observe(len(crops))
+    
+    results = _yolo_results(crops, confidence_threshold, loaded, model, imgsz)
+    parts = []
+    for raw, (x, y) in zip(results, offsets):
+        xyxy, confidences, class_ids = _result_arrays([raw])
+        parts.append((xyxy + np.array([x, y, x, y], dtype=xyxy.dtype), confidences, class_ids))
+    xyxy = np.concatenate([part[0] for part in parts])
+    confidences = np.concatenate([part[1] for part in parts])
+    class_ids = np.concatenate([part[2] for part in parts])
+    
+    keep = class_aware_nms(xyxy, confidences, class_ids)
+    xyxy, confidences, class_ids = xyxy[keep], confidences[keep], class_ids[keep]
+    if frame.scale_x != 1.0 or frame.scale_y != 1.0:
+        xyxy = xyxy * np.array([frame.scale_x, frame.scale_y, frame.scale_x, frame.scale_y], dtype=xyxy.dtype)
+    return xyxy, confidences, class_ids
+
+def _yolo_arrays(image: ImageInput, confidence_threshold: float, model: Optional[str] = None,
+                 imgsz: Optional[int] = None, tiled: Optional[bool] = None) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Run YOLO v8 on one frame and return box arrays in original image coordinates, or None if detection is unavailable.
+    
+    model and imgsz select a cheaper inference tier; they default to YOLO_MODEL at YOLO_IMGSZ.
+    tiled (default YOLO_TILED_MODE) detects on overlapping full-resolution tiles of large frames.
+    """
+    loaded = get_yolo_model(model)
+    if loaded is None:
+        return None
+    imgsz = imgsz or YOLO_IMGSZ
+    if tiled is None:
+        tiled = YOLO_TILED_MODE
+    
+    try:
+        if tiled:
+            frame = _as_frame(image, "bgr")
+            if max(frame.image.shape[:2]) >= YOLO_TILE_MIN_SIDE:
+                return _tiled_yolo_arrays(frame, confidence_threshold, loaded, model, imgsz)
+        else:
+            frame = _as_frame(image, "bgr", yolo_decode_size(imgsz))
+        
+        # Run YOLO v8 inference, batched with other in-flight requests when enabled
+        raw = _yolo_results([frame.image], confidence_threshold, loaded, model, imgsz)[0]
+        return _frame_result_arrays(raw, frame)
+    
     except Exception as e:
         print(f"❌ Error in YOLO v8 detection: {e}")
-        return {
-            "objects": [],
-            "sponsor_categories": [],
-            "betting_opportunities": [],
-            "total_objects": 0,
-            "detections": []
-        }
+        return None
+
+def detect_objects_yolo_v8(image: ImageInput, confidence_threshold: float = 0.5, model: Optional[str] = None,
+                           imgsz: Optional[int] = None, tiled: Optional[bool] = None) -> Dict:
+    """Detect objects using YOLO v8 with enhanced bounding box accuracy"""
+    arrays = _yolo_arrays(image, confidence_threshold, model, imgsz, tiled)
+    if arrays is None:
+        return _empty_detection_result()
+    
+    try:
+        return detection_result_from_arrays(*arrays)
+    except Exception as e:
+        print(f"❌ Error in YOLO v8 detection: {e}")
+        return _empty_detection_result()
+
+def _fallback_chain(confidence_threshold: float, fallback_thresholds: Optional[List[float]]) -> List[float]:
+    """Requested threshold followed by the fallbacks below it; higher ones could not find anything new"""
+    if fallback_thresholds is None:
+        fallback_thresholds = YOLO_FALLBACK_THRESHOLDS
+    return [confidence_threshold] + [t for t in fallback_thresholds if t < confidence_threshold]
+
+def _detect_arrays_with_fallback(image: ImageInput, thresholds: List[float], model: Optional[str] = None,
+                                 imgsz: Optional[int] = None, tiled: Optional[bool] = None) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Run YOLO once at the lowest threshold, then try each threshold in order by filtering boxes"""
+    arrays = _yolo_arrays(image, min(thresholds), model, imgsz, tiled)
+    if arrays is None:
+        return None
+    
+    xyxy, confidences, class_ids = arrays
+    known_class = (class_ids >= 0) & (class_ids < len(COCO_CLASSES))
+    for i, threshold in enumerate(thresholds):
+        if i > 0:
+            print(f"🔄 No objects detected, trying with lower confidence ({threshold})...")
+        keep = known_class & (confidences >= threshold)
+        if keep.any():
+            break
+    return xyxy[keep], confidences[keep], class_ids[keep]
+
+def detect_object_arrays(image: ImageInput, confidence_threshold: float = 0.5,
+                         fallback_thresholds: Optional[List[float]] = None, model: Optional[str] = None,
+                         imgsz: Optional[int] = None, tiled: Optional[bool] = None) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Raw (xyxy, confidence, class_id) arrays in original image coordinates, with the same
+    single-pass confidence fallback as detect_objects_enhanced but no demo data. None if detection failed.
+    """
+    try:
+        return _detect_arrays_with_fallback(image, _fallback_chain(confidence_threshold, fallback_thresholds),
+                                            model, imgsz, tiled)
+    except Exception as e:
+        print(f"❌ Error in YOLO v8 detection: {e}")
+        return None
+
+def _detect_with_fallback(image: ImageInput, thresholds: List[float], model: Optional[str] = None,
+                          imgsz: Optional[int] = None, tiled: Optional[bool] = None) -> Dict:
+    """Single-pass confidence fallback returning the detection dict"""
+    try:
+        arrays = _detect_arrays_with_fallback(image, thresholds, model, imgsz, tiled)
+        if arrays is None:
+            return _empty_detection_result()
+        return detection_result_from_arrays(*arrays)
+    except Exception as e:
+        print(f"❌ Error in YOLO v8 detection: {e}")
+        return _empty_detection_result()
 
-def detect_objects_enhanced(image_bytes: bytes, confidence_threshold: float = 0.5) -> Dict:
+def detect_objects_enhanced(image: ImageInput, confidence_threshold: float = 0.5,
+                            fallback_thresholds: Optional[List[float]] = None, model: Optional[str] = None,
+                            imgsz: Optional[int] = None, tiled: Optional[bool] = None) -> Dict:
     """Enhanced object detection using YOLO v8 with fallback"""
     print(f"🔍 Starting object detection with confidence threshold: {confidence_threshold}")
     
-    # Try YOLO v8 first
-    result = detect_objects_yolo_v8(image_bytes, confidence_threshold)
+    thresholds = _fallback_chain(confidence_threshold, fallback_thresholds)
+    if tiled is None:
+        tiled = YOLO_TILED_MODE
+    
+    # Decode once so the fallback pass does not decode again; tiles need the full resolution
+    try:
+        image = _as_frame(image, "bgr", None if tiled else yolo_decode_size(imgsz or YOLO_IMGSZ))
+    except Exception as e:
+        # An unreadable upload has nothing to detect: no retries and no demo data
+        print(f"❌ Error decoding image: {e}")
+        return _empty_detection_result()
     
-    # If no objects detected, try with lower confidence
-    if result["total_objects"] == 0 and confidence_threshold > 0.3:
-        print("🔄 No objects detected, trying with lower confidence...")
-        result = detect_objects_yolo_v8(image_bytes, 0.3)
+    if YOLO_SINGLE_PASS_FALLBACK:
+        result = _detect_with_fallback(image, thresholds, model, imgsz, tiled)
+    else:
+        # Try YOLO v8 first
+        result = detect_objects_yolo_v8(image, confidence_threshold, model, imgsz, tiled)
+        
+        # If no objects detected, try with lower confidence
+        for threshold in thresholds[1:]:
+            if result["total_objects"] > 0:
+                break
+            print("🔄 No objects detected, trying with lower confidence...")
+            result = detect_objects_yolo_v8(image, threshold, model, imgsz, tiled)
     
     # If still no objects, provide demo data
     if result["total_objects"] == 0:
@@ -271,22 +736,117 @@ def detect_objects_enhanced(image_bytes: bytes, confidence_threshold: float = 0.
     print(f"✅ Detection complete: {result['total_objects']} objects found")
     return result
 
-def detect_faces(image_bytes: bytes) -> Dict:
-    """Detect faces using MediaPipe and face_recognition"""
+class FaceDetectorPool:
+    """Pool of long-lived MediaPipe FaceDetection instances keyed by model_selection and confidence.
+    
+    A FaceDetection graph is not safe to share between threads, so each call checks an
+    instance out for its exclusive use. Instances are built lazily up to ``size`` per key;
+    once that many are in use, further callers wait for one to be returned.
+    """
+    
+    def __init__(self, size: int = FACE_DETECTOR_POOL_SIZE):
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[int, float], "queue.LifoQueue"] = {}
+        self._created: Dict[Tuple[int, float], int] = {}
+        self._all = []
+        self.calls = 0
+        self.graph_builds = 0
+        self.graph_build_ms = 0.0
+        self.checkout_ms = 0.0
+        self.process_ms = 0.0
+    
+    @contextmanager
+    def checkout(self, model_selection: int = 0, min_detection_confidence: float = 0.5):
+        """Borrow a FaceDetection instance for the duration of a with-block"""
+        key = (model_selection, float(min_detection_confidence))
+        start = time.perf_counter()
+        detector = None
+        build = False
+        with self._lock:
+            idle = self._idle.setdefault(key, queue.LifoQueue())
+            try:
+                detector = idle.get_nowait()
+            except queue.Empty:
+                if self._created.get(key, 0) < self.size:
+                    self._created[key] = self._created.get(key, 0) + 1
+                    build = True
+        
+        if build:
+            try:
+                detector = get_mp_face_detection().FaceDetection(model_selection=model_selection,
+                                                                 min_detection_confidence=min_detection_confidence)
+            except Exception:
+                with self._lock:
+                    self._created[key] -= 1
+                raise
+            with self._lock:
+                self._all.append(detector)
+                self.graph_builds += 1
+                self.graph_build_ms += (time.perf_counter() - start) * 1000.0
+        elif detector is None:
+            detector = idle.get()
+        
+        with self._lock:
+            self.checkout_ms += (time.perf_counter() - start) * 1000.0
+        try:
+            yield detector
+        finally:
+            idle.put(detector)
+    
+    def record_process(self, elapsed_ms: float):
+        with self._lock:
+            self.calls += 1
+            self.process_ms += elapsed_ms
+    
+    def stats(self) -> Dict:
+        """Per-call timing summary; graph_builds stays flat once every instance exists"""
+        with self._lock:
+            calls = self.calls
+            return {
+                "pool_size": self.size,
+                "instances": len(self._all),
+                "calls": calls,
+                "graph_builds": self.graph_builds,
+                "avg_graph_build_ms": self.graph_build_ms / self.graph_builds if self.graph_builds else 0.0,
+                "avg_checkout_ms": self.checkout_ms / calls if calls else 0.0,
+                "avg_process_ms": self.process_ms / calls if calls else 0.0
+            }
+    
+    def close(self):
+        with self._lock:
+            for detector in self._all:
+                detector.close()
+            self._all = []
+            self._idle = {}
+            self._created = {}
+
+face_detector_pool = FaceDetectorPool()
+
+def detect_faces(image: ImageInput, model_selection: int = 0,
+                 min_detection_confidence: float = 0.5, embed: bool = False) -> Dict:
+    """Detect faces using MediaPipe.
+    
+    With embed=True the result also carries "embeddings", an (N, 128) array aligned with
+    "faces", or None when embeddings are unavailable.
+    """
     try:
-        # Convert bytes to image
-        image = Image.open(io.BytesIO(image_bytes))
-        image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        # MediaPipe wants RGB, so decode straight to RGB instead of going through BGR
+        frame = _as_frame(image, "rgb", FACE_DECODE_SIZE)
         
-        # Use MediaPipe for face detection
-        with mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5) as face_detection:
-            results = face_detection.process(cv2.cvtColor(image_cv, cv2.COLOR_BGR2RGB))
+        # Use a pooled MediaPipe detector so the graph is not rebuilt per request
+        with face_detector_pool.checkout(model_selection, min_detection_confidence) as face_detection:
+            start = time.perf_counter()
+            with stage_timer("face_detection"):
+                results = face_detection.process(frame.image)
+            face_detector_pool.record_process((time.perf_counter() - start) * 1000.0)
             
             faces = []
             if results.detections:
+                # Relative boxes map straight onto the original upload size
+                h, w = frame.original_height, frame.original_width
                 for detection in results.detections:
                     bbox = detection.location_data.relative_bounding_box
-                    h, w, _ = image_cv.shape
                     
                     x = int(bbox.xmin * w)
                     y = int(bbox.ymin * h)
@@ -300,11 +860,14 @@ def detect_faces(image_bytes: bytes) -> Dict:
                         "height": height,
                         "confidence": detection.score[0]
                     })
-            
-            return {
-                "faces": faces,
-                "total_faces": len(faces)
-            }
+        
+        result = {
+            "faces": faces,
+            "total_faces": len(faces)
+        }
+        if embed:
+            result["embeddings"] = embed_faces(frame, faces)
+        return result
     
     except Exception as e:
         print(f"❌ Error in face detection: {e}")
@@ -313,36 +876,160 @@ def detect_faces(image_bytes: bytes) -> Dict:
             "total_faces": 0
         }
 
+def embed_faces(image: ImageInput, faces: List[Dict]) -> Optional[np.ndarray]:
+    """(N, 128) face_recognition embeddings of faces given in original image coordinates, or None if unavailable"""
+    module = get_face_recognition()
+    if module is None or not faces:
+        return None
+    
+    frame = _as_frame(image, "rgb", FACE_DECODE_SIZE)
+    frame_h, frame_w = frame.image.shape[:2]
+    # face_recognition takes (top, right, bottom, left) boxes in the decoded frame
+    locations = []
+    for face in faces:
+        left = int(max(0, face["x"] / frame.scale_x))
+        top = int(max(0, face["y"] / frame.scale_y))
+        right = int(min(frame_w, (face["x"] + face["width"]) / frame.scale_x))
+        bottom = int(min(frame_h, (face["y"] + face["height"]) / frame.scale_y))
+        locations.append((top, max(right, left + 1), max(bottom, top + 1), left))
+    
+    try:
+        with stage_timer("face_embedding"):
+            encodings = module.face_encodings(np.ascontiguousarray(frame.image), known_face_locations=locations)
+    except Exception as e:
+        print(f"❌ Error computing face embeddings: {e}")
+        return None
+    return np.asarray(encodings, dtype=np.float32).reshape(len(faces), -1)
+
+PERSON_CLASS_ID = COCO_CLASSES.index('person')
+
+def _face_iou(a: Dict, b: Dict) -> float:
+    x1, y1 = max(a["x"], b["x"]), max(a["y"], b["y"])
+    x2 = min(a["x"] + a["width"], b["x"] + b["width"])
+    y2 = min(a["y"] + a["height"], b["y"] + b["height"])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a["width"] * a["height"] + b["width"] * b["height"] - intersection
+    return intersection / union if union > 0 else 0.0
+
+def detect_faces_in_boxes(image: ImageInput, boxes: np.ndarray, model_selection: int = 0,
+                          min_detection_confidence: float = 0.5, margin: float = 0.1, embed: bool = False) -> Dict:
+    """Detect faces only inside the given xyxy boxes (original image coordinates), e.g. YOLO person boxes.
+    
+    embed=True adds "embeddings" as in detect_faces.
+    """
+    try:
+        frame = _as_frame(image, "bgr", YOLO_DECODE_SIZE)
+        frame_h, frame_w = frame.image.shape[:2]
+        faces = []
+        
+        with face_detector_pool.checkout(model_selection, min_detection_confidence) as face_detection:
+            for x1, y1, x2, y2 in np.asarray(boxes, dtype=np.float64).reshape(-1, 4):
+                x1, x2 = x1 / frame.scale_x, x2 / frame.scale_x
+                y1, y2 = y1 / frame.scale_y, y2 / frame.scale_y
+                # The head sits in the top of a standing person's box; a squarer crop keeps the
+                # face large in MediaPipe's 128px input
+                y2 = min(y2, y1 + (x2 - x1) * 1.2)
+                # Pad so faces at the box edge are not cut off
+                pad_x, pad_y = (x2 - x1) * margin, (y2 - y1) * margin
+                left, top = int(max(0, x1 - pad_x)), int(max(0, y1 - pad_y))
+                right, bottom = int(min(frame_w, x2 + pad_x)), int(min(frame_h, y2 + pad_y))
+                if right - left < 8 or bottom - top < 8:
+                    continue
+                
+                crop = frame.image[top:bottom, left:right]
+                crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB) if frame.color == "bgr" else np.ascontiguousarray(crop)
+                start = time.perf_counter()
+                with stage_timer("face_detection"):
+                    results = face_detection.process(crop)
+                face_detector_pool.record_process((time.perf_counter() - start) * 1000.0)
+                if not results.detections:
+                    continue
+                
+                crop_w, crop_h = right - left, bottom - top
+                for detection in results.detections:
+                    bbox = detection.location_data.relative_bounding_box
+                    face = {
+                        "x": int((left + bbox.xmin * crop_w) * frame.scale_x),
+                        "y": int((top + bbox.ymin * crop_h) * frame.scale_y),
+                        "width": int(bbox.width * crop_w * frame.scale_x),
+                        "height": int(bbox.height * crop_h * frame.scale_y),
+                        "confidence": detection.score[0]
+                    }
+                    # Overlapping person boxes can see the same face twice
+                    duplicate = next((i for i, other in enumerate(faces) if _face_iou(face, other) > 0.5), None)
+                    if duplicate is None:
+                        faces.append(face)
+                    elif face["confidence"] > faces[duplicate]["confidence"]:
+                        faces[duplicate] = face
+        
+        result = {
+            "faces": faces,
+            "total_faces": len(faces)
+        }
+        if embed:
+            result["embeddings"] = embed_faces(frame, faces)
+        return result
+    
+    except Exception as e:
+        print(f"❌ Error in face detection: {e}")
+        return {
+            "faces": [],
+            "total_faces": 0
+        }
+
+class LabelSpriteCache:
+    """Rendered "label: confidence" tags, drawn once per class and confidence step and then only copied"""
+    
+    def __init__(self, font_scale: float = 0.6, thickness: int = 2, color: Tuple[int, int, int] = (0, 255, 0)):
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.color = color
+        self._lock = threading.Lock()
+        self._sprites: Dict[Tuple[str, int], np.ndarray] = {}
+    
+    def get(self, label: str, confidence: float) -> np.ndarray:
+        # Confidence is shown in steps of 0.1 so the cache stays at most 11 sprites per class
+        key = (label, int(round(confidence * 10)))
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            text = f"{label}: {key[1] / 10:.1f}"
+            (width, height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.thickness)
+            sprite = np.empty((height + 10, width, 3), dtype=np.uint8)
+            sprite[...] = self.color
+            cv2.putText(sprite, text, (0, height + 5), cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, (0, 0, 0), self.thickness)
+            with self._lock:
+                sprite = self._sprites.setdefault(key, sprite)
+        return sprite
+    
+    def __len__(self) -> int:
+        return len(self._sprites)
+
+label_sprites = LabelSpriteCache()
+
+def draw_detections(canvas: np.ndarray, detections: List[Dict], scale_x: float = 1.0, scale_y: float = 1.0):
+    """Draw detection boxes (original image coordinates) and their label sprites onto a BGR canvas in place"""
+    canvas_h, canvas_w = canvas.shape[:2]
+    for detection in detections:
+        x = int(detection["x"] / scale_x)
+        y = int(detection["y"] / scale_y)
+        x2 = int((detection["x"] + detection["width"]) / scale_x)
+        y2 = int((detection["y"] + detection["height"]) / scale_y)
+        cv2.rectangle(canvas, (x, y), (x2, y2), label_sprites.color, 2)
+        
+        # Tag sits above the box, clipped to the canvas
+        sprite = label_sprites.get(detection["label"], detection["confidence"])
+        top = y - sprite.shape[0]
+        sx1, sy1 = max(0, -x), max(0, -top)
+        sx2 = min(sprite.shape[1], canvas_w - x)
+        sy2 = min(sprite.shape[0], canvas_h - top)
+        if sx2 > sx1 and sy2 > sy1:
+            canvas[top + sy1:top + sy2, x + sx1:x + sx2] = sprite[sy1:sy2, sx1:sx2]
+
 def draw_bounding_boxes(image_bytes: bytes, detections: List[Dict]) -> bytes:
     """Draw bounding boxes on the image and return as bytes"""
     try:
-        # Convert bytes to image
-        image = Image.open(io.BytesIO(image_bytes))
-        image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # Draw bounding boxes
-        for detection in detections:
-            x = detection["x"]
-            y = detection["y"]
-            width = detection["width"]
-            height = detection["height"]
-            label = detection["label"]
-            confidence = detection["confidence"]
-            
-            # Draw rectangle
-            cv2.rectangle(image_cv, (x, y), (x + width, y + height), (0, 255, 0), 2)
-            
-            # Draw label with confidence
-            label_text = f"{label}: {confidence:.2f}"
-            label_size = cv2.getTextSize(label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-            
-            # Draw background for text
-            cv2.rectangle(image_cv, (x, y - label_size[1] - 10), 
-                         (x + label_size[0], y), (0, 255, 0), -1)
-            
-            # Draw text
-            cv2.putText(image_cv, label_text, (x, y - 5), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+        image_cv = decode_frame(image_bytes).image
+        draw_detections(image_cv, detections)
         
         # Convert back to bytes
         _, buffer = cv2.imencode('.jpg', image_cv)
@@ -352,5 +1039,35 @@ def draw_bounding_boxes(image_bytes: bytes, detections: List[Dict]) -> bytes:
         print(f"❌ Error drawing bounding boxes: {e}")
         return image_bytes
 
-# Initialize YOLO model on import
-load_yolo_model()
+def warmup_object_detector(tiers: Optional[List[Tuple[str, int]]] = None) -> bool:
+    """Load YOLO and run a blank frame through it so the first request skips initialisation.
+    
+    tiers lists the (model, imgsz) pairs to warm; by default only YOLO_MODEL at YOLO_IMGSZ.
+    """
+    for model, imgsz in tiers or [(YOLO_MODEL, YOLO_IMGSZ)]:
+        if get_yolo_model(model) is None:
+            return False
+        detect_objects_yolo_v8(np.zeros((480, 640, 3), dtype=np.uint8), model=model, imgsz=imgsz)
+    return True
+
+def preload_object_detector(tiers: Optional[List[Tuple[str, int]]] = None) -> bool:
+    """Load YOLO and run a blank frame per tier straight through the model, bypassing the batch scheduler.
+    
+    For a parent process that forks workers afterwards (serve.py): the first call fuses the
+    model, so the fused weights end up in pages the workers share, and no scheduler thread is
+    started that the workers would inherit without its thread.
+    """
+    blank = np.zeros((480, 640, 3), dtype=np.uint8)
+    for model, imgsz in tiers or [(YOLO_MODEL, YOLO_IMGSZ)]:
+        loaded = get_yolo_model(model)
+        if loaded is None:
+            return False
+        loaded(blank, conf=0.5, imgsz=imgsz, verbose=False)
+    return True
+
+def warmup_face_detector() -> bool:
+    """Import MediaPipe and build one pooled FaceDetection graph; also loads the face embedding models"""
+    with face_detector_pool.checkout() as face_detection:
+        face_detection.process(np.zeros((480, 640, 3), dtype=np.uint8))
+    get_face_recognition()
+    return True
@@ -0,0 +1,264 @@
+"""
+In-process index of recently seen face embeddings.
+
+Serious mode asks the LLM for a networking quest for every face in every frame. Faces are
+now embedded (face_recognition, 128 floats) and looked up here: a face whose cosine
+similarity to a stored one is at least FACE_INDEX_MATCH_THRESHOLD is the same person, and
+gets the quest it was given before.
+
+Embeddings are L2-normalised into one float32 matrix, so a lookup for all faces of a frame
+is a single matrix product. Once the index holds FACE_INDEX_ANN_MIN_SIZE faces, an IVF
+layer is trained (k-means centroids over a sample) and a lookup only scores the faces
+filed under the FACE_INDEX_ANN_PROBES centroids nearest to the query; it is retrained
+whenever the index has doubled since. Faces not seen for FACE_INDEX_TTL_SECONDS are
+evicted, and at FACE_INDEX_MAX_SIZE the least recently seen face makes room.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import counter, gauge, stage_timer
+
+FACE_INDEX_TTL_SECONDS = float(os.getenv("FACE_INDEX_TTL_SECONDS", "3600"))
+FACE_INDEX_MAX_SIZE = int(os.getenv("FACE_INDEX_MAX_SIZE", "100000"))
+# dlib's "same person" distance of 0.6 is roughly a cosine similarity of 0.9 on these embeddings
+FACE_INDEX_MATCH_THRESHOLD = float(os.getenv("FACE_INDEX_MATCH_THRESHOLD", "0.92"))
+FACE_INDEX_ANN_MIN_SIZE = int(os.getenv("FACE_INDEX_ANN_MIN_SIZE", "10000"))
+FACE_INDEX_ANN_PROBES = int(os.getenv("FACE_INDEX_ANN_PROBES", "8"))
+
+FACE_INDEX_SIZE = gauge("goose_face_index_size", "Faces held in the face index")
+FACE_INDEX_LOOKUPS = counter("goose_face_index_lookups_total", "Face index lookups by result", ["result"])
+FACE_INDEX_EVICTIONS = counter("goose_face_index_evictions_total", "Faces evicted from the face index", ["reason"])
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def kmeans(vectors: np.ndarray, clusters: int, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids of normalised vectors"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        # An empty cluster is restarted on a random vector
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+class FaceIndex:
+    """Recently seen faces with their cached quests, searchable by embedding"""
+
+    def __init__(self, dim: int = 128, ttl: float = FACE_INDEX_TTL_SECONDS, max_size: int = FACE_INDEX_MAX_SIZE,
+                 threshold: float = FACE_INDEX_MATCH_THRESHOLD, ann_min_size: int = FACE_INDEX_ANN_MIN_SIZE,
+                 ann_probes: int = FACE_INDEX_ANN_PROBES):
+        self.dim = dim
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self.threshold = threshold
+        self.ann_min_size = ann_min_size
+        self.ann_probes = max(1, ann_probes)
+        self._lock = threading.Lock()
+        # Row storage grows by doubling up to max_size; freed rows are reused
+        capacity = min(self.max_size, 1024)
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._face_ids = np.full(capacity, -1, dtype=np.int64)
+        self._last_seen = np.zeros(capacity, dtype=np.float64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._rows = 0  # high-water mark of used rows
+        self._free: List[int] = []
+        self._count = 0
+        self._next_id = 0
+        # face_id -> quest, None until one has been written
+        self._quests: Dict[int, Optional[str]] = {}
+        self._last_sweep = 0.0
+        # IVF layer: centroids, the centroid each row is filed under (-1 for free rows) and the rows of each list
+        self._centroids: Optional[np.ndarray] = None
+        self._lists = np.full(capacity, -1, dtype=np.int32)
+        self._members: List[List[int]] = []
+        self._trained_at = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def search(self, embeddings: np.ndarray) -> List[Optional[Tuple[int, float]]]:
+        """(face_id, similarity) of the best match for each embedding, or None below the threshold"""
+        queries = normalize(embeddings)
+        with self._lock:
+            self._expire(time.monotonic())
+            return [(int(self._face_ids[match[0]]), match[1]) if match is not None else None
+                    for match in self._search(queries)]
+
+    def match_or_add(self, embeddings: np.ndarray) -> List[Tuple[int, bool]]:
+        """(face_id, known) per embedding: known faces are refreshed, new ones are added"""
+        queries = normalize(embeddings)
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            with stage_timer("face_index"):
+                matches = self._search(queries)
+            results = []
+            for query, match in zip(queries, matches):
+                if match is not None:
+                    row = match[0]
+                    self._last_seen[row] = now
+                    results.append((int(self._face_ids[row]), True))
+                    self.hits += 1
+                    FACE_INDEX_LOOKUPS.inc(result="hit")
+                else:
+                    results.append((self._insert(query, now), False))
+                    self.misses += 1
+                    FACE_INDEX_LOOKUPS.inc(result="miss")
+            self._maybe_train()
+            return results
+
+    def add(self, embeddings: np.ndarray) -> List[int]:
+        """Insert embeddings without looking them up first"""
+        queries = normalize(embeddings)
+        with self._lock:
+            now = time.monotonic()
+            face_ids = [self._insert(query, now) for query in queries]
+            self._maybe_train()
+            return face_ids
+
+    def quest(self, face_id: int) -> Optional[str]:
+        return self._quests.get(face_id)
+
+    def set_quest(self, face_id: int, quest: str):
+        with self._lock:
+            # The face may have been evicted while its quest was being written
+            if face_id in self._quests:
+                self._quests[face_id] = quest
+
+    def _search(self, queries: np.ndarray) -> List[Optional[Tuple[int, float]]]:
+        """(row, similarity) of the best match per normalised query, or None below the threshold"""
+        if self._count == 0 or not len(queries):
+            return [None] * len(queries)
+        rows = self._rows
+        if self._centroids is None:
+            scores = queries @ self._vectors[:rows].T
+            scores[:, ~self._active[:rows]] = -np.inf
+            best = np.argmax(scores, axis=1)
+            candidates = [(int(row), float(scores[q, row])) for q, row in enumerate(best)]
+        else:
+            probes = np.argsort(-(queries @ self._centroids.T), axis=1)[:, :self.ann_probes]
+            candidates = []
+            for query, probe in zip(queries, probes):
+                rows_in_lists = np.fromiter((row for cluster in probe for row in self._members[cluster]), dtype=np.intp)
+                if not len(rows_in_lists):
+                    candidates.append((-1, -np.inf))
+                    continue
+                scores = self._vectors[rows_in_lists] @ query
+                best = int(np.argmax(scores))
+                candidates.append((int(rows_in_lists[best]), float(scores[best])))
+        return [(row, similarity) if row >= 0 and similarity >= self.threshold else None
+                for row, similarity in candidates]
+
+    def _insert(self, vector: np.ndarray, now: float) -> int:
+        if self._count >= self.max_size:
+            # Make room by dropping the face seen longest ago
+            seen = np.where(self._active[:self._rows], self._last_seen[:self._rows], np.inf)
+            # Faces added in the same call share a timestamp; the earliest added goes first
+            oldest = np.flatnonzero(seen == seen.min())
+            self._remove(int(oldest[np.argmin(self._face_ids[oldest])]))
+            FACE_INDEX_EVICTIONS.inc(reason="size")
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self._rows == len(self._vectors):
+                self._grow()
+            row = self._rows
+            self._rows += 1
+
+        face_id = self._next_id
+        self._next_id += 1
+        self._vectors[row] = vector
+        self._face_ids[row] = face_id
+        self._last_seen[row] = now
+        self._active[row] = True
+        if self._centroids is not None:
+            cluster = int(np.argmax(self._centroids @ vector))
+            self._lists[row] = cluster
+            self._members[cluster].append(row)
+        self._quests[face_id] = None
+        self._count += 1
+        FACE_INDEX_SIZE.set(self._count)
+        return face_id
+
+    def _remove(self, row: int):
+        self._quests.pop(int(self._face_ids[row]), None)
+        if self._lists[row] >= 0:
+            self._members[self._lists[row]].remove(row)
+        self._active[row] = False
+        self._face_ids[row] = -1
+        self._lists[row] = -1
+        self._free.append(row)
+        self._count -= 1
+        FACE_INDEX_SIZE.set(self._count)
+
+    def _grow(self):
+        capacity = min(self.max_size, len(self._vectors) * 2)
+        extra = capacity - len(self._vectors)
+        self._vectors = np.concatenate([self._vectors, np.zeros((extra, self.dim), dtype=np.float32)])
+        self._face_ids = np.concatenate([self._face_ids, np.full(extra, -1, dtype=np.int64)])
+        self._last_seen = np.concatenate([self._last_seen, np.zeros(extra)])
+        self._active = np.concatenate([self._active, np.zeros(extra, dtype=bool)])
+        self._lists = np.concatenate([self._lists, np.full(extra, -1, dtype=np.int32)])
+
+    def _expire(self, now: float):
+        # A vectorised sweep at most once a second keeps lookups cheap
+        if now - self._last_sweep < 1.0:
+            return
+        self._last_sweep = now
+        expired = np.flatnonzero(self._active[:self._rows] & (now - self._last_seen[:self._rows] > self.ttl))
+        for row in expired:
+            self._remove(int(row))
+        if len(expired):
+            FACE_INDEX_EVICTIONS.inc(len(expired), reason="ttl")
+        if self._centroids is not None and self._count < self.ann_min_size // 2:
+            # Small again: exact search is cheaper than keeping the IVF layer
+            self._centroids = None
+            self._lists[:] = -1
+            self._members = []
+
+    def _maybe_train(self):
+        if self._count < self.ann_min_size or (self._centroids is not None and self._count < 2 * self._trained_at):
+            return
+        rows = np.flatnonzero(self._active[:self._rows])
+        clusters = max(1, int(np.sqrt(len(rows))))
+        # Centroids come from a sample; every row is then filed under its nearest centroid
+        sample = rows[np.random.default_rng(self._next_id).choice(len(rows), min(len(rows), clusters * 32), replace=False)]
+        with stage_timer("face_index_train"):
+            self._centroids = kmeans(self._vectors[sample], clusters)
+            self._lists[:] = -1
+            for start in range(0, len(rows), 8192):
+                chunk = rows[start:start + 8192]
+                self._lists[chunk] = np.argmax(self._vectors[chunk] @ self._centroids.T, axis=1)
+            order = rows[np.argsort(self._lists[rows], kind="stable")]
+            bounds = np.searchsorted(self._lists[order], np.arange(clusters + 1))
+            self._members = [order[bounds[i]:bounds[i + 1]].tolist() for i in range(clusters)]
+        self._trained_at = self._count
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "faces": self._count,
+                "cached_quests": sum(1 for quest in self._quests.values() if quest is not None),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "ann": self._centroids is not None,
+                "ann_lists": 0 if self._centroids is None else len(self._centroids),
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl,
+                "max_size": self.max_size
+            }
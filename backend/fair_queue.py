@@ -0,0 +1,226 @@
+"""
+Per-tenant fair queuing in front of the detectors.
+
+Detection used to be served in arrival order, so one kiosk streaming frames as fast as it
+can kept every other attendee waiting behind its backlog. Every inference call now takes one
+of FAIR_QUEUE_CONCURRENCY slots from a FairQueue. Waiting calls are queued per flow, a
+(mode, tenant) pair where the tenant is the user, and freed slots are handed out by deficit
+round-robin: each turn adds FAIR_QUEUE_QUANTUM times the mode's weight to the flow's
+deficit, and the flow is served while its deficit covers the cost of its next call. A
+tenant with a deep backlog then gets the same share as one sending a frame at a time, and
+FAIR_QUEUE_WEIGHTS shifts the shares between serious mode, fun mode and batch jobs.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional, Tuple
+
+from metrics import gauge, histogram
+
+FAIR_QUEUE_ENABLED = os.getenv("FAIR_QUEUE_ENABLED", "true").lower() == "true"
+# Concurrent inference calls; 0 sizes it from the inference pool (or YOLO batch size in the threadpool)
+FAIR_QUEUE_CONCURRENCY = int(os.getenv("FAIR_QUEUE_CONCURRENCY", "0"))
+FAIR_QUEUE_WEIGHTS = os.getenv("FAIR_QUEUE_WEIGHTS", "serious=2,fun=1,batch=0.25")
+FAIR_QUEUE_QUANTUM = float(os.getenv("FAIR_QUEUE_QUANTUM", "1"))
+# Tenants that get their own label on the wait histogram; later ones are counted as "other"
+FAIR_QUEUE_TENANT_LABELS = int(os.getenv("FAIR_QUEUE_TENANT_LABELS", "20"))
+FAIR_QUEUE_TRACKED_TENANTS = 1024
+
+FAIR_QUEUE_WAITING = gauge("goose_fair_queue_waiting", "Inference calls waiting in the fair queue")
+FAIR_QUEUE_IN_FLIGHT = gauge("goose_fair_queue_in_flight", "Inference calls holding a fair queue slot")
+FAIR_QUEUE_WAIT = histogram("goose_fair_queue_wait_seconds", "Time inference calls waited for a slot, by mode and tenant",
+                            ["mode", "tenant"], buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "serious=2,fun=1" into {"serious": 2.0, "fun": 1.0}"""
+    weights = {}
+    for part in spec.split(","):
+        if "=" in part:
+            mode, weight = part.split("=", 1)
+            weights[mode.strip()] = max(float(weight), 1e-3)
+    return weights
+
+def _p95(values) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(0.95 * (len(ordered) - 1) + 0.5))]
+
+class _Flow:
+    __slots__ = ("key", "quantum", "waiters", "deficit", "has_turn")
+
+    def __init__(self, key: Tuple[str, str], quantum: float):
+        self.key = key
+        self.quantum = quantum
+        # (future, cost, enqueued_at)
+        self.waiters: Deque[Tuple[asyncio.Future, float, float]] = deque()
+        self.deficit = 0.0
+        self.has_turn = False
+
+class FairQueue:
+    """Concurrency limit whose waiting calls are served by deficit round-robin over (mode, tenant) flows"""
+
+    def __init__(self, concurrency: int = 8, weights: Optional[Dict[str, float]] = None,
+                 quantum: float = FAIR_QUEUE_QUANTUM, enabled: bool = FAIR_QUEUE_ENABLED):
+        self.enabled = enabled
+        self.concurrency = max(1, concurrency)
+        self.weights = weights if weights is not None else parse_weights(FAIR_QUEUE_WEIGHTS)
+        self.quantum = quantum
+        self.in_flight = 0
+        self._flows: Dict[Tuple[str, str], _Flow] = {}
+        # Flows with waiting calls, in round-robin order; the first one has the turn
+        self._active: Deque[_Flow] = deque()
+        self._waiting = 0
+        self._tenant_labels: Dict[str, str] = {}
+        # Per-tenant wait statistics for /admin/fair-queue, least recently active first
+        self._tenants: "OrderedDict[str, Dict]" = OrderedDict()
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, mode: str, cost: float = 1.0):
+        """Hold a slot for the duration of the block"""
+        if not self.enabled:
+            yield
+            return
+        await self.acquire(tenant, mode, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, tenant: str, mode: str, cost: float = 1.0):
+        """Wait for a slot; pair with release()"""
+        enqueued_at = time.perf_counter()
+        if self.in_flight < self.concurrency and not self._active:
+            self._start(tenant, mode, 0.0)
+            return
+
+        key = (mode, tenant)
+        flow = self._flows.get(key)
+        if flow is None:
+            flow = self._flows[key] = _Flow(key, self.quantum * self.weights.get(mode, 1.0))
+        if not flow.waiters:
+            self._active.append(flow)
+        waiter = asyncio.get_running_loop().create_future()
+        flow.waiters.append((waiter, cost, enqueued_at))
+        self._set_waiting(1)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the caller went away: pass the slot on
+                self.release()
+            else:
+                self._drop(flow, waiter)
+            raise
+
+    @property
+    def waiting(self) -> int:
+        """Calls queued for a slot"""
+        return self._waiting
+
+    def release(self):
+        if not self._grant_next():
+            self.in_flight -= 1
+            FAIR_QUEUE_IN_FLIGHT.set(self.in_flight)
+
+    def _grant_next(self) -> bool:
+        """Hand a freed slot to the next call by deficit round-robin; False when nothing is waiting"""
+        while self._active:
+            flow = self._active[0]
+            # A caller cancelled this turn is still queued until its acquire() unwinds; skip it
+            while flow.waiters and flow.waiters[0][0].done():
+                flow.waiters.popleft()
+                self._set_waiting(-1)
+            if not flow.waiters:
+                self._retire(flow)
+                continue
+            if not flow.has_turn:
+                flow.deficit += flow.quantum
+                flow.has_turn = True
+            waiter, cost, enqueued_at = flow.waiters[0]
+            if cost <= flow.deficit:
+                flow.waiters.popleft()
+                flow.deficit -= cost
+                if not flow.waiters:
+                    self._retire(flow)
+                self._set_waiting(-1)
+                mode, tenant = flow.key
+                self._record(tenant, mode, time.perf_counter() - enqueued_at)
+                waiter.set_result(None)
+                return True
+            # Deficit spent: the turn passes to the next flow
+            flow.has_turn = False
+            self._active.rotate(-1)
+        return False
+
+    def _start(self, tenant: str, mode: str, wait: float):
+        self.in_flight += 1
+        FAIR_QUEUE_IN_FLIGHT.set(self.in_flight)
+        self._record(tenant, mode, wait)
+
+    def _drop(self, flow: _Flow, waiter: asyncio.Future):
+        for i, (queued, _, _) in enumerate(flow.waiters):
+            if queued is waiter:
+                del flow.waiters[i]
+                self._set_waiting(-1)
+                break
+        # The flow may have been retired already, and its key reused by a new one
+        if not flow.waiters and self._flows.get(flow.key) is flow:
+            self._active.remove(flow)
+            self._retire(flow)
+
+    def _retire(self, flow: _Flow):
+        # An idle flow does not bank its deficit (standard DRR)
+        if self._active and self._active[0] is flow:
+            self._active.popleft()
+        flow.deficit = 0.0
+        flow.has_turn = False
+        if self._flows.get(flow.key) is flow:
+            del self._flows[flow.key]
+
+    def _set_waiting(self, delta: int):
+        self._waiting += delta
+        FAIR_QUEUE_WAITING.set(self._waiting)
+
+    def _record(self, tenant: str, mode: str, wait: float):
+        label = self._tenant_labels.get(tenant)
+        if label is None:
+            label = tenant if len(self._tenant_labels) < FAIR_QUEUE_TENANT_LABELS else "other"
+            if label != "other":
+                self._tenant_labels[tenant] = label
+        FAIR_QUEUE_WAIT.observe(wait, mode=mode, tenant=label)
+
+        stats = self._tenants.pop(tenant, None)
+        if stats is None:
+            stats = {"requests": 0, "total_wait": 0.0, "max_wait": 0.0, "recent": deque(maxlen=256)}
+        stats["requests"] += 1
+        stats["total_wait"] += wait
+        stats["max_wait"] = max(stats["max_wait"], wait)
+        stats["recent"].append(wait)
+        self._tenants[tenant] = stats
+        while len(self._tenants) > FAIR_QUEUE_TRACKED_TENANTS:
+            self._tenants.popitem(last=False)
+
+    def tenant_stats(self) -> Dict[str, Dict]:
+        return {
+            tenant: {
+                "requests": stats["requests"],
+                "mean_wait_ms": round(stats["total_wait"] / stats["requests"] * 1000.0, 3),
+                "p95_wait_ms": round(_p95(stats["recent"]) * 1000.0, 3),
+                "max_wait_ms": round(stats["max_wait"] * 1000.0, 3)
+            }
+            for tenant, stats in self._tenants.items()
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self._waiting,
+            "active_flows": len(self._active),
+            "weights": self.weights,
+            "tenants": self.tenant_stats()
+        }
@@ -0,0 +1,140 @@
+"""
+Detection result cache for repeated camera frames.
+
+Frames are keyed by a 64-bit difference hash (dHash) of a small greyscale thumbnail, so
+two frames from a phone held still hash to values only a few bits apart. A lookup scans
+the entries of the same user and task and accepts the closest one within the configured
+Hamming distance.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from detect import decode_thumbnail
+from metrics import counter
+
+CACHE_LOOKUPS = counter("goose_detection_cache_lookups_total", "Detection cache lookups by task and result", ["task", "result"])
+CACHE_EVICTIONS = counter("goose_detection_cache_evictions_total", "Detection cache entries dropped by reason", ["reason"])
+
+DETECTION_CACHE_ENABLED = os.getenv("DETECTION_CACHE_ENABLED", "true").lower() == "true"
+DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", "1024"))
+DETECTION_CACHE_TTL = float(os.getenv("DETECTION_CACHE_TTL", "5"))
+DETECTION_CACHE_MAX_DISTANCE = int(os.getenv("DETECTION_CACHE_MAX_DISTANCE", "4"))
+# Caps the linear Hamming scan done per lookup
+DETECTION_CACHE_PER_SCOPE = int(os.getenv("DETECTION_CACHE_PER_SCOPE", "16"))
+
+def frame_dhash(image: Union[bytes, np.ndarray]) -> int:
+    """64-bit difference hash of the frame (upload bytes or decode_reduced_grey output): one bit per horizontally adjacent pixel pair"""
+    thumbnail = decode_thumbnail(image, 9, 8)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class DetectionCache:
+    """LRU + TTL cache of detection results keyed by (user, task) scope and perceptual hash.
+
+    Cached results are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = DETECTION_CACHE_SIZE, ttl_seconds: float = DETECTION_CACHE_TTL,
+                 max_distance: int = DETECTION_CACHE_MAX_DISTANCE, max_per_scope: int = DETECTION_CACHE_PER_SCOPE,
+                 enabled: bool = DETECTION_CACHE_ENABLED):
+        self.enabled = enabled
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.max_per_scope = max(1, max_per_scope)
+        self._lock = threading.Lock()
+        # (scope, frame_hash) -> (stored_at, result), oldest first
+        self._entries: "OrderedDict[Tuple[Tuple[str, str], int], Tuple[float, Dict]]" = OrderedDict()
+        # scope -> frame hashes cached for that scope, oldest first
+        self._scopes: Dict[Tuple[str, str], "OrderedDict[int, None]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, user_id: str, task: str, frame_hash: int) -> Optional[Dict]:
+        """Return the cached result of the nearest frame within max_distance, if any"""
+        scope = (user_id, task)
+        now = time.monotonic()
+        with self._lock:
+            hashes = self._scopes.get(scope)
+            best_hash = None
+            best_distance = self.max_distance + 1
+            if hashes:
+                for cached_hash in list(hashes):
+                    stored_at, _ = self._entries[(scope, cached_hash)]
+                    if now - stored_at > self.ttl_seconds:
+                        self._remove(scope, cached_hash)
+                        self.expirations += 1
+                        CACHE_EVICTIONS.inc(reason="expired")
+                        continue
+                    distance = hamming_distance(frame_hash, cached_hash)
+                    if distance < best_distance:
+                        best_hash, best_distance = cached_hash, distance
+                        if distance == 0:
+                            break
+
+            if best_hash is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(task=task, result="miss")
+                return None
+
+            self.hits += 1
+            CACHE_LOOKUPS.inc(task=task, result="hit")
+            self._entries.move_to_end((scope, best_hash))
+            return self._entries[(scope, best_hash)][1]
+
+    def put(self, user_id: str, task: str, frame_hash: int, result: Dict):
+        scope = (user_id, task)
+        with self._lock:
+            hashes = self._scopes.setdefault(scope, OrderedDict())
+            if frame_hash in hashes:
+                self._remove(scope, frame_hash)
+                hashes = self._scopes.setdefault(scope, OrderedDict())
+            hashes[frame_hash] = None
+            self._entries[(scope, frame_hash)] = (time.monotonic(), result)
+
+            while len(hashes) > self.max_per_scope:
+                self._remove(scope, next(iter(hashes)))
+                self.evictions += 1
+                CACHE_EVICTIONS.inc(reason="scope_full")
+            while len(self._entries) > self.max_entries:
+                (old_scope, old_hash), _ = next(iter(self._entries.items()))
+                self._remove(old_scope, old_hash)
+                self.evictions += 1
+                CACHE_EVICTIONS.inc(reason="cache_full")
+
+    def _remove(self, scope: Tuple[str, str], frame_hash: int):
+        self._entries.pop((scope, frame_hash), None)
+        hashes = self._scopes.get(scope)
+        if hashes is not None:
+            hashes.pop(frame_hash, None)
+            if not hashes:
+                del self._scopes[scope]
+
+    def stats(self) -> Dict:
+        """Hit/miss counters; every hit is a forward pass that was not run"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "scopes": len(self._scopes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "forward_passes_saved": self.hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "max_distance": self.max_distance
+            }
@@ -0,0 +1,388 @@
+"""
+Inference worker processes for the detection endpoints.
+
+Each worker process loads its own YOLO / MediaPipe models once and keeps them warm.
+The API process decodes an upload, copies the frame into a free slot of a shared-memory
+ring and only sends the slot index and frame shape through the job queue, so frames are
+never pickled. Handlers await an asyncio future that a reader thread resolves when the
+worker posts its result, which keeps CPU-bound inference off the event loop.
+
+Every worker has its own job queue and jobs go to the ready worker with the fewest jobs
+outstanding, so the pool knows which jobs each worker holds. The reader thread also watches
+the workers: when one exits, its outstanding jobs fail, their frame slots are freed and the
+worker is spawned again (after INFERENCE_RESTART_BACKOFF_SECONDS if it died young). While
+no worker is ready, run() raises WorkerUnavailable.
+"""
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import REGISTRY, counter
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# Intra-op threads (OpenMP / torch / OpenCV) used by each worker process
+INFERENCE_THREADS_PER_WORKER = int(os.getenv("INFERENCE_THREADS_PER_WORKER", "2"))
+# Jobs a worker runs concurrently; concurrent fun-mode jobs share a YOLO batch
+INFERENCE_JOBS_PER_WORKER = int(os.getenv("INFERENCE_JOBS_PER_WORKER", "4"))
+INFERENCE_SLOTS = int(os.getenv("INFERENCE_SLOTS", str(max(1, INFERENCE_WORKERS) * INFERENCE_JOBS_PER_WORKER * 2)))
+# Large enough for a 1080p BGR frame; bigger frames fall back to sending the upload bytes
+INFERENCE_SLOT_BYTES = int(os.getenv("INFERENCE_SLOT_BYTES", str(1920 * 1080 * 3)))
+# How often a busy worker sends its metrics snapshot to the API process
+INFERENCE_METRICS_PUSH_SECONDS = float(os.getenv("INFERENCE_METRICS_PUSH_SECONDS", "1"))
+# How long start() waits for every worker to load its models
+INFERENCE_START_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_START_TIMEOUT_SECONDS", "300"))
+# A worker that exits sooner than this after being spawned is respawned with this delay
+INFERENCE_RESTART_BACKOFF_SECONDS = float(os.getenv("INFERENCE_RESTART_BACKOFF_SECONDS", "5"))
+# Cancellation flags shared with the workers, indexed by job id modulo this size
+INFERENCE_CANCEL_RING = 4096
+
+INFERENCE_WORKER_RESTARTS = counter("goose_inference_worker_restarts_total", "Inference workers respawned after exiting")
+
+class WorkerUnavailable(RuntimeError):
+    """No inference worker is ready to take a job"""
+
+def _run_task(detect, task: str, image, kwargs: Dict) -> Dict:
+    if task == "objects":
+        return detect.detect_objects_enhanced(image, **kwargs)
+    if task == "object_arrays":
+        return detect.detect_object_arrays(image, **kwargs)
+    if task == "faces":
+        return detect.detect_faces(image, **kwargs)
+    if task == "faces_in_boxes":
+        return detect.detect_faces_in_boxes(image, **kwargs)
+    raise ValueError(f"Unknown inference task: {task}")
+
+def _task_decode_options(task: str, imgsz: Optional[int] = None):
+    """Colour order and decode size each task's model wants"""
+    import detect
+
+    if task == "faces":
+        return "rgb", detect.FACE_DECODE_SIZE
+    return "bgr", detect.yolo_decode_size(imgsz or detect.YOLO_IMGSZ)
+
+def _worker_main(worker_id: int, shm_name: str, slot_bytes: int, threads: int, jobs: int,
+                 job_queue, result_queue, cancel_flags, warmup_tiers=None):
+    """Entry point of an inference worker process"""
+    # Thread pools must be sized before torch / OpenCV initialise them
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    import cv2
+    import detect
+    import metrics
+
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+
+    # Warm both models (every adaptive tier of YOLO) so the first real request does not pay for initialisation
+    for warmup, args in ((detect.warmup_object_detector, (warmup_tiers,)), (detect.warmup_face_detector, ())):
+        try:
+            warmup(*args)
+        except Exception as e:
+            print(f"⚠️ Inference worker {worker_id} could not warm up ({warmup.__name__}): {e}")
+    result_queue.put(("ready", worker_id, None))
+
+    def push_metrics():
+        # Stage timings recorded here only reach /metrics once sent to the API process
+        previous = None
+        while True:
+            time.sleep(INFERENCE_METRICS_PUSH_SECONDS)
+            snapshot = metrics.REGISTRY.snapshot()
+            if snapshot != previous:
+                result_queue.put(("metrics", worker_id, snapshot))
+                previous = snapshot
+
+    threading.Thread(target=push_metrics, name="metrics-push", daemon=True).start()
+
+    def job_loop():
+        while True:
+            job = job_queue.get()
+            if job is None:
+                # Hand the sentinel on so sibling threads stop as well
+                job_queue.put(None)
+                return
+            job_id, task, slot, shape, dtype, payload, kwargs = job
+            if cancel_flags[job_id % INFERENCE_CANCEL_RING]:
+                # The caller has gone away; skip the work but still hand the slot back
+                result_queue.put((job_id, False, "cancelled"))
+                continue
+            try:
+                if slot is not None:
+                    pixels = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=slot * slot_bytes)
+                    image = detect.DecodedFrame(pixels, *payload)
+                    del pixels
+                else:
+                    image = payload
+                result = _run_task(detect, task, image, kwargs)
+                del image
+                result_queue.put((job_id, True, result))
+            except Exception as e:
+                result_queue.put((job_id, False, f"{type(e).__name__}: {e}"))
+
+    threads_list = [threading.Thread(target=job_loop, daemon=True) for _ in range(max(1, jobs))]
+    for thread in threads_list:
+        thread.start()
+    for thread in threads_list:
+        thread.join()
+    shm.close()
+
+class InferencePool:
+    """Pool of warm inference worker processes fed through shared-memory ring slots"""
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, threads_per_worker: int = INFERENCE_THREADS_PER_WORKER,
+                 jobs_per_worker: int = INFERENCE_JOBS_PER_WORKER, slots: int = INFERENCE_SLOTS,
+                 slot_bytes: int = INFERENCE_SLOT_BYTES, warmup_tiers: Optional[List[Tuple[str, int]]] = None,
+                 start_timeout: float = INFERENCE_START_TIMEOUT_SECONDS,
+                 restart_backoff: float = INFERENCE_RESTART_BACKOFF_SECONDS):
+        self.workers = max(1, workers)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.jobs_per_worker = max(1, jobs_per_worker)
+        self.slots = max(1, slots)
+        self.slot_bytes = slot_bytes
+        self.warmup_tiers = warmup_tiers
+        self.start_timeout = start_timeout
+        self.restart_backoff = restart_backoff
+        self._ctx = mp.get_context("spawn")
+        self._processes: List[Optional[mp.Process]] = [None] * self.workers
+        self._job_queues: List = [None] * self.workers
+        self._spawned_at = [0.0] * self.workers
+        self._ready = [False] * self.workers
+        self._outstanding = [0] * self.workers
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._result_queue = None
+        self._reader: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._free_slots: Optional[asyncio.Queue] = None
+        # job_id -> (future, slot, worker_id)
+        self._pending: Dict[int, tuple] = {}
+        self._job_ids = itertools.count()
+        self._cancel_flags = self._ctx.RawArray("b", INFERENCE_CANCEL_RING)
+        self._stopping = False
+        self.restarts = 0
+
+    @property
+    def ready_workers(self) -> int:
+        return sum(self._ready)
+
+    def _spawn(self, worker_id: int):
+        """Start a worker process with a fresh job queue; a dead worker may have left its queue locked"""
+        job_queue = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._shm.name, self.slot_bytes, self.threads_per_worker,
+                  self.jobs_per_worker, job_queue, self._result_queue, self._cancel_flags,
+                  self.warmup_tiers),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._job_queues[worker_id] = job_queue
+        self._spawned_at[worker_id] = time.monotonic()
+        self._processes[worker_id] = process
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Allocate the frame ring and spawn the workers; blocks until every worker is warm.
+        
+        Raises RuntimeError if a worker exits or the workers are not all ready within start_timeout.
+        """
+        self._loop = loop
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        self._result_queue = self._ctx.Queue()
+        self._free_slots = asyncio.Queue()
+        for slot in range(self.slots):
+            self._free_slots.put_nowait(slot)
+
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+
+        deadline = time.monotonic() + self.start_timeout
+        while self.ready_workers < self.workers:
+            for worker_id, process in enumerate(self._processes):
+                if not self._ready[worker_id] and process.exitcode is not None:
+                    raise RuntimeError(f"Inference worker {worker_id} exited with code {process.exitcode} during startup")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Inference workers not ready after {self.start_timeout:.0f}s "
+                                   f"({self.ready_workers}/{self.workers} ready)")
+            try:
+                kind, worker_id, _ = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if kind == "ready":
+                self._ready[worker_id] = True
+                print(f"✅ Inference worker {worker_id} ready")
+
+        self._reader = threading.Thread(target=self._read_results, name="inference-results", daemon=True)
+        self._reader.start()
+        print(f"✅ Inference pool started: {self.workers} workers x {self.threads_per_worker} threads, "
+              f"{self.slots} frame slots of {self.slot_bytes // 1024} KiB")
+
+    def shutdown(self):
+        """Stop the workers and release the shared-memory ring"""
+        self._stopping = True
+        for job_queue in self._job_queues:
+            if job_queue is not None:
+                job_queue.put(None)
+        for process in self._processes:
+            if process is None:
+                continue
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = [None] * self.workers
+        if self._result_queue is not None:
+            self._result_queue.put(None)
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def _pick_worker(self) -> int:
+        candidates = [worker_id for worker_id in range(self.workers) if self._ready[worker_id]]
+        if not candidates:
+            raise WorkerUnavailable("No inference worker is ready")
+        return min(candidates, key=lambda worker_id: self._outstanding[worker_id])
+
+    async def run(self, task: str, image, **kwargs) -> Dict:
+        """Run a detection task in one of the workers, given upload bytes or a decoded frame"""
+        from detect import DecodedFrame, _as_frame, decode_frame
+
+        # Fail before decoding when there is nowhere to send the job
+        self._pick_worker()
+        color, target_size = _task_decode_options(task, kwargs.get("imgsz"))
+        slot = None
+        payload = None
+        if isinstance(image, (bytes, bytearray)):
+            encoded = bytes(image)
+            frame = None
+            # Tiled detection needs the full-resolution frame, which rarely fits a slot: the worker decodes it
+            if not kwargs.get("tiled"):
+                try:
+                    # Decode once, in the colour order and resolution the task's model wants
+                    frame = await asyncio.to_thread(decode_frame, encoded, color, target_size)
+                except Exception:
+                    # Let the worker fail the same way a direct detect call would
+                    frame = None
+            if frame is None or frame.image.nbytes > self.slot_bytes:
+                payload = encoded
+        else:
+            frame = image if isinstance(image, DecodedFrame) else _as_frame(image)
+            if frame.image.nbytes > self.slot_bytes:
+                payload = frame
+
+        if payload is None:
+            slot = await self._free_slots.get()
+            pixels = frame.image
+            view = np.ndarray(pixels.shape, dtype=pixels.dtype, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+            view[...] = pixels
+            del view
+            # Only the frame metadata travels with the job
+            payload = (frame.color, frame.original_width, frame.original_height)
+
+        try:
+            # Chosen again: workers may have come or gone while waiting for a slot
+            worker_id = self._pick_worker()
+        except WorkerUnavailable:
+            if slot is not None:
+                self._free_slots.put_nowait(slot)
+            raise
+        job_id = next(self._job_ids)
+        future = self._loop.create_future()
+        self._pending[job_id] = (future, slot, worker_id)
+        self._outstanding[worker_id] += 1
+        shape = frame.image.shape if slot is not None else None
+        dtype = frame.image.dtype.str if slot is not None else None
+        self._cancel_flags[job_id % INFERENCE_CANCEL_RING] = 0
+        self._job_queues[worker_id].put((job_id, task, slot, shape, dtype, payload, kwargs))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # A worker that has not picked the job up yet skips it; the slot is freed when it reports back
+            self._cancel_flags[job_id % INFERENCE_CANCEL_RING] = 1
+            raise
+
+    def _read_results(self):
+        while True:
+            try:
+                message = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                return
+            if message and message[0] == "metrics":
+                REGISTRY.set_remote(f"inference-worker-{message[1]}", message[2])
+            elif message and message[0] == "ready":
+                self._loop.call_soon_threadsafe(self._worker_ready, message[1])
+            elif message:
+                self._loop.call_soon_threadsafe(self._resolve, *message)
+            self._check_workers()
+
+    def _check_workers(self):
+        if self._stopping:
+            return
+        for worker_id, process in enumerate(self._processes):
+            if process is not None and process.exitcode is not None:
+                # Cleared here so the exit is handled once; _respawn puts the new process in
+                self._processes[worker_id] = None
+                print(f"⚠️ Inference worker {worker_id} exited with code {process.exitcode}")
+                self._loop.call_soon_threadsafe(self._worker_exited, worker_id)
+
+    def _worker_ready(self, worker_id: int):
+        if not self._stopping:
+            self._ready[worker_id] = True
+            print(f"✅ Inference worker {worker_id} ready")
+
+    def _worker_exited(self, worker_id: int):
+        """Fail the jobs the worker held and spawn it again"""
+        self._ready[worker_id] = False
+        self._outstanding[worker_id] = 0
+        for job_id, (future, slot, owner) in list(self._pending.items()):
+            if owner != worker_id:
+                continue
+            del self._pending[job_id]
+            # Nothing reads the frame any more
+            if slot is not None:
+                self._free_slots.put_nowait(slot)
+            if not future.done():
+                future.set_exception(RuntimeError(f"Inference worker {worker_id} exited"))
+        if not self._stopping:
+            threading.Thread(target=self._respawn, args=(worker_id,), name=f"inference-respawn-{worker_id}",
+                             daemon=True).start()
+
+    def _respawn(self, worker_id: int):
+        if time.monotonic() - self._spawned_at[worker_id] < self.restart_backoff:
+            time.sleep(self.restart_backoff)
+        if self._stopping:
+            return
+        self.restarts += 1
+        INFERENCE_WORKER_RESTARTS.inc()
+        print(f"🔄 Respawning inference worker {worker_id}")
+        self._spawn(worker_id)
+
+    def _resolve(self, job_id, ok: bool, result):
+        if job_id not in self._pending:
+            return
+        future, slot, worker_id = self._pending.pop(job_id)
+        self._outstanding[worker_id] -= 1
+        # The worker is done reading the frame, even if the caller has gone away
+        if slot is not None:
+            self._free_slots.put_nowait(slot)
+        if future.done():
+            return
+        if ok:
+            future.set_result(result)
+        else:
+            future.set_exception(RuntimeError(result))
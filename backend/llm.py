@@ -1,28 +1,223 @@
+import asyncio
 import os
-import cohere
-import google.generativeai as genai
-from typing import List, Dict
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional
 import json
 import random
 from datetime import datetime
 
-# Initialize Cohere client
+from metrics import counter, histogram, stage_timer
+
+# Budget of one LLM call from the async handlers, waiting for a provider slot included
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "8"))
+# Concurrent calls per provider across the whole process
+LLM_COHERE_MAX_CONCURRENCY = int(os.getenv("LLM_COHERE_MAX_CONCURRENCY", "4"))
+LLM_GEMINI_MAX_CONCURRENCY = int(os.getenv("LLM_GEMINI_MAX_CONCURRENCY", "4"))
+# Networking quests for the faces of one frame are asked for in one call, up to this many per call
+LLM_PROMPT_BATCH_SIZE = int(os.getenv("LLM_PROMPT_BATCH_SIZE", "8"))
+# Single-quest calls in flight per frame when a batched call does not return every quest
+LLM_PROMPT_PARALLELISM = int(os.getenv("LLM_PROMPT_PARALLELISM", "4"))
+
+LLM_ERRORS = counter("goose_llm_errors_total", "LLM calls that raised or returned unparseable output", ["provider"])
+LLM_FALLBACKS = counter("goose_llm_fallbacks_total", "Responses served by the mock generators instead of an LLM", ["kind"])
+LLM_TIMEOUTS = counter("goose_llm_timeouts_total", "LLM calls abandoned at their deadline", ["provider"])
+LLM_LATENCY = histogram("goose_llm_request_seconds", "Latency of async LLM calls by provider and outcome, slot wait included",
+                        ["provider", "outcome"], buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32))
+LLM_PROMPT_BATCHES = counter("goose_llm_prompt_batches_total", "Batched networking quest calls by outcome", ["outcome"])
+
+# The Cohere and Gemini SDKs are slow to import, so clients are created on first use
+# (or by the startup warmup) rather than when this module is imported
 cohere_api_key = os.getenv("COHERE_API_KEY")
-if cohere_api_key:
-    co = cohere.Client(cohere_api_key)
-else:
-    co = None
+if not cohere_api_key:
     print("Warning: COHERE_API_KEY not found. LLM features will be limited.")
 
-# Initialize Gemini client
 gemini_api_key = os.getenv("GEMINI_API_KEY")
-if gemini_api_key:
-    genai.configure(api_key=gemini_api_key)
-    gemini_model = genai.GenerativeModel('gemini-pro')
-else:
-    gemini_model = None
+if not gemini_api_key:
     print("Warning: GEMINI_API_KEY not found. Using fallback LLM features.")
 
+co = None
+gemini_model = None
+_client_lock = threading.Lock()
+
+def get_cohere_client():
+    """Cohere client, or None when no API key is configured"""
+    global co
+    if co is None and cohere_api_key:
+        with _client_lock:
+            if co is None:
+                try:
+                    import cohere
+                    co = cohere.Client(cohere_api_key)
+                except Exception as e:
+                    print(f"Error initializing Cohere client: {e}")
+    return co
+
+def get_gemini_model():
+    """Gemini model, or None when no API key is configured"""
+    global gemini_model
+    if gemini_model is None and gemini_api_key:
+        with _client_lock:
+            if gemini_model is None:
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=gemini_api_key)
+                    gemini_model = genai.GenerativeModel('gemini-pro')
+                except Exception as e:
+                    print(f"Error initializing Gemini client: {e}")
+    return gemini_model
+
+def warmup_llm_clients() -> bool:
+    """Import the configured LLM SDKs and create their clients ahead of the first request"""
+    cohere_ok = get_cohere_client() is not None or not cohere_api_key
+    gemini_ok = get_gemini_model() is not None or not gemini_api_key
+    return cohere_ok and gemini_ok
+
+class AsyncProvider(ABC):
+    """An LLM provider called from the event loop, behind a concurrency limit and a per-call deadline"""
+
+    def __init__(self, name: str, max_concurrency: int):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    @abstractmethod
+    def available(self) -> bool:
+        """Whether the provider is configured and its client could be created"""
+
+    @abstractmethod
+    async def _complete(self, prompt: str, **options) -> str:
+        """One completion, without the limit and deadline that generate() adds"""
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None, **options) -> str:
+        """Completion text; raises asyncio.TimeoutError once the deadline has passed"""
+        self.calls += 1
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            text = await asyncio.wait_for(self._generate(prompt, **options), timeout or LLM_TIMEOUT_SECONDS)
+            outcome = "ok"
+            return text
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            self.timeouts += 1
+            LLM_TIMEOUTS.inc(provider=self.name)
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            LLM_LATENCY.observe(time.perf_counter() - started, provider=self.name, outcome=outcome)
+
+    async def _generate(self, prompt: str, **options) -> str:
+        async with self._semaphore:
+            with stage_timer(f"llm.{self.name}"):
+                return await self._complete(prompt, **options)
+
+    async def close(self):
+        """Release the provider's async client, if it holds one"""
+
+    def stats(self) -> Dict:
+        return {
+            "available": self.available(),
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors
+        }
+
+class CohereProvider(AsyncProvider):
+    def __init__(self, max_concurrency: int = LLM_COHERE_MAX_CONCURRENCY):
+        super().__init__("cohere", max_concurrency)
+        self._client = None
+
+    def available(self) -> bool:
+        return get_cohere_client() is not None
+
+    def _async_client(self):
+        # Created inside the running loop, since the SDK binds its HTTP session to it
+        if self._client is None:
+            import cohere
+            async_client = getattr(cohere, "AsyncClient", None)
+            self._client = async_client(cohere_api_key) if async_client is not None else False
+        return self._client or None
+
+    async def _complete(self, prompt: str, **options) -> str:
+        client = self._async_client()
+        if client is not None:
+            response = await client.generate(model='command', prompt=prompt, **options)
+        else:
+            # No async client in this SDK version: the call blocks a thread, which keeps
+            # running past the deadline, but the event loop stays free
+            response = await asyncio.to_thread(get_cohere_client().generate, model='command', prompt=prompt, **options)
+        return response.generations[0].text.strip()
+
+    async def close(self):
+        client, self._client = self._client, None
+        close = getattr(client, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+class GeminiProvider(AsyncProvider):
+    def __init__(self, max_concurrency: int = LLM_GEMINI_MAX_CONCURRENCY):
+        super().__init__("gemini", max_concurrency)
+
+    def available(self) -> bool:
+        return get_gemini_model() is not None
+
+    async def _complete(self, prompt: str, **options) -> str:
+        model = get_gemini_model()
+        if hasattr(model, "generate_content_async"):
+            response = await model.generate_content_async(prompt, **options)
+        else:
+            response = await asyncio.to_thread(model.generate_content, prompt, **options)
+        return response.text.strip()
+
+cohere_provider = CohereProvider()
+gemini_provider = GeminiProvider()
+
+async def close_llm_clients():
+    """Close the async SDK clients; call at shutdown"""
+    await cohere_provider.close()
+    await gemini_provider.close()
+
+def llm_stats() -> Dict:
+    return {
+        "timeout_seconds": LLM_TIMEOUT_SECONDS,
+        "providers": {provider.name: provider.stats() for provider in (gemini_provider, cohere_provider)}
+    }
+
+def betting_lines_prompt(objects: List[str], sponsor_categories: List[str], provider: str) -> str:
+    """Prompt asking a provider for three betting lines as a JSON array"""
+    objects_str = ", ".join(objects)
+    sponsors_str = ", ".join(sponsor_categories) if sponsor_categories else "General"
+    # Gemini is asked for the winnings too, and to be creative
+    winnings = "\n- Include potential winnings calculation" if provider == "gemini" else ""
+    closing = "\n\nMake the lines creative and hackathon-specific!" if provider == "gemini" else ""
+    
+    return f"""Create 3 funny and creative betting lines for a hackathon based on these detected objects: {objects_str}
+        
+Sponsor categories involved: {sponsors_str}
+
+Each betting line should be:
+- Hilarious and hackathon-themed
+- Related to the detected objects
+- Include sponsor branding naturally
+- Have realistic odds for a hackathon setting{winnings}
+
+Format as JSON array with this structure:
+[
+    {{"line": "funny betting line text", "odds": "2:1", "base_stake": 10, "sponsor": "Tech Giants", "multiplier": 1.5, "max_potential_win": 15}},
+    {{"line": "another funny line", "odds": "3:1", "base_stake": 15, "sponsor": "Food Delivery", "multiplier": 2.0, "max_potential_win": 30}},
+    {{"line": "third funny line", "odds": "5:1", "base_stake": 20, "sponsor": "Sports & Fitness", "multiplier": 2.2, "max_potential_win": 44}}
+]{closing}"""
+
 def create_sponsor_betting_lines(detection_result: Dict) -> List[Dict]:
     """
     Create sponsor-specific betting lines based on detected objects and categories
@@ -41,43 +236,52 @@ def create_sponsor_betting_lines(detection_result: Dict) -> List[Dict]:
     betting_opportunities = detection_result.get("betting_opportunities", [])
     
     # Try Gemini first (better for creative content)
-    if gemini_model is not None:
+    if get_gemini_model() is not None:
         return create_betting_lines_with_gemini(objects, sponsor_categories, betting_opportunities)
     
     # Fallback to Cohere
-    if co is not None:
+    if get_cohere_client() is not None:
         return create_betting_lines_with_cohere(objects, sponsor_categories, betting_opportunities)
     
     # Final fallback
     return create_mock_sponsor_betting_lines(objects, sponsor_categories, betting_opportunities)
 
+async def create_sponsor_betting_lines_async(detection_result: Dict, timeout: Optional[float] = None) -> List[Dict]:
+    """create_sponsor_betting_lines for the event loop; mock lines are served past the deadline"""
+    if not detection_result.get("objects"):
+        return []
+    
+    objects = detection_result["objects"]
+    sponsor_categories = detection_result.get("sponsor_categories", [])
+    betting_opportunities = detection_result.get("betting_opportunities", [])
+    
+    if gemini_provider.available():
+        provider, options = gemini_provider, {}
+    elif cohere_provider.available():
+        provider, options = cohere_provider, {"max_tokens": 400, "temperature": 0.8}
+    else:
+        return create_mock_sponsor_betting_lines(objects, sponsor_categories, betting_opportunities)
+    
+    try:
+        text = await provider.generate(betting_lines_prompt(objects, sponsor_categories, provider.name), timeout, **options)
+        return json.loads(text)
+    except asyncio.TimeoutError:
+        print(f"⏱️ Betting lines from {provider.name} took longer than {timeout or LLM_TIMEOUT_SECONDS:.1f}s, using mock lines")
+    except json.JSONDecodeError:
+        print(f"Failed to parse {provider.name} JSON response")
+        LLM_ERRORS.inc(provider=provider.name)
+    except Exception as e:
+        print(f"Error creating betting lines with {provider.name}: {e}")
+        LLM_ERRORS.inc(provider=provider.name)
+    return create_mock_sponsor_betting_lines(objects, sponsor_categories, betting_opportunities)
+
 def create_betting_lines_with_gemini(objects: List[str], sponsor_categories: List[str], betting_opportunities: List[Dict]) -> List[Dict]:
     """Create betting lines using Gemini"""
     try:
-        objects_str = ", ".join(objects)
-        sponsors_str = ", ".join(sponsor_categories) if sponsor_categories else "General"
-        
-        prompt = f"""Create 3 funny and creative betting lines for a hackathon based on these detected objects: {objects_str}
-        
-Sponsor categories involved: {sponsors_str}
-
-Each betting line should be:
-- Hilarious and hackathon-themed
-- Related to the detected objects
-- Include sponsor branding naturally
-- Have realistic odds for a hackathon setting
-- Include potential winnings calculation
+        prompt = betting_lines_prompt(objects, sponsor_categories, "gemini")
 
-Format as JSON array with this structure:
-[
-    {{"line": "funny betting line text", "odds": "2:1", "base_stake": 10, "sponsor": "Tech Giants", "multiplier": 1.5, "max_potential_win": 15}},
-    {{"line": "another funny line", "odds": "3:1", "base_stake": 15, "sponsor": "Food Delivery", "multiplier": 2.0, "max_potential_win": 30}},
-    {{"line": "third funny line", "odds": "5:1", "base_stake": 20, "sponsor": "Sports & Fitness", "multiplier": 2.2, "max_potential_win": 44}}
-]
-
-Make the lines creative and hackathon-specific!"""
-
-        response = gemini_model.generate_content(prompt)
+        with stage_timer("llm.gemini"):
+            response = get_gemini_model().generate_content(prompt)
         
         # Try to parse JSON response
         try:
@@ -85,41 +289,26 @@ Make the lines creative and hackathon-specific!"""
             return betting_lines
         except json.JSONDecodeError:
             print("Failed to parse Gemini JSON response")
+            LLM_ERRORS.inc(provider="gemini")
             return create_mock_sponsor_betting_lines(objects, sponsor_categories, betting_opportunities)
     
     except Exception as e:
         print(f"Error creating betting lines with Gemini: {e}")
+        LLM_ERRORS.inc(provider="gemini")
         return create_mock_sponsor_betting_lines(objects, sponsor_categories, betting_opportunities)
 
 def create_betting_lines_with_cohere(objects: List[str], sponsor_categories: List[str], betting_opportunities: List[Dict]) -> List[Dict]:
     """Create betting lines using Cohere"""
     try:
-        objects_str = ", ".join(objects)
-        sponsors_str = ", ".join(sponsor_categories) if sponsor_categories else "General"
-        
-        prompt = f"""Create 3 funny and creative betting lines for a hackathon based on these detected objects: {objects_str}
-        
-Sponsor categories involved: {sponsors_str}
-
-Each betting line should be:
-- Hilarious and hackathon-themed
-- Related to the detected objects
-- Include sponsor branding naturally
-- Have realistic odds for a hackathon setting
+        prompt = betting_lines_prompt(objects, sponsor_categories, "cohere")
 
-Format as JSON array with this structure:
-[
-    {{"line": "funny betting line text", "odds": "2:1", "base_stake": 10, "sponsor": "Tech Giants", "multiplier": 1.5, "max_potential_win": 15}},
-    {{"line": "another funny line", "odds": "3:1", "base_stake": 15, "sponsor": "Food Delivery", "multiplier": 2.0, "max_potential_win": 30}},
-    {{"line": "third funny line", "odds": "5:1", "base_stake": 20, "sponsor": "Sports & Fitness", "multiplier": 2.2, "max_potential_win": 44}}
-]"""
-
-        response = co.generate(
-            model='command',
-            prompt=prompt,
-            max_tokens=400,
-            temperature=0.8
-        )
+        with stage_timer("llm.cohere"):
+            response = get_cohere_client().generate(
+                model='command',
+                prompt=prompt,
+                max_tokens=400,
+                temperature=0.8
+            )
         
         # Try to parse JSON response
         try:
@@ -127,14 +316,17 @@ Format as JSON array with this structure:
             return betting_lines
         except json.JSONDecodeError:
             print("Failed to parse Cohere JSON response")
+            LLM_ERRORS.inc(provider="cohere")
             return create_mock_sponsor_betting_lines(objects, sponsor_categories, betting_opportunities)
     
     except Exception as e:
         print(f"Error creating betting lines with Cohere: {e}")
+        LLM_ERRORS.inc(provider="cohere")
         return create_mock_sponsor_betting_lines(objects, sponsor_categories, betting_opportunities)
 
 def create_mock_sponsor_betting_lines(objects: List[str], sponsor_categories: List[str], betting_opportunities: List[Dict]) -> List[Dict]:
     """Create mock betting lines with sponsor information"""
+    LLM_FALLBACKS.inc(kind="sponsor_betting_lines")
     mock_lines = []
     
     # Use betting opportunities if available
@@ -190,6 +382,49 @@ def create_betting_lines(objects: List[str]) -> List[Dict]:
     }
     return create_sponsor_betting_lines(detection_result)
 
+def networking_prompt(face_info: Dict) -> str:
+    """Prompt asking for one networking quest for a detected face"""
+    confidence = face_info.get("confidence", 0.5)
+    person_type = "a fellow hacker" if confidence > 0.7 else "someone new"
+    
+    return f"""Create a friendly, encouraging networking quest for a hackathon when meeting {person_type}.
+
+The quest should be:
+- Specific and actionable
+- Encouraging and positive
+- Related to hackathon networking
+- Not too pushy or awkward
+
+Return just the quest description, no extra text."""
+
+def networking_prompts_prompt(faces: List[Dict]) -> str:
+    """Prompt asking for one distinct networking quest per face, as a JSON array"""
+    people = "\n".join(f"{i + 1}. {'a fellow hacker' if face.get('confidence', 0.5) > 0.7 else 'someone new'}"
+                       for i, face in enumerate(faces))
+    
+    return f"""Create {len(faces)} different friendly, encouraging networking quests for a hackathon, one for meeting each of these people:
+{people}
+
+Each quest should be:
+- Specific and actionable
+- Encouraging and positive
+- Related to hackathon networking
+- Not too pushy or awkward
+- Different from the other quests
+
+Format as a JSON array of {len(faces)} strings, in the order of the people above, with no extra text."""
+
+def parse_prompt_list(text: str) -> List[str]:
+    """Quests from a JSON array answer, tolerating a markdown code fence around it"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.index("\n") + 1:] if "\n" in text else ""
+    prompts = json.loads(text)
+    if not isinstance(prompts, list):
+        raise ValueError("expected a JSON array")
+    return [prompt.strip() for prompt in prompts if isinstance(prompt, str) and prompt.strip()]
+
 def create_networking_prompt(face_info: Dict) -> str:
     """
     Create a networking quest suggestion based on detected face
@@ -200,36 +435,118 @@ def create_networking_prompt(face_info: Dict) -> str:
     Returns:
         Networking quest suggestion string
     """
-    if co is None:
+    if get_cohere_client() is None:
         # Fallback: return mock networking prompts
         return create_mock_networking_prompt(face_info)
     
     try:
-        confidence = face_info.get("confidence", 0.5)
-        person_type = "a fellow hacker" if confidence > 0.7 else "someone new"
-        
-        prompt = f"""Create a friendly, encouraging networking quest for a hackathon when meeting {person_type}.
+        prompt = networking_prompt(face_info)
 
-The quest should be:
-- Specific and actionable
-- Encouraging and positive
-- Related to hackathon networking
-- Not too pushy or awkward
-
-Return just the quest description, no extra text."""
-
-        response = co.generate(
-            model='command',
-            prompt=prompt,
-            max_tokens=100,
-            temperature=0.7
-        )
+        with stage_timer("llm.cohere"):
+            response = get_cohere_client().generate(
+                model='command',
+                prompt=prompt,
+                max_tokens=100,
+                temperature=0.7
+            )
         
         return response.generations[0].text.strip()
     
     except Exception as e:
         print(f"Error creating networking prompt: {e}")
+        LLM_ERRORS.inc(provider="cohere")
+        return create_mock_networking_prompt(face_info)
+
+async def create_networking_prompt_async(face_info: Dict, timeout: Optional[float] = None) -> str:
+    """create_networking_prompt for the event loop; the mock prompt is served past the deadline"""
+    if not cohere_provider.available():
         return create_mock_networking_prompt(face_info)
+    try:
+        return await cohere_provider.generate(networking_prompt(face_info), timeout, max_tokens=100, temperature=0.7)
+    except asyncio.TimeoutError:
+        print(f"⏱️ Networking prompt took longer than {timeout or LLM_TIMEOUT_SECONDS:.1f}s, using a mock prompt")
+    except Exception as e:
+        print(f"Error creating networking prompt: {e}")
+        LLM_ERRORS.inc(provider="cohere")
+    return create_mock_networking_prompt(face_info)
+
+def create_mock_networking_prompts(faces: List[Dict]) -> List[str]:
+    """Mock prompts for several faces, distinct as long as the mock list lasts"""
+    prompts = []
+    for face in faces:
+        prompt = create_mock_networking_prompt(face)
+        for _ in range(len(MOCK_NETWORKING_PROMPTS)):
+            if prompt not in prompts:
+                break
+            prompt = MOCK_NETWORKING_PROMPTS[(MOCK_NETWORKING_PROMPTS.index(prompt) + 1) % len(MOCK_NETWORKING_PROMPTS)]
+        prompts.append(prompt)
+    return prompts
+
+async def create_networking_prompts_async(faces: List[Dict], timeout: Optional[float] = None) -> List[str]:
+    """One networking quest per face, all within one deadline.
+
+    One call asks for a distinct quest for each of up to LLM_PROMPT_BATCH_SIZE faces, so a
+    group photo costs one round trip instead of one per face; bigger groups are split into
+    even chunks that run concurrently, at most LLM_PROMPT_PARALLELISM at once. Faces a call
+    returned no quest for, or a quest another face already got, get single-quest calls
+    under the same limit, in whatever budget is left.
+    """
+    if len(faces) <= 1:
+        return [await create_networking_prompt_async(face, timeout) for face in faces]
+    if not cohere_provider.available():
+        return create_mock_networking_prompts(faces)
+    
+    deadline = time.monotonic() + (timeout or LLM_TIMEOUT_SECONDS)
+    limit = asyncio.Semaphore(max(1, LLM_PROMPT_PARALLELISM))
+    # Even chunks: 9 faces with a batch size of 8 are asked for as 5 + 4 rather than 8 + 1
+    chunk_count = -(-len(faces) // max(1, LLM_PROMPT_BATCH_SIZE))
+    size, extra = divmod(len(faces), chunk_count)
+    bounds = [i * size + min(i, extra) for i in range(chunk_count + 1)]
+    chunks = [faces[start:end] for start, end in zip(bounds, bounds[1:])]
+    
+    async def batch(chunk: List[Dict]) -> List[str]:
+        try:
+            async with limit:
+                text = await cohere_provider.generate(networking_prompts_prompt(chunk), max(deadline - time.monotonic(), 1e-3),
+                                                      max_tokens=60 * len(chunk) + 40, temperature=0.8)
+            prompts = parse_prompt_list(text)[:len(chunk)]
+        except asyncio.TimeoutError:
+            LLM_PROMPT_BATCHES.inc(outcome="timeout")
+            return []
+        except Exception as e:
+            print(f"Error creating batched networking prompts: {e}")
+            LLM_ERRORS.inc(provider="cohere")
+            LLM_PROMPT_BATCHES.inc(outcome="error")
+            return []
+        LLM_PROMPT_BATCHES.inc(outcome="ok" if len(prompts) == len(chunk) else "partial")
+        return prompts
+    
+    prompts: List[Optional[str]] = []
+    for chunk, answered in zip(chunks, await asyncio.gather(*(batch(chunk) for chunk in chunks))):
+        prompts.extend(answered + [None] * (len(chunk) - len(answered)))
+    # A quest repeated for another face is asked for again on its own
+    seen = set()
+    for i, prompt in enumerate(prompts):
+        if prompt is None:
+            continue
+        key = prompt.lower()
+        if key in seen:
+            prompts[i] = None
+            LLM_PROMPT_BATCHES.inc(outcome="duplicate")
+        seen.add(key)
+    
+    missing = [i for i, prompt in enumerate(prompts) if prompt is None]
+    if missing and deadline > time.monotonic():
+        async def single(face: Dict) -> str:
+            async with limit:
+                return await create_networking_prompt_async(face, max(deadline - time.monotonic(), 1e-3))
+        
+        for i, prompt in zip(missing, await asyncio.gather(*(single(faces[i]) for i in missing))):
+            prompts[i] = prompt
+    elif missing:
+        for i, prompt in zip(missing, create_mock_networking_prompts([faces[i] for i in missing])):
+            prompts[i] = prompt
+    return prompts
 
 def create_conversation_starter(objects: List[str], context: str = "hackathon") -> str:
     """
@@ -242,7 +559,8 @@ def create_conversation_starter(objects: List[str], context: str = "hackathon")
     Returns:
         Conversation starter string
     """
-    if not objects or co is None:
+    if not objects or get_cohere_client() is None:
+        LLM_FALLBACKS.inc(kind="conversation_starter")
         return "Hey! I noticed you're working on something interesting. Mind if I ask what you're building?"
     
     try:
@@ -257,21 +575,25 @@ The starter should be:
 
 Return just the conversation starter, no extra text."""
 
-        response = co.generate(
-            model='command',
-            prompt=prompt,
-            max_tokens=80,
-            temperature=0.8
-        )
+        with stage_timer("llm.cohere"):
+            response = get_cohere_client().generate(
+                model='command',
+                prompt=prompt,
+                max_tokens=80,
+                temperature=0.8
+            )
         
         return response.generations[0].text.strip()
     
     except Exception as e:
         print(f"Error creating conversation starter: {e}")
+        LLM_ERRORS.inc(provider="cohere")
+        LLM_FALLBACKS.inc(kind="conversation_starter")
         return "Hey! I noticed you're working on something interesting. Mind if I ask what you're building?"
 
 def create_mock_betting_lines(objects: List[str]) -> List[Dict]:
     """Fallback betting lines when LLM is not available"""
+    LLM_FALLBACKS.inc(kind="betting_lines")
     mock_lines = [
         {
             "line": f"Someone will spill coffee on their {objects[0] if objects else 'laptop'} in the next hour",
@@ -291,20 +613,21 @@ def create_mock_betting_lines(objects: List[str]) -> List[Dict]:
     ]
     return mock_lines
 
+MOCK_NETWORKING_PROMPTS = [
+    "Introduce yourself and ask about their project",
+    "Exchange LinkedIn profiles and discuss tech interests",
+    "Ask what brought them to this hackathon",
+    "Share your project idea and ask for feedback",
+    "Discuss the most interesting tech you've seen today"
+]
+
 def create_mock_networking_prompt(face_info: Dict) -> str:
     """Fallback networking prompt when LLM is not available"""
-    prompts = [
-        "Introduce yourself and ask about their project",
-        "Exchange LinkedIn profiles and discuss tech interests",
-        "Ask what brought them to this hackathon",
-        "Share your project idea and ask for feedback",
-        "Discuss the most interesting tech you've seen today"
-    ]
-    
+    LLM_FALLBACKS.inc(kind="networking_prompt")
     # Use confidence to pick different prompts
     confidence = face_info.get("confidence", 0.5)
-    index = int(confidence * len(prompts)) % len(prompts)
-    return prompts[index]
+    index = int(confidence * len(MOCK_NETWORKING_PROMPTS)) % len(MOCK_NETWORKING_PROMPTS)
+    return MOCK_NETWORKING_PROMPTS[index]
 
 def generate_quest_reward(quest_type: str, difficulty: str = "medium") -> int:
     """
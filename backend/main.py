@@ -1,18 +1,43 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import time
+
+# Startup-time breakdown, logged once the server starts and reported by /ready
+_imports_started = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import uvicorn
+import asyncio
 import os
 import uuid
+import numpy as np
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
-from detect import detect_objects_enhanced, detect_faces
-from llm import create_sponsor_betting_lines, create_networking_prompt, generate_quest_batch
+from detect import (detect_objects_enhanced, detect_object_arrays, detect_faces, detect_faces_in_boxes,
+                    decode_frame, decode_reduced_grey, detection_result_from_arrays, warmup_object_detector,
+                    warmup_face_detector, yolo_decode_size, sponsor_mapping, PERSON_CLASS_ID, FACE_EMBEDDINGS_ENABLED, YOLO_BATCH_SIZE)
+from inference_pool import InferencePool, WorkerUnavailable, INFERENCE_WORKERS, INFERENCE_JOBS_PER_WORKER
+from frame_cache import DetectionCache, frame_dhash
+from tracking import ObjectTracker, TrackerRegistry
+from adaptive import AdaptiveController
+from annotated_stream import BOUNDARY, FrameStore, mjpeg_frames
+from motion import MotionGate
+from admission import AdmissionController, AdmissionRejected, ClientDisconnected, UploadTooLarge
+import batch_ingest
+from face_index import FaceIndex
+from fair_queue import FairQueue, FAIR_QUEUE_CONCURRENCY
+from metrics import counter, gauge, histogram, render_latest, stage_timer
+from llm import (create_sponsor_betting_lines_async, create_networking_prompts_async, generate_quest_batch,
+                 warmup_llm_clients, close_llm_clients, llm_stats)
 from db import DatabaseManager
 
 load_dotenv()
 
+startup_timings: Dict[str, float] = {"imports": time.perf_counter() - _imports_started}
+
 app = FastAPI(title="GooseGoGeese API", version="1.0.0")
 
 # CORS middleware for React frontend
@@ -24,8 +49,250 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+HTTP_REQUESTS = counter("goose_http_requests_total", "HTTP requests by route, method and status", ["route", "method", "status"])
+HTTP_SECONDS = histogram("goose_http_request_duration_seconds", "HTTP request latency by route", ["route"])
+HTTP_IN_FLIGHT = gauge("goose_http_requests_in_flight", "HTTP requests currently being handled")
+STREAM_FRAMES_DROPPED = counter("goose_stream_frames_dropped_total", "Stale frames dropped by /ws/detect")
+TRACKED_FRAMES = counter("goose_tracked_frames_total", "Frames of tracked sessions by whether YOLO ran", ["keyframe"])
+DETECTION_CACHE_ENTRIES = gauge("goose_detection_cache_entries", "Entries currently in the detection cache")
+
+# Detection endpoints are admitted before their upload is read and shed with 503 under overload
+admission = AdmissionController()
+ADMISSION_PATHS = {"/serious-mode", "/fun-mode", "/analyze"}
+
+@app.middleware("http")
+async def admit_detection_requests(request: Request, call_next):
+    if not admission.enabled or request.method != "POST" or request.url.path not in ADMISSION_PATHS:
+        return await call_next(request)
+    try:
+        size = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        size = 0
+    try:
+        await admission.acquire(size)
+    except AdmissionRejected as e:
+        return JSONResponse(status_code=503, headers={"Retry-After": str(e.retry_after)},
+                            content={"detail": "Detection is overloaded, please retry", "reason": e.reason})
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"detail": str(e), "reason": "too_large"})
+    started = time.perf_counter()
+    try:
+        try:
+            body, size = await admission.read_body(request, size)
+        except UploadTooLarge as e:
+            return JSONResponse(status_code=413, content={"detail": str(e), "reason": "too_large"})
+        # Hand the counted body to the endpoint instead of letting it read the stream again
+        request._body = body
+        return await call_next(request)
+    finally:
+        admission.release(size, started)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    HTTP_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        # Label by route template so path parameters do not explode the series count
+        route = request.scope.get("route")
+        path = getattr(route, "path", None)
+        if path is None:
+            # Shed requests never reach the router
+            path = request.url.path if request.url.path in ADMISSION_PATHS else "unmatched"
+        HTTP_REQUESTS.inc(route=path, method=request.method, status=str(status))
+        HTTP_SECONDS.observe(time.perf_counter() - start, route=path)
+
 # Initialize database
+_database_started = time.perf_counter()
 db = DatabaseManager()
+startup_timings["database"] = time.perf_counter() - _database_started
+
+# Recently seen faces, so a person seen again gets the quest they were already given
+face_index = FaceIndex()
+
+# Steps YOLO down to smaller models / input sizes under load and back up when it subsides;
+# calls still waiting in the fair queue count towards its queue depth
+adaptive_controller = AdaptiveController(queued=lambda: fair_queue.waiting)
+
+# Inference worker processes; INFERENCE_WORKERS=0 runs detection in the threadpool instead
+inference_pool = InferencePool(warmup_tiers=adaptive_controller.warmup_tiers()) if INFERENCE_WORKERS > 0 else None
+inference_pool_ready = asyncio.Event()
+
+# Orders inference calls per user by deficit round-robin, so one busy client cannot starve the rest
+fair_queue = FairQueue(FAIR_QUEUE_CONCURRENCY or (INFERENCE_WORKERS * INFERENCE_JOBS_PER_WORKER if inference_pool is not None
+                                                 else YOLO_BATCH_SIZE))
+
+# Models and SDK clients are loaded by a background warmup after the server starts accepting
+# requests. Status per component: "pending", "ready" or "failed".
+component_status: Dict[str, str] = {"database": "ready", "llm": "pending"}
+if inference_pool is not None:
+    component_status["inference_pool"] = "pending"
+else:
+    component_status["object_detector"] = "pending"
+    component_status["face_detector"] = "pending"
+warmup_task: Optional[asyncio.Task] = None
+
+async def start_inference_pool() -> bool:
+    """Spawn the workers; if that fails, detection falls back to the threadpool"""
+    global inference_pool
+    try:
+        await run_in_threadpool(inference_pool.start, asyncio.get_running_loop())
+        return True
+    except Exception:
+        await run_in_threadpool(inference_pool.shutdown)
+        inference_pool = None
+        raise
+    finally:
+        inference_pool_ready.set()
+
+async def warm_component(name: str, warmup):
+    start = time.perf_counter()
+    try:
+        ok = await warmup
+        component_status[name] = "ready" if ok else "failed"
+    except Exception as e:
+        component_status[name] = "failed"
+        print(f"❌ Warmup of {name} failed: {e}")
+    startup_timings[name] = time.perf_counter() - start
+
+async def warm_up():
+    """Load models and SDK clients concurrently, off the request path"""
+    warmups = [warm_component("llm", run_in_threadpool(warmup_llm_clients))]
+    if inference_pool is not None:
+        warmups.append(warm_component("inference_pool", start_inference_pool()))
+    else:
+        warmups.append(warm_component("object_detector",
+                                      run_in_threadpool(warmup_object_detector, adaptive_controller.warmup_tiers())))
+        warmups.append(warm_component("face_detector", run_in_threadpool(warmup_face_detector)))
+    await asyncio.gather(*warmups)
+    breakdown = ", ".join(f"{name} {startup_timings[name]:.2f}s ({status})"
+                          for name, status in component_status.items() if name != "database")
+    print(f"⏱️ Warmup finished: {breakdown}")
+
+@app.on_event("startup")
+async def start_warmup():
+    global warmup_task
+    print(f"⏱️ Startup: imports {startup_timings['imports']:.2f}s, database {startup_timings['database']:.2f}s; "
+          f"models warming up in the background")
+    warmup_task = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def stop_inference_pool():
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if inference_pool is not None:
+        await run_in_threadpool(inference_pool.shutdown)
+    await close_llm_clients()
+
+# Perceptual-hash cache so near-identical consecutive frames skip inference
+detection_cache = DetectionCache()
+
+# Detectors used when there is no inference pool, by task name
+LOCAL_DETECTORS = {
+    "objects": detect_objects_enhanced,
+    "object_arrays": detect_object_arrays,
+    "faces": detect_faces,
+    "faces_in_boxes": detect_faces_in_boxes
+}
+
+# Object trackers of live camera sessions that post frames to /fun-mode with a session_id
+tracker_registry = TrackerRegistry()
+
+# Newest frame and boxes of live sessions watched through /stream/annotated
+frame_store = FrameStore()
+
+# Reuses the last /fun-mode result while a session's scene stays still
+motion_gate = MotionGate()
+
+# Tasks that run YOLO and so follow the adaptive inference tier
+YOLO_TASKS = {"objects", "object_arrays"}
+
+async def run_inference(task: str, image, tenant: str = "default_user", mode: Optional[str] = None, **kwargs):
+    """Run a detection task on upload bytes or a decoded frame, in the inference pool if there is one.
+    
+    The call waits its turn in the fair queue as `tenant`; mode (default "fun" for YOLO
+    tasks, "serious" for faces) picks the weight of its flow.
+    """
+    if inference_pool is not None:
+        # Requests that arrive while the workers are still starting wait for them
+        await inference_pool_ready.wait()
+    mode = mode or ("fun" if task in YOLO_TASKS else "serious")
+    async with fair_queue.slot(tenant, mode):
+        if task not in YOLO_TASKS:
+            return await _dispatch_inference(task, image, **kwargs)
+        with adaptive_controller.track() as tier:
+            return await _dispatch_inference(task, image, model=tier.model, imgsz=tier.imgsz, **kwargs)
+
+async def _dispatch_inference(task: str, image, **kwargs):
+    if inference_pool is not None:
+        try:
+            return await inference_pool.run(task, image, **kwargs)
+        except WorkerUnavailable:
+            # Every worker is being respawned; run here rather than fail the request
+            pass
+    return await run_in_threadpool(LOCAL_DETECTORS[task], image, **kwargs)
+
+async def run_detection(task: str, image_bytes: bytes, user_id: str = "default_user", frame=None,
+                        frame_hash: Optional[int] = None, **kwargs):
+    """Run a detection task ("objects", "object_arrays" or "faces") without blocking the event loop.
+    
+    frame is the already decoded image_bytes and frame_hash their frame_dhash, if the caller
+    needed them anyway. Extra keyword arguments go to the detector and keep their results
+    apart in the detection cache.
+    """
+    cache_task = task + "".join(f":{name}={value}" for name, value in sorted(kwargs.items()))
+    if not detection_cache.enabled:
+        frame_hash = None
+    elif frame_hash is None:
+        try:
+            with stage_timer("frame_hash"):
+                frame_hash = await run_in_threadpool(frame_dhash, image_bytes)
+        except Exception as e:
+            print(f"⚠️ Could not hash frame for detection cache: {e}")
+    if frame_hash is not None:
+        cached = detection_cache.get(user_id, cache_task, frame_hash)
+        if cached is not None:
+            return cached
+
+    result = await run_inference(task, frame if frame is not None else image_bytes, user_id, **kwargs)
+
+    if frame_hash is not None:
+        detection_cache.put(user_id, cache_task, frame_hash, result)
+    return result
+
+async def run_tracked_detection(tracker: ObjectTracker, image_bytes: bytes, user_id: str = "default_user",
+                                frame=None, frame_hash: Optional[int] = None) -> Dict:
+    """Object detection for a live session: YOLO on keyframes, tracker propagation in between"""
+    keyframe = tracker.needs_keyframe()
+    arrays = await run_detection("object_arrays", image_bytes, user_id, frame, frame_hash) if keyframe else None
+    if arrays is not None:
+        tracker.update(*arrays)
+    else:
+        # Failed keyframes are retried on the next frame
+        keyframe = False
+        tracker.step()
+    TRACKED_FRAMES.inc(keyframe=str(keyframe).lower())
+    result = tracker.result()
+    result["keyframe"] = keyframe
+    return result
+
+async def publish_display_frame(session_id: Optional[str], image_bytes: bytes):
+    """Decode a live frame up front while a display watches the session, so inference reuses the decode"""
+    if not session_id or not frame_store.has_viewers(session_id):
+        return None
+    try:
+        decode_size = yolo_decode_size(adaptive_controller.current_tier().imgsz)
+        frame = await run_in_threadpool(decode_frame, image_bytes, "bgr", decode_size)
+    except Exception:
+        # Detection reports the bad upload the usual way
+        return None
+    frame_store.publish_frame(session_id, frame)
+    return frame
 
 # Pydantic models for room management
 class CreateRoomRequest(BaseModel):
@@ -38,29 +305,83 @@ class JoinRoomRequest(BaseModel):
 async def root():
     return {"message": "GooseGoGeese API is running!"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until every component has finished warming up"""
+    is_ready = all(status != "pending" for status in component_status.values())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "ready": is_ready,
+            "degraded": any(status == "failed" for status in component_status.values()),
+            "components": component_status,
+            "startup_seconds": {name: round(seconds, 3) for name, seconds in startup_timings.items()}
+        }
+    )
+
+async def serve_until_disconnected(request: Request, work):
+    """Await an endpoint's work once its upload is read, dropping the work if the client goes away"""
+    try:
+        return await admission.cancel_on_disconnect(request, work)
+    except ClientDisconnected:
+        return Response(status_code=499)
+
+async def networking_quests(faces: List[Dict], embeddings: Optional[np.ndarray]) -> List[Dict]:
+    """One networking quest per face; faces found in the face index get the quest they were given before"""
+    matches = face_index.match_or_add(embeddings) if embeddings is not None else [(None, False)] * len(faces)
+    
+    prompts = [face_index.quest(face_id) if face_id is not None else None for face_id, _ in matches]
+    # Faces without a cached quest get theirs from one batched LLM call
+    missing = [i for i, prompt in enumerate(prompts) if prompt is None]
+    for i, prompt in zip(missing, await create_networking_prompts_async([faces[i] for i in missing])):
+        prompts[i] = prompt
+        face_id = matches[i][0]
+        if face_id is not None:
+            face_index.set_quest(face_id, prompt)
+    quests = []
+    for i, (prompt, (face_id, known)) in enumerate(zip(prompts, matches)):
+        quest = {
+            "id": f"quest_{i}",
+            "type": "networking",
+            "description": prompt,
+            "target": f"Person {i+1}",
+            "reward": 10
+        }
+        if face_id is not None:
+            quest["face_id"] = face_id
+            quest["known_face"] = known
+        quests.append(quest)
+    return quests
+
+def client_key(client, user_id: str, session_id: Optional[str] = None) -> str:
+    """Who a detection call is for: the fair-queue tenant and the scope of the detection cache
+    and motion gate. Clients that send no user_id are told apart by session or address.
+    """
+    if user_id != "default_user":
+        return user_id
+    if session_id:
+        return f"session:{session_id}"
+    if client is not None and client.host:
+        return f"client:{client.host}"
+    return user_id
+
 @app.post("/serious-mode")
-async def serious_mode(file: UploadFile = File(...)):
+async def serious_mode(request: Request, file: UploadFile = File(...), user_id: str = Form("default_user")):
     """Detect faces and provide networking quest suggestions"""
+    image_bytes = await file.read()
+    return await serve_until_disconnected(request, serious_mode_response(image_bytes, client_key(request.client, user_id)))
+
+async def serious_mode_response(image_bytes: bytes, user_id: str):
     try:
-        image_bytes = await file.read()
-        
         # Detect faces in the image
-        faces_detected = detect_faces(image_bytes)
+        face_result = await run_detection("faces", image_bytes, user_id, embed=FACE_EMBEDDINGS_ENABLED)
+        faces_detected = face_result["faces"]
         
         if not faces_detected:
             return {"message": "No faces detected. Try getting closer to people!", "quests": []}
         
-        # Generate networking quest suggestions
-        quests = []
-        for i, face in enumerate(faces_detected):
-            quest_prompt = create_networking_prompt(face)
-            quests.append({
-                "id": f"quest_{i}",
-                "type": "networking",
-                "description": quest_prompt,
-                "target": f"Person {i+1}",
-                "reward": 10
-            })
+        # Generate networking quest suggestions, reusing the quests of people seen before
+        quests = await networking_quests(faces_detected, face_result.get("embeddings"))
         
         return {
             "faces_detected": len(faces_detected),
@@ -72,24 +393,66 @@ async def serious_mode(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/fun-mode")
-async def fun_mode(file: UploadFile = File(...)):
-    """Detect objects and create sponsor-specific betting lines"""
+async def fun_mode(request: Request, file: UploadFile = File(...), user_id: str = Form("default_user"),
+                   session_id: Optional[str] = Form(None), tiled: Optional[bool] = Form(None)):
+    """Detect objects and create sponsor-specific betting lines.
+    
+    Live camera clients pass a session_id: YOLO then only runs on keyframes and the
+    detections in between come from the session's tracker, each with a stable track_id.
+    Frames of an unchanged scene reuse the session's (or user's) last result.
+    High-resolution stills can pass tiled=true to detect small objects on full-resolution tiles.
+    """
+    image_bytes = await file.read()
+    user_id = client_key(request.client, user_id, session_id)
+    return await serve_until_disconnected(request, fun_mode_response(image_bytes, user_id, session_id, tiled))
+
+async def fun_mode_response(image_bytes: bytes, user_id: str, session_id: Optional[str], tiled: Optional[bool]):
     try:
-        image_bytes = await file.read()
+        gate_key = f"session:{session_id}" if session_id else f"user:{user_id}:tiled={tiled}"
+        thumbnail = None
+        frame_hash = None
+        gated_result = None
+        if motion_gate.enabled or detection_cache.enabled:
+            try:
+                # One 1/8-scale greyscale decode feeds both the motion gate and the cache hash
+                with stage_timer("frame_thumbnail"):
+                    grey = await run_in_threadpool(decode_reduced_grey, image_bytes)
+                if motion_gate.enabled:
+                    with stage_timer("motion_gate"):
+                        thumbnail = motion_gate.thumbnail(grey)
+                        gated_result = motion_gate.check(gate_key, thumbnail)
+                if detection_cache.enabled and gated_result is None:
+                    frame_hash = frame_dhash(grey)
+            except Exception as e:
+                print(f"⚠️ Could not read frame for the motion gate and detection cache: {e}")
         
-        # Enhanced object detection with sponsor categorization
-        detection_result = detect_objects_enhanced(image_bytes)
+        # Enhanced object detection with sponsor categorization. Runs off the event loop so
+        # concurrent requests can be micro-batched by the YOLO inference scheduler.
+        if gated_result is not None:
+            detection_result = gated_result
+        elif session_id:
+            frame = await publish_display_frame(session_id, image_bytes)
+            # Overlapping polls of one session take turns, so only one of them can be the keyframe
+            async with tracker_registry.session(session_id) as tracker:
+                detection_result = await run_tracked_detection(tracker, image_bytes, user_id, frame, frame_hash)
+            frame_store.publish_detections(session_id, detection_result.get("detections", []))
+        else:
+            options = {} if tiled is None else {"tiled": tiled}
+            detection_result = await run_detection("objects", image_bytes, user_id, frame_hash=frame_hash, **options)
+        if gated_result is None and thumbnail is not None:
+            motion_gate.update(gate_key, thumbnail, detection_result)
         
         if not detection_result.get("objects"):
             return {
                 "message": "No objects detected. Try pointing at something interesting!", 
                 "betting_lines": [],
                 "sponsor_categories": [],
-                "total_objects": 0
+                "total_objects": 0,
+                "inference_tier": adaptive_controller.current_tier().name
             }
         
         # Generate sponsor-specific betting lines
-        betting_lines = create_sponsor_betting_lines(detection_result)
+        betting_lines = await create_sponsor_betting_lines_async(detection_result)
         
         return {
             "objects_detected": detection_result["objects"],
@@ -98,12 +461,228 @@ async def fun_mode(file: UploadFile = File(...)):
             "betting_lines": betting_lines,
             "total_objects": detection_result["total_objects"],
             "detections": detection_result.get("detections", []),
+            "inference_tier": adaptive_controller.current_tier().name,
             "message": f"Found {detection_result['total_objects']} objects with {len(detection_result['sponsor_categories'])} sponsor categories!"
         }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze")
+async def analyze(request: Request, file: UploadFile = File(...), user_id: str = Form("default_user")):
+    """Serious and fun mode on one upload.
+    
+    The frame is decoded once and YOLO runs first; MediaPipe then only looks inside the
+    person boxes. Betting lines are generated while faces are detected and networking
+    quests written.
+    """
+    image_bytes = await file.read()
+    return await serve_until_disconnected(request, analyze_response(image_bytes, client_key(request.client, user_id)))
+
+async def analyze_response(image_bytes: bytes, user_id: str):
+    try:
+        # Decoded at the size the active tier's YOLO input needs
+        decode_size = yolo_decode_size(adaptive_controller.current_tier().imgsz)
+        frame = await run_in_threadpool(decode_frame, image_bytes, "bgr", decode_size)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+    
+    try:
+        arrays = await run_inference("object_arrays", frame, user_id)
+        if arrays is not None:
+            xyxy, confidences, class_ids = arrays
+            detection_result = detection_result_from_arrays(xyxy, confidences, class_ids)
+            person_boxes = xyxy[class_ids == PERSON_CLASS_ID]
+        else:
+            detection_result = detection_result_from_arrays(np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=np.int64))
+            person_boxes = None
+        
+        async def find_quests():
+            if person_boxes is None:
+                # No person boxes to narrow the search when YOLO is unavailable
+                face_result = await run_inference("faces", frame, user_id, embed=FACE_EMBEDDINGS_ENABLED)
+            elif len(person_boxes):
+                face_result = await run_inference("faces_in_boxes", frame, user_id, boxes=person_boxes,
+                                                  embed=FACE_EMBEDDINGS_ENABLED)
+            else:
+                face_result = {"faces": []}
+            faces = face_result["faces"]
+            return faces, await networking_quests(faces, face_result.get("embeddings"))
+        
+        async def find_betting_lines():
+            if not detection_result["objects"]:
+                return []
+            return await create_sponsor_betting_lines_async(detection_result)
+        
+        (faces, quests), betting_lines = await asyncio.gather(find_quests(), find_betting_lines())
+        
+        return {
+            "faces_detected": len(faces),
+            "faces": faces,
+            "quests": quests,
+            "objects_detected": detection_result["objects"],
+            "sponsor_categories": detection_result["sponsor_categories"],
+            "betting_opportunities": detection_result["betting_opportunities"],
+            "betting_lines": betting_lines,
+            "total_objects": detection_result["total_objects"],
+            "detections": detection_result["detections"],
+            "inference_tier": adaptive_controller.current_tier().name,
+            "message": f"Found {len(faces)} people to network with and {detection_result['total_objects']} objects "
+                       f"with {len(detection_result['sponsor_categories'])} sponsor categories!"
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.websocket("/ws/detect")
+async def detect_stream(websocket: WebSocket, mode: str = "fun", user_id: str = "default_user", track: bool = True,
+                        session_id: Optional[str] = None):
+    """Stream detection over one persistent socket.
+    
+    The client sends binary messages made of a 4-byte big-endian frame sequence number
+    followed by the JPEG bytes, and gets back one JSON message per processed frame that
+    echoes the sequence number. While inference is busy only the newest frame is kept,
+    so older frames are dropped instead of queueing up. In fun mode objects are tracked
+    across frames unless track=false, so YOLO only runs on keyframes, and a session_id
+    makes the stream watchable at /stream/annotated.
+    """
+    await websocket.accept()
+    user_id = client_key(websocket.client, user_id, session_id)
+    task = "faces" if mode == "serious" else "objects"
+    tracker = ObjectTracker() if task == "objects" and track else None
+    latest = None
+    frame_ready = asyncio.Event()
+    dropped_frames = 0
+    
+    async def receive_frames():
+        nonlocal latest, dropped_frames
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            data = message.get("bytes")
+            if not data or len(data) <= 4:
+                continue
+            if latest is not None:
+                # Latest frame wins: the one waiting is now stale
+                dropped_frames += 1
+                STREAM_FRAMES_DROPPED.inc()
+            latest = (int.from_bytes(data[:4], "big"), data[4:])
+            frame_ready.set()
+    
+    async def process_frames():
+        nonlocal latest
+        while True:
+            await frame_ready.wait()
+            frame_ready.clear()
+            seq, image_bytes = latest
+            latest = None
+            
+            start = time.perf_counter()
+            frame = await publish_display_frame(session_id, image_bytes) if task == "objects" else None
+            if tracker is not None:
+                result = await run_tracked_detection(tracker, image_bytes, user_id, frame)
+            else:
+                result = await run_detection(task, image_bytes, user_id, frame)
+            if frame is not None:
+                frame_store.publish_detections(session_id, result.get("detections", []))
+            await websocket.send_json({
+                "seq": seq,
+                "mode": mode,
+                "inference_ms": round((time.perf_counter() - start) * 1000.0, 1),
+                "dropped_frames": dropped_frames,
+                "inference_tier": adaptive_controller.current_tier().name,
+                **result
+            })
+    
+    receiver = asyncio.create_task(receive_frames())
+    processor = asyncio.create_task(process_frames())
+    try:
+        done, _ = await asyncio.wait({receiver, processor}, return_when=asyncio.FIRST_COMPLETED)
+        errors = [finished.exception() for finished in done
+                  if not finished.cancelled() and finished.exception() is not None
+                  and not isinstance(finished.exception(), WebSocketDisconnect)]
+        if errors:
+            print(f"❌ Error in detection stream: {errors[0]}")
+            # Tell the client why the stream ended instead of just dropping it
+            try:
+                await websocket.send_json({"error": "Detection failed", "detail": str(errors[0])})
+                await websocket.close(code=1011, reason="Detection failed")
+            except (WebSocketDisconnect, RuntimeError):
+                pass
+    finally:
+        receiver.cancel()
+        processor.cancel()
+        await asyncio.gather(receiver, processor, return_exceptions=True)
+
+@app.get("/stream/annotated")
+async def annotated_stream(session_id: str):
+    """MJPEG stream of a live session's frames with its detections drawn on, for venue displays.
+    
+    Frames come from /fun-mode (session_id form field) or /ws/detect (session_id query
+    parameter) in fun mode and are sent at ANNOTATED_STREAM_FPS whatever the inference rate.
+    """
+    return StreamingResponse(mjpeg_frames(frame_store, session_id),
+                             media_type=f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+
+# Batch jobs run for minutes; only a few at a time so they cannot starve live traffic
+batch_jobs = asyncio.Semaphore(batch_ingest.BATCH_MAX_JOBS)
+
+async def detect_batch_frame(frame) -> Dict:
+    """Object detection for one batch frame, at the current tier but kept out of its latency window.
+    
+    Unlike /fun-mode there is no demo data: a frame without detections reports no objects.
+    """
+    if inference_pool is not None:
+        await inference_pool_ready.wait()
+    # All batch jobs share one low-weight flow, behind live traffic
+    async with fair_queue.slot("batch", "batch"):
+        tier = adaptive_controller.current_tier()
+        arrays = await _dispatch_inference("object_arrays", frame, model=tier.model, imgsz=tier.imgsz)
+    if arrays is None:
+        raise RuntimeError("object detector is not available")
+    return detection_result_from_arrays(*arrays)
+
+@app.post("/batch/analyze")
+async def batch_analyze(file: UploadFile = File(...), sample_fps: float = Form(batch_ingest.BATCH_VIDEO_SAMPLE_FPS)):
+    """Sponsor analysis over a zip of photos or a video file, streamed back as NDJSON.
+    
+    One line per frame ({"index", "source", "timestamp" for video, detection fields, or
+    "error"}) in completion order, then a {"done": true, ...} summary line.
+    """
+    if batch_jobs.locked():
+        return JSONResponse(status_code=503, headers={"Retry-After": "30"},
+                            content={"detail": "Too many batch jobs running, please retry"})
+    await batch_jobs.acquire()
+    video_path = None
+    try:
+        decode_size = yolo_decode_size(adaptive_controller.current_tier().imgsz)
+        if batch_ingest.is_zip(file.file, file.filename):
+            kind = "zip"
+            items = batch_ingest.iter_zip_frames(file.file, decode_size)
+        else:
+            kind = "video"
+            suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+            video_path = await run_in_threadpool(batch_ingest.spool_to_disk, file.file, suffix)
+            capture = await run_in_threadpool(batch_ingest.open_video, video_path)
+            items = batch_ingest.iter_video_frames(capture, decode_size, sample_fps, source=file.filename or "video")
+    except Exception as e:
+        batch_jobs.release()
+        if video_path is not None:
+            os.unlink(video_path)
+        raise HTTPException(status_code=400, detail=f"Could not read upload as a zip of images or a video: {e}")
+
+    async def results():
+        try:
+            async for line in batch_ingest.stream_batch_results(items, detect_batch_frame, kind):
+                yield line
+        finally:
+            batch_jobs.release()
+            if video_path is not None:
+                os.unlink(video_path)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @app.post("/complete-quest")
 async def complete_quest(quest_id: str, user_id: str = "default_user"):
     """Complete a quest and award GooseGoGeese tokens"""
@@ -302,6 +881,53 @@ async def reject_quest(quest_id: str, user_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, counters and in-flight gauges"""
+    DETECTION_CACHE_ENTRIES.set(detection_cache.stats()["entries"])
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/admin/detection-cache")
+async def get_detection_cache_stats():
+    """Hit/miss counters of the perceptual-hash detection cache"""
+    return detection_cache.stats()
+
+@app.get("/admin/admission")
+async def get_admission_stats():
+    """Queue depth, rejections and cancellations of detection admission control"""
+    return admission.stats()
+
+@app.get("/admin/fair-queue")
+async def get_fair_queue_stats():
+    """Fair queue occupancy and wait times per tenant"""
+    return fair_queue.stats()
+
+@app.get("/admin/llm")
+async def get_llm_stats():
+    """Calls, timeouts and concurrency limits of the LLM providers"""
+    return llm_stats()
+
+@app.get("/admin/face-index")
+async def get_face_index_stats():
+    """Faces in the repeat-person index and how often a quest was reused"""
+    return face_index.stats()
+
+@app.get("/admin/motion-gate")
+async def get_motion_gate_stats():
+    """Motion gate decisions and skip rate of /fun-mode frames"""
+    return motion_gate.stats()
+
+@app.get("/admin/sponsor-mapping")
+async def get_sponsor_mapping():
+    """Version of the sponsor mapping in use; edits to sponsors.json are picked up without a restart"""
+    return sponsor_mapping.stats()
+
+@app.get("/admin/inference-tier")
+async def get_inference_tier():
+    """Active adaptive inference tier with the latency and queue figures it was chosen from"""
+    return adaptive_controller.stats()
+
 @app.get("/admin", response_class=HTMLResponse)
 async def admin_panel():
     """Admin panel for monitoring the GooseTokens system"""
@@ -502,6 +1128,20 @@ async def admin_panel():
                             </div>
                             <span class="method post">POST</span>
                         </div>
+                        <div class="endpoint">
+                            <div>
+                                <div class="endpoint-path">POST /analyze</div>
+                                <div class="endpoint-desc">Faces and objects from one upload: quests and betting lines</div>
+                            </div>
+                            <span class="method post">POST</span>
+                        </div>
+                        <div class="endpoint">
+                            <div>
+                                <div class="endpoint-path">GET /stream/annotated</div>
+                                <div class="endpoint-desc">MJPEG display of a live session with boxes drawn on</div>
+                            </div>
+                            <span class="method get">GET</span>
+                        </div>
                         <div class="endpoint">
                             <div>
                                 <div class="endpoint-path">POST /complete-quest</div>
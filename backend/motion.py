@@ -0,0 +1,108 @@
+"""
+Motion gate for /fun-mode.
+
+A phone lying on a table keeps uploading the same scene. Before inference each frame is
+reduced to a tiny greyscale thumbnail (JPEGs are decoded at 1/8 scale) and compared with
+the thumbnail of the last frame that went through the detector for the same session or
+user. While the mean absolute difference stays below MOTION_GATE_THRESHOLD, that frame's
+result is reused; after MOTION_GATE_MAX_STALENESS seconds a refresh is forced anyway.
+Comparing against the last inferred frame rather than the previous upload means a slow
+drift still adds up to a refresh.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from detect import decode_thumbnail
+from metrics import counter, histogram
+
+MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "true").lower() == "true"
+MOTION_GATE_WIDTH = int(os.getenv("MOTION_GATE_WIDTH", "32"))
+MOTION_GATE_HEIGHT = int(os.getenv("MOTION_GATE_HEIGHT", "24"))
+# Mean absolute grey-level difference (0-255) below which the scene counts as unchanged
+MOTION_GATE_THRESHOLD = float(os.getenv("MOTION_GATE_THRESHOLD", "3"))
+MOTION_GATE_MAX_STALENESS = float(os.getenv("MOTION_GATE_MAX_STALENESS", "3"))
+MOTION_GATE_SESSION_TTL = float(os.getenv("MOTION_GATE_SESSION_TTL", "60"))
+MOTION_GATE_MAX_SESSIONS = int(os.getenv("MOTION_GATE_MAX_SESSIONS", "1024"))
+
+# Decisions: "skip" (result reused), "motion", "stale" (refresh forced) and "first"
+MOTION_GATE_DECISIONS = counter("goose_motion_gate_decisions_total", "Motion gate decisions per frame", ["decision"])
+MOTION_GATE_DIFFERENCE = histogram("goose_motion_gate_difference", "Mean absolute thumbnail difference to the last inferred frame",
+                                   buckets=(0.5, 1, 2, 3, 4, 6, 8, 12, 16, 32, 64))
+
+class MotionGate:
+    """Per-session reference thumbnail and result of the last frame that ran inference"""
+
+    def __init__(self, enabled: bool = MOTION_GATE_ENABLED, threshold: float = MOTION_GATE_THRESHOLD,
+                 max_staleness: float = MOTION_GATE_MAX_STALENESS, size: Tuple[int, int] = (MOTION_GATE_WIDTH, MOTION_GATE_HEIGHT),
+                 idle_ttl: float = MOTION_GATE_SESSION_TTL, max_sessions: int = MOTION_GATE_MAX_SESSIONS):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.max_staleness = max_staleness
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max(1, max_sessions)
+        self._lock = threading.Lock()
+        # key -> (last_seen, inferred_at, thumbnail, result), least recently seen first
+        self._sessions: "OrderedDict[str, Tuple[float, float, np.ndarray, Dict]]" = OrderedDict()
+        self.decisions = {"skip": 0, "motion": 0, "stale": 0, "first": 0}
+
+    def thumbnail(self, image: Union[bytes, np.ndarray]) -> np.ndarray:
+        """Comparison thumbnail of upload bytes or of a frame from decode_reduced_grey"""
+        return decode_thumbnail(image, *self.size).astype(np.int16)
+
+    def check(self, key: str, thumbnail: np.ndarray) -> Optional[Dict]:
+        """Result to reuse if the scene has not changed since the last inferred frame, else None"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            state = self._sessions.get(key)
+            if state is None:
+                decision, result = "first", None
+            else:
+                _, inferred_at, reference, cached = state
+                difference = float(np.abs(thumbnail - reference).mean())
+                MOTION_GATE_DIFFERENCE.observe(difference)
+                if difference >= self.threshold:
+                    decision, result = "motion", None
+                elif now - inferred_at >= self.max_staleness:
+                    decision, result = "stale", None
+                else:
+                    decision, result = "skip", cached
+                self._sessions[key] = (now,) + state[1:]
+                self._sessions.move_to_end(key)
+            self.decisions[decision] += 1
+        MOTION_GATE_DECISIONS.inc(decision=decision)
+        return result
+
+    def update(self, key: str, thumbnail: np.ndarray, result: Dict):
+        """Make this inferred frame the new reference for the session"""
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[key] = (now, now, thumbnail, result)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def _evict(self, now: float):
+        while self._sessions:
+            key, (last_seen, *_) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.idle_ttl:
+                break
+            del self._sessions[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            frames = sum(self.decisions.values())
+            return {
+                "enabled": self.enabled,
+                "sessions": len(self._sessions),
+                "decisions": dict(self.decisions),
+                "skip_rate": self.decisions["skip"] / frames if frames else 0.0,
+                "threshold": self.threshold,
+                "max_staleness_seconds": self.max_staleness
+            }
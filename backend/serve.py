@@ -0,0 +1,206 @@
+"""
+Pre-fork launcher for the API: python serve.py --workers 4
+
+`uvicorn --workers N` starts N fresh interpreters that each import torch and load YOLO and
+MediaPipe, so memory and startup time grow with N. This launcher loads the models (every
+adaptive tier) and the sponsor table once, freezes the heap, binds the listening socket and
+only then forks the workers. Model weights are never written after loading, so their pages
+stay shared copy-on-write between all workers. Each worker then imports main.py itself, so
+database and LLM clients, connection pools and the event loop are never shared across a fork.
+
+The parent supervises: a worker that dies is forked again from the warm parent, SIGTERM and
+SIGINT are passed on to the workers, and per-worker memory is logged every
+PREFORK_MEMORY_REPORT_SECONDS. Inference runs in each worker's threadpool; the spawn-based
+inference pool is turned off here because its processes would load their own model copies.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List
+
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", "4"))
+# Intra-op threads (torch / OpenCV) of each worker; the parent loads the models single-threaded
+PREFORK_THREADS_PER_WORKER = int(os.getenv("PREFORK_THREADS_PER_WORKER", "2"))
+PREFORK_MEMORY_REPORT_SECONDS = float(os.getenv("PREFORK_MEMORY_REPORT_SECONDS", "60"))
+# A worker that dies sooner than this after its fork is restarted with a delay
+PREFORK_RESTART_BACKOFF_SECONDS = float(os.getenv("PREFORK_RESTART_BACKOFF_SECONDS", "5"))
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """RSS, PSS, shared and private (USS) bytes of a process, from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+def memory_report(parent: int, workers: List[int]) -> Dict:
+    """Per-worker memory plus the PSS total of parent and workers, which counts shared pages once"""
+    per_worker = {}
+    for pid in workers:
+        try:
+            per_worker[pid] = process_memory(pid)
+        except OSError:
+            continue
+    parent_memory = process_memory(parent)
+    return {
+        "parent": parent_memory,
+        "workers": per_worker,
+        "total_pss": parent_memory["pss"] + sum(memory["pss"] for memory in per_worker.values())
+    }
+
+def format_memory_report(report: Dict) -> str:
+    mib = 1024 * 1024
+    workers = report["workers"].values()
+    if not workers:
+        return f"parent RSS {report['parent']['rss'] / mib:.0f} MiB, no workers"
+    return (f"{len(workers)} workers, per worker RSS {max(m['rss'] for m in workers) / mib:.0f} MiB"
+            f" (shared {min(m['shared'] for m in workers) / mib:.0f} MiB,"
+            f" private {max(m['private'] for m in workers) / mib:.0f} MiB);"
+            f" total PSS {report['total_pss'] / mib:.0f} MiB incl. parent")
+
+def _set_threads(threads: int):
+    import cv2
+
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+def preload() -> bool:
+    """Load everything the workers can share read-only; runs in the parent before any fork"""
+    # Thread pools created now would be lost in the forked workers; keep them from starting
+    _set_threads(1)
+
+    import detect
+    from adaptive import AdaptiveController
+
+    started = time.perf_counter()
+    tiers = AdaptiveController().warmup_tiers()
+    ok = detect.preload_object_detector(tiers)
+    # MediaPipe graphs run their own threads, so only the library is loaded here;
+    # each worker builds its graphs after the fork
+    detect.get_mp_face_detection()
+    detect.get_face_recognition()
+    sponsors = detect.sponsor_mapping.stats()
+    print(f"✅ Preloaded {', '.join(f'{model}@{imgsz}' for model, imgsz in tiers)} and sponsor mapping "
+          f"{sponsors['version']} in {time.perf_counter() - started:.1f}s")
+    return ok
+
+def _worker(worker_id: int, sock: socket.socket, args):
+    """Body of a forked worker; never returns"""
+    status = 1
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        _set_threads(args.threads)
+
+        import uvicorn
+        import main
+
+        print(f"🚀 Worker {worker_id} (pid {os.getpid()}) serving on {args.host}:{args.port}")
+        uvicorn.Server(uvicorn.Config(main.app, log_level=args.log_level)).run(sockets=[sock])
+        status = 0
+    except Exception as e:
+        print(f"❌ Worker {worker_id} failed: {e}")
+    finally:
+        # Skip the parent's atexit handlers, flushing only what this worker printed
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+def serve(args):
+    # Workers share the parent's models; a spawned inference pool would load its own copies
+    if os.getenv("INFERENCE_WORKERS", "0") != "0":
+        print("⚠️ INFERENCE_WORKERS is ignored in pre-fork mode; each worker runs inference in its threadpool")
+    os.environ["INFERENCE_WORKERS"] = "0"
+
+    if not preload():
+        print("⚠️ YOLO could not be preloaded; workers will retry on their own")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Move everything allocated so far out of the collector's reach, so collections in the
+    # workers do not write to (and un-share) the parent's object pages
+    gc.collect()
+    gc.freeze()
+
+    if threading.active_count() > 1:
+        names = ", ".join(thread.name for thread in threading.enumerate() if thread is not threading.main_thread())
+        print(f"⚠️ Forking with background threads running ({names}); they will not exist in the workers")
+
+    workers: Dict[int, int] = {}
+    forked_at: Dict[int, float] = {}
+    stopping = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            _worker(worker_id, sock, args)
+        workers[pid] = worker_id
+        forked_at[worker_id] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for worker_id in range(args.workers):
+        spawn(worker_id)
+    print(f"🦆 Pre-fork server with {args.workers} workers on {args.host}:{args.port} (parent pid {os.getpid()})")
+
+    next_report = time.monotonic() + min(PREFORK_MEMORY_REPORT_SECONDS, 15) if PREFORK_MEMORY_REPORT_SECONDS > 0 else None
+    while workers:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            time.sleep(0.5)
+            if next_report is not None and time.monotonic() >= next_report:
+                print(f"📊 Memory: {format_memory_report(memory_report(os.getpid(), list(workers)))}")
+                next_report = time.monotonic() + PREFORK_MEMORY_REPORT_SECONDS
+            continue
+        worker_id = workers.pop(pid, None)
+        if worker_id is None or stopping:
+            continue
+        print(f"⚠️ Worker {worker_id} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+        if time.monotonic() - forked_at[worker_id] < PREFORK_RESTART_BACKOFF_SECONDS:
+            time.sleep(PREFORK_RESTART_BACKOFF_SECONDS)
+        if not stopping:
+            spawn(worker_id)
+    sock.close()
+    print("👋 Pre-fork server stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the GooseGoGeese API from workers forked after the models are loaded")
+    parser.add_argument("--workers", type=int, default=PREFORK_WORKERS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=PREFORK_THREADS_PER_WORKER, help="intra-op threads per worker")
+    parser.add_argument("--log-level", default="info")
+    serve(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
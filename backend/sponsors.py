@@ -0,0 +1,159 @@
+"""
+Sponsor mapping loaded from sponsors.json.
+
+The file maps object names to a sponsor category, sponsor name and betting multiplier.
+It is compiled once per version into arrays indexed by YOLO class id plus a read-only
+name index, so the per-box work in detection is array indexing. A daemon thread polls
+the file's mtime and swaps in a freshly compiled table when it changes; readers take the
+current table reference without a lock and keep a consistent view for the whole call.
+A file that fails to parse or validate is reported and the previous table stays active.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional
+
+import numpy as np
+
+from metrics import counter
+
+SPONSOR_MAPPING_PATH = os.getenv("SPONSOR_MAPPING_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sponsors.json"))
+SPONSOR_MAPPING_POLL_SECONDS = float(os.getenv("SPONSOR_MAPPING_POLL_SECONDS", "2"))
+
+SPONSOR_MAPPING_RELOADS = counter("goose_sponsor_mapping_reloads_total", "Sponsor mapping reloads by result", ["result"])
+
+class SponsorTable(NamedTuple):
+    """One compiled version of the sponsor mapping; never mutated after compilation"""
+    version: str
+    checksum: str
+    loaded_at: float
+    by_name: Mapping[str, Mapping]
+    class_names: np.ndarray
+    has_sponsor: np.ndarray
+    category: np.ndarray
+    sponsor: np.ndarray
+    multiplier: np.ndarray
+
+def compile_sponsor_table(raw: bytes, class_names: List[str]) -> SponsorTable:
+    """Parse and validate sponsors.json content and build the class-id indexed arrays"""
+    document = json.loads(raw)
+    objects = document.get("objects")
+    if not isinstance(objects, dict):
+        raise ValueError('sponsor mapping needs an "objects" object')
+
+    by_name = {}
+    for name, entry in objects.items():
+        missing = {"category", "sponsor", "multiplier"} - set(entry)
+        if missing:
+            raise ValueError(f"sponsor mapping entry '{name}' is missing {', '.join(sorted(missing))}")
+        info = {"category": str(entry["category"]), "sponsor": str(entry["sponsor"]),
+                "multiplier": float(entry["multiplier"])}
+        by_name[name.lower()] = MappingProxyType(info)
+
+    count = len(class_names)
+    has_sponsor = np.zeros(count, dtype=bool)
+    category = np.full(count, None, dtype=object)
+    sponsor = np.full(count, None, dtype=object)
+    multiplier = np.zeros(count, dtype=np.float64)
+    for class_id, name in enumerate(class_names):
+        info = by_name.get(name.lower())
+        if info is not None:
+            has_sponsor[class_id] = True
+            category[class_id] = info["category"]
+            sponsor[class_id] = info["sponsor"]
+            multiplier[class_id] = info["multiplier"]
+
+    for array in (has_sponsor, category, sponsor, multiplier):
+        array.flags.writeable = False
+    checksum = hashlib.sha256(raw).hexdigest()[:12]
+    return SponsorTable(
+        version=str(document.get("version", checksum)),
+        checksum=checksum,
+        loaded_at=time.time(),
+        by_name=MappingProxyType(by_name),
+        class_names=np.array(class_names, dtype=object),
+        has_sponsor=has_sponsor,
+        category=category,
+        sponsor=sponsor,
+        multiplier=multiplier
+    )
+
+class SponsorMapping:
+    """The active SponsorTable, recompiled and swapped when the file changes"""
+
+    def __init__(self, class_names: List[str], path: str = SPONSOR_MAPPING_PATH,
+                 poll_seconds: float = SPONSOR_MAPPING_POLL_SECONDS):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._class_names = list(class_names)
+        self._watch_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._mtime = None
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._table = self._load()
+        if self._table is None:
+            # Detection keeps working without sponsors until a valid file appears
+            self._table = compile_sponsor_table(b'{"version": "empty", "objects": {}}', self._class_names)
+
+    def table(self) -> SponsorTable:
+        """Current table; callers should fetch it once and use that reference for the whole call"""
+        if self._watcher is None and self.poll_seconds > 0:
+            self._start_watching()
+        return self._table
+
+    def reload(self) -> bool:
+        """Recompile the file now; returns whether a new table was swapped in"""
+        table = self._load()
+        if table is None:
+            return False
+        self._table = table
+        return True
+
+    def _load(self) -> Optional[SponsorTable]:
+        try:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, "rb") as f:
+                table = compile_sponsor_table(f.read(), self._class_names)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            SPONSOR_MAPPING_RELOADS.inc(result="error")
+            print(f"❌ Could not load sponsor mapping from {self.path}: {e}")
+            return None
+        self.reloads += 1
+        self.last_error = None
+        SPONSOR_MAPPING_RELOADS.inc(result="ok")
+        print(f"✅ Sponsor mapping version {table.version} loaded ({len(table.by_name)} objects)")
+        return table
+
+    def _start_watching(self):
+        with self._watch_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="sponsor-mapping-watch", daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                continue
+            if mtime != self._mtime:
+                self.reload()
+
+    def stats(self) -> Dict:
+        table = self._table
+        return {
+            "version": table.version,
+            "checksum": table.checksum,
+            "loaded_at": table.loaded_at,
+            "path": self.path,
+            "objects": len(table.by_name),
+            "sponsored_classes": int(table.has_sponsor.sum()),
+            "reloads": self.reloads,
+            "last_error": self.last_error
+        }
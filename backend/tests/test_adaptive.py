@@ -0,0 +1,39 @@
+from adaptive import AdaptiveController, Tier
+
+TIERS = [Tier("yolov8n@640", "yolov8n.pt", 640), Tier("yolov8n@320", "yolov8n.pt", 320)]
+
+
+def controller(**kwargs):
+    options = dict(tiers=TIERS, enabled=True, latency_slo_ms=250, max_queue=4, min_samples=1, cooldown_seconds=0)
+    options.update(kwargs)
+    return AdaptiveController(**options)
+
+
+def test_steps_down_when_latency_breaks_the_slo():
+    adaptive = controller()
+    adaptive.observe(1.0)
+    assert adaptive.current_tier() == TIERS[1]
+
+
+def test_calls_queued_upstream_count_towards_queue_depth():
+    queued = 0
+    adaptive = controller(queued=lambda: queued)
+    adaptive.observe(0.01)
+    assert adaptive.current_tier() == TIERS[0]
+
+    # Fast calls, but more waiting for a slot than max_queue
+    queued = 5
+    with adaptive.track():
+        pass
+    assert adaptive.queue_depth() == 5
+    assert adaptive.current_tier() == TIERS[1]
+
+
+def test_steps_back_up_once_the_queue_drains():
+    queued = 10
+    adaptive = controller(queued=lambda: queued)
+    adaptive.observe(0.01)
+    assert adaptive.current_tier() == TIERS[1]
+    queued = 0
+    adaptive.observe(0.01)
+    assert adaptive.current_tier() == TIERS[0]
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, UploadTooLarge
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class StreamingRequest:
+    """Just enough of a Starlette request to stream a body without a Content-Length"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def controller(**kwargs):
+    options = dict(max_in_flight=1, max_queue=2, max_wait_seconds=1, max_bytes=100, max_request_bytes=60, enabled=True)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_waiters_are_served_fifo():
+    async def scenario():
+        admission = controller(max_queue=5)
+        await admission.acquire(0)
+        order = []
+
+        async def call(name):
+            await admission.acquire(0)
+            order.append(name)
+            admission.release(0, time.perf_counter())
+
+        tasks = [asyncio.ensure_future(call(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        admission.release(0, time.perf_counter())
+        await asyncio.gather(*tasks)
+        return order, admission.in_flight
+
+    assert run(scenario()) == (["a", "b", "c"], 0)
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        admission = controller(max_queue=1)
+        await admission.acquire(0)
+        waiting = asyncio.ensure_future(admission.acquire(0))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return rejected.value.reason, admission.stats()
+
+    reason, stats = run(scenario())
+    assert reason == "queue_full"
+    assert stats["queued"] == 0 and stats["rejected"] == {"queue_full": 1}
+
+
+def test_declared_size_over_request_cap_is_too_large():
+    async def scenario():
+        admission = controller()
+        with pytest.raises(UploadTooLarge):
+            await admission.acquire(61)
+        return admission.in_flight, admission.bytes
+
+    assert run(scenario()) == (0, 0)
+
+
+def test_chunked_body_is_counted_while_streaming():
+    async def scenario():
+        admission = controller()
+        await admission.acquire(0)
+        body, held = await admission.read_body(StreamingRequest([b"x" * 20, b"y" * 20]), 0)
+        counted = admission.bytes
+        admission.release(held, time.perf_counter())
+        return body, held, counted, admission.bytes
+
+    assert run(scenario()) == (b"x" * 20 + b"y" * 20, 40, 40, 0)
+
+
+def test_chunked_body_past_request_cap_is_rejected_and_uncounted():
+    async def scenario():
+        admission = controller()
+        await admission.acquire(0)
+        with pytest.raises(UploadTooLarge):
+            await admission.read_body(StreamingRequest([b"x" * 40, b"y" * 40]), 0)
+        held_after = admission.bytes
+        admission.release(0, time.perf_counter())
+        return held_after, admission.rejected
+
+    assert run(scenario()) == (0, {"too_large": 1})
+
+
+def test_chunked_body_past_shared_byte_cap_is_rejected():
+    async def scenario():
+        admission = controller(max_in_flight=2)
+        await admission.acquire(50)
+        await admission.acquire(0)
+        with pytest.raises(UploadTooLarge):
+            await admission.read_body(StreamingRequest([b"x" * 30, b"y" * 30]), 0)
+        return admission.bytes
+
+    assert run(scenario()) == 50
+
+
+def test_body_longer_than_declared_grows_the_reservation():
+    async def scenario():
+        admission = controller()
+        await admission.acquire(10)
+        _, held = await admission.read_body(StreamingRequest([b"x" * 25]), 10)
+        return held, admission.bytes
+
+    assert run(scenario()) == (25, 25)
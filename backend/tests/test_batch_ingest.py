@@ -0,0 +1,115 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import cv2
+import numpy as np
+
+import batch_ingest
+from batch_ingest import is_zip, iter_zip_frames, stream_batch_results
+from detect import DecodedFrame
+
+
+def collect(stream):
+    async def read():
+        return [json.loads(line) async for line in stream]
+    return asyncio.run(read())
+
+
+def frames(count):
+    for index in range(count):
+        yield index, f"{index}.jpg", None, DecodedFrame(np.full((8, 8, 3), index, dtype=np.uint8), "bgr", 8, 8)
+
+
+def test_every_frame_gets_a_line_then_a_summary():
+    async def detect(frame):
+        if frame.image[0, 0, 0] % 2:
+            return {"total_objects": 1, "objects": ["laptop"], "sponsor_categories": ["tech_giants"]}
+        return {"total_objects": 0, "objects": [], "sponsor_categories": []}
+
+    lines = collect(stream_batch_results(frames(5), detect, "zip", batch_size=2))
+    records, summary = lines[:-1], lines[-1]
+    assert sorted(record["index"] for record in records) == [0, 1, 2, 3, 4]
+    assert all(record["objects"] == (["laptop"] if record["index"] % 2 else []) for record in records)
+    assert summary["done"] and summary["frames"] == 5 and summary["failed"] == 0
+    assert summary["sponsor_categories"] == {"tech_giants": 2}
+
+
+def test_unreadable_and_failed_frames_are_reported_per_line():
+    items = [(0, "bad.jpg", None, "could not read image: truncated")] + list(frames(2))[1:]
+    items.append((2, "clip.mp4", 1.5, DecodedFrame(np.zeros((8, 8, 3), dtype=np.uint8), "bgr", 8, 8)))
+
+    async def detect(frame):
+        if frame.image.any():
+            return {"total_objects": 0}
+        raise RuntimeError("object detector is not available")
+
+    lines = collect(stream_batch_results(iter(items), detect, "video", batch_size=8))
+    by_index = {record["index"]: record for record in lines[:-1]}
+    assert by_index[0]["error"] == "could not read image: truncated"
+    assert by_index[2]["error"] == "detection failed: object detector is not available"
+    assert by_index[2]["timestamp"] == 1.5
+    assert by_index[1]["total_objects"] == 0 and "error" not in by_index[1]
+    assert (lines[-1]["frames"], lines[-1]["failed"]) == (1, 2)
+
+
+def test_batches_are_detected_concurrently_and_streamed_in_completion_order():
+    in_flight = peak = 0
+
+    async def detect(frame):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Later frames of a batch finish first
+        await asyncio.sleep(0.01 * (4 - int(frame.image[0, 0, 0]) % 4))
+        in_flight -= 1
+        return {"total_objects": 0}
+
+    lines = collect(stream_batch_results(frames(8), detect, "zip", batch_size=4))
+    assert peak == 4
+    assert [record["index"] for record in lines[:-1]] == [3, 2, 1, 0, 7, 6, 5, 4]
+
+
+def test_source_is_closed_when_the_client_stops_reading():
+    closed = []
+
+    def items():
+        try:
+            yield from frames(100)
+        finally:
+            closed.append(True)
+
+    async def detect(frame):
+        return {"total_objects": 0}
+
+    async def read_one():
+        stream = stream_batch_results(items(), detect, "zip", batch_size=4)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert json.loads(asyncio.run(read_one()))["source"].endswith(".jpg")
+    assert closed == [True]
+
+
+def test_zip_members_are_decoded_and_oversized_ones_skipped(monkeypatch):
+    monkeypatch.setattr(batch_ingest, "BATCH_MAX_IMAGE_BYTES", 50000)
+    small = cv2.imencode(".jpg", np.full((120, 160, 3), 90, dtype=np.uint8))[1].tobytes()
+    large = cv2.imencode(".png", np.random.default_rng(0).integers(0, 255, (200, 200, 3), dtype=np.uint8))[1].tobytes()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("a.jpg", small)
+        archive.writestr("notes.txt", b"not an image")
+        archive.writestr("__MACOSX/._a.jpg", b"resource fork")
+        archive.writestr("b.png", large)
+        archive.writestr("c.jpg", b"not a jpeg")
+    buffer.seek(0)
+    assert is_zip(buffer, "upload.bin") and buffer.tell() == 0
+
+    items = list(iter_zip_frames(buffer, decode_size=80))
+    assert [(index, name) for index, name, _, _ in items] == [(0, "a.jpg"), (1, "b.png"), (2, "c.jpg")]
+    frame = items[0][3]
+    assert frame.image.shape[:2] == (60, 80) and (frame.original_width, frame.original_height) == (160, 120)
+    assert items[1][3].startswith("image is larger than")
+    assert items[2][3].startswith("could not read image")
@@ -0,0 +1,71 @@
+import numpy as np
+
+import face_index
+from face_index import FaceIndex
+
+
+def faces(count, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def test_known_face_gets_its_id_back():
+    index = FaceIndex(dim=16, threshold=0.9)
+    vectors = faces(3)
+    first = index.match_or_add(vectors)
+    # A slightly noisy, rescaled view of the same faces still matches
+    again = index.match_or_add(vectors * 2 + 0.01)
+    assert [known for _, known in first] == [False, False, False]
+    assert again == [(face_id, True) for face_id, _ in first]
+    assert len(index) == 3 and index.hits == 3 and index.misses == 3
+
+
+def test_search_ignores_matches_below_threshold():
+    index = FaceIndex(dim=16, threshold=0.9)
+    vectors = faces(2)
+    index.add(vectors[:1])
+    results = index.search(vectors)
+    assert results[0][0] == 0 and results[0][1] > 0.99
+    assert results[1] is None
+
+
+def test_quests_are_cached_per_face_and_dropped_on_eviction():
+    index = FaceIndex(dim=16, max_size=2, threshold=0.9)
+    vectors = faces(3)
+    (first, _), = index.match_or_add(vectors[:1])
+    index.set_quest(first, "Ask about their badge")
+    assert index.quest(first) == "Ask about their badge"
+    index.add(vectors[1:3])
+    # The oldest face made room; a quest written for it afterwards is ignored
+    index.set_quest(first, "too late")
+    assert len(index) == 2 and index.quest(first) is None
+    assert index.search(vectors[:1]) == [None]
+
+
+def test_expired_faces_are_forgotten(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(face_index.time, "monotonic", lambda: clock[0])
+    index = FaceIndex(dim=16, ttl=60, threshold=0.9)
+    vectors = faces(1)
+    index.add(vectors)
+    clock[0] += 61
+    assert index.search(vectors) == [None]
+    assert len(index) == 0
+
+
+def test_freed_rows_are_reused_and_storage_grows():
+    index = FaceIndex(dim=8, max_size=3000, threshold=0.99)
+    vectors = faces(1500, dim=8)
+    ids = index.add(vectors)
+    assert len(index) == 1500 and len(set(ids)) == 1500
+    assert [match[0] for match in index.search(vectors[[0, 1499]])] == [ids[0], ids[1499]]
+
+
+def test_ann_layer_finds_the_same_faces_as_exact_search():
+    vectors = faces(400, dim=16, seed=1)
+    exact = FaceIndex(dim=16, threshold=0.9, ann_min_size=10 ** 6)
+    ann = FaceIndex(dim=16, threshold=0.9, ann_min_size=200, ann_probes=4)
+    exact.add(vectors)
+    ann.add(vectors)
+    assert ann.stats()["ann"] and not exact.stats()["ann"]
+    queries = vectors[::7] + 0.01
+    assert [m[0] for m in ann.search(queries)] == [m[0] for m in exact.search(queries)]
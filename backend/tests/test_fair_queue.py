@@ -0,0 +1,125 @@
+import asyncio
+
+from fair_queue import FairQueue, parse_weights
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_parse_weights():
+    assert parse_weights("serious=2, fun=1,batch=0.25") == {"serious": 2.0, "fun": 1.0, "batch": 0.25}
+    assert parse_weights("") == {}
+
+
+def test_slot_limits_concurrency():
+    async def scenario():
+        queue = FairQueue(concurrency=2, weights={})
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with queue.slot("u", "fun"):
+                peak = max(peak, queue.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak, queue.in_flight
+
+    assert run(scenario()) == (2, 0)
+
+
+def test_round_robin_between_tenants():
+    async def scenario():
+        queue = FairQueue(concurrency=1, weights={})
+        await queue.acquire("holder", "fun")
+        order = []
+
+        async def call(tenant):
+            await queue.acquire(tenant, "fun")
+            order.append(tenant)
+            queue.release()
+
+        # The heavy tenant queues four calls before the light one arrives
+        tasks = [asyncio.ensure_future(call("heavy")) for _ in range(4)]
+        tasks.append(asyncio.ensure_future(call("light")))
+        await asyncio.sleep(0)
+        queue.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    order = run(scenario())
+    assert order.index("light") <= 1
+
+
+def test_weights_shift_the_share():
+    async def scenario():
+        queue = FairQueue(concurrency=1, weights={"serious": 3.0, "fun": 1.0})
+        await queue.acquire("holder", "fun")
+        order = []
+
+        async def call(mode):
+            await queue.acquire("u", mode)
+            order.append(mode)
+            queue.release()
+
+        tasks = [asyncio.ensure_future(call(mode)) for mode in ["fun"] * 4 + ["serious"] * 4]
+        await asyncio.sleep(0)
+        queue.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    order = run(scenario())
+    # Three serious calls per fun call while both flows are backlogged
+    assert order[:4].count("serious") == 3
+
+
+def test_cancel_then_release_in_same_turn_keeps_the_slot():
+    async def scenario():
+        queue = FairQueue(concurrency=1, weights={})
+        await queue.acquire("holder", "fun")
+        gone = asyncio.ensure_future(queue.acquire("gone", "fun"))
+        await asyncio.sleep(0)
+        # The client disconnects and the holder finishes before the cancelled acquire() unwinds
+        gone.cancel()
+        queue.release()
+        assert queue.in_flight == 0
+        await asyncio.gather(gone, return_exceptions=True)
+
+        await asyncio.wait_for(queue.acquire("next", "fun"), 1)
+        queue.release()
+        return queue.stats()
+
+    stats = run(scenario())
+    assert stats["in_flight"] == 0
+    assert stats["waiting"] == 0
+    assert stats["active_flows"] == 0
+
+
+def test_cancel_with_other_waiters_hands_slot_to_them():
+    async def scenario():
+        queue = FairQueue(concurrency=1, weights={})
+        await queue.acquire("holder", "fun")
+        gone = asyncio.ensure_future(queue.acquire("a", "fun"))
+        waiting = asyncio.ensure_future(queue.acquire("b", "fun"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        queue.release()
+        await asyncio.wait_for(waiting, 1)
+        await asyncio.gather(gone, return_exceptions=True)
+        assert queue.in_flight == 1
+        queue.release()
+        return queue.stats()
+
+    stats = run(scenario())
+    assert (stats["in_flight"], stats["waiting"], stats["active_flows"]) == (0, 0, 0)
+
+
+def test_disabled_queue_does_not_wait():
+    async def scenario():
+        queue = FairQueue(concurrency=1, enabled=False)
+        async with queue.slot("a", "fun"):
+            async with queue.slot("b", "fun"):
+                return queue.in_flight
+
+    assert run(scenario()) == 0
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+
+import frame_cache
+from detect import decode_reduced_grey
+from frame_cache import DetectionCache, frame_dhash, hamming_distance
+from motion import MotionGate
+
+
+def jpeg(image):
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+def test_similar_frames_hash_close_and_different_frames_far():
+    base = np.tile(np.linspace(0, 255, 320, dtype=np.uint8), (240, 1))
+    scene = cv2.merge([base, base, base])
+    noisy = np.clip(scene.astype(np.int16) + np.random.default_rng(0).integers(-3, 4, scene.shape), 0, 255).astype(np.uint8)
+    other = scene[:, ::-1].copy()
+    assert hamming_distance(frame_dhash(jpeg(scene)), frame_dhash(jpeg(noisy))) <= 4
+    assert hamming_distance(frame_dhash(jpeg(scene)), frame_dhash(jpeg(other))) > 16
+
+
+def test_nearest_entry_within_distance_is_returned():
+    cache = DetectionCache(max_distance=2, enabled=True)
+    cache.put("u", "objects", 0b0000, {"frame": "a"})
+    cache.put("u", "objects", 0b1111, {"frame": "b"})
+    assert cache.get("u", "objects", 0b0001) == {"frame": "a"}
+    assert cache.get("u", "objects", 0b0111) == {"frame": "b"}
+    assert cache.get("u", "objects", 0b11110000) is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_entries_are_scoped_by_user_and_task():
+    cache = DetectionCache(enabled=True)
+    cache.put("u", "objects", 42, {"frame": "a"})
+    assert cache.get("v", "objects", 42) is None
+    assert cache.get("u", "faces", 42) is None
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(frame_cache.time, "monotonic", lambda: clock[0])
+    cache = DetectionCache(ttl_seconds=5, enabled=True)
+    cache.put("u", "objects", 42, {"frame": "a"})
+    clock[0] += 6
+    assert cache.get("u", "objects", 42) is None
+    assert cache.stats()["entries"] == 0 and cache.expirations == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = DetectionCache(max_entries=2, max_distance=0, enabled=True)
+    cache.put("u", "objects", 1, {"frame": 1})
+    cache.put("v", "objects", 2, {"frame": 2})
+    cache.get("u", "objects", 1)
+    cache.put("w", "objects", 3, {"frame": 3})
+    assert cache.get("v", "objects", 2) is None
+    assert cache.get("u", "objects", 1) == {"frame": 1}
+
+
+def test_each_scope_keeps_only_its_newest_frames():
+    cache = DetectionCache(max_per_scope=2, max_distance=0, enabled=True)
+    for frame_hash in (1, 2, 3):
+        cache.put("u", "objects", frame_hash, {"frame": frame_hash})
+    assert cache.get("u", "objects", 1) is None
+    assert cache.get("u", "objects", 3) == {"frame": 3}
+    assert cache.stats()["entries"] == 2
+
+
+def test_hash_of_a_shared_grey_decode_matches_the_bytes():
+    image = jpeg(np.random.default_rng(1).integers(0, 255, (240, 320, 3), dtype=np.uint8))
+    grey = decode_reduced_grey(image)
+    assert grey.shape == (30, 40)
+    assert frame_dhash(grey) == frame_dhash(image)
+    gate = MotionGate()
+    assert np.array_equal(gate.thumbnail(grey), gate.thumbnail(image))
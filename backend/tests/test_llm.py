@@ -0,0 +1,116 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+import llm
+
+
+class ScriptedProvider(llm.AsyncProvider):
+    """Answers batched quest prompts with the given quests, single ones with a fixed quest"""
+
+    def __init__(self, answer=None, delay=0.0):
+        super().__init__("cohere", 4)
+        self.answer = answer
+        self.delay = delay
+        self.prompts = []
+
+    def available(self) -> bool:
+        return True
+
+    async def _complete(self, prompt: str, **options) -> str:
+        self.prompts.append(prompt)
+        call = len(self.prompts)
+        await asyncio.sleep(self.delay)
+        count = re.match(r"Create (\d+) different", prompt)
+        if count is None:
+            return f"single quest {call}"
+        quests = self.answer(int(count.group(1))) if self.answer else [f"quest {call}.{i}" for i in range(int(count.group(1)))]
+        return quests if isinstance(quests, str) else json.dumps(quests)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    def install(**kwargs):
+        scripted = ScriptedProvider(**kwargs)
+        monkeypatch.setattr(llm, "cohere_provider", scripted)
+        return scripted
+    return install
+
+
+def faces(count):
+    return [{"confidence": 0.6} for _ in range(count)]
+
+
+def test_one_call_per_frame_up_to_the_batch_size(provider, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_PROMPT_BATCH_SIZE", 8)
+    scripted = provider()
+    prompts = asyncio.run(llm.create_networking_prompts_async(faces(4)))
+    assert prompts == ["quest 1.0", "quest 1.1", "quest 1.2", "quest 1.3"]
+    assert len(scripted.prompts) == 1
+
+
+def test_bigger_groups_are_split_into_even_chunks(provider, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_PROMPT_BATCH_SIZE", 8)
+    scripted = provider()
+    prompts = asyncio.run(llm.create_networking_prompts_async(faces(9)))
+    assert len(prompts) == 9
+    assert sorted(int(re.match(r"Create (\d+)", prompt).group(1)) for prompt in scripted.prompts) == [4, 5]
+
+
+def test_missing_and_repeated_quests_fall_back_to_single_calls(provider):
+    scripted = provider(answer=lambda count: ["Say hi", "say hi "])
+    prompts = asyncio.run(llm.create_networking_prompts_async(faces(3)))
+    assert prompts[0] == "Say hi"
+    assert prompts[1].startswith("single quest") and prompts[2].startswith("single quest")
+    assert len(set(prompts)) == 3
+    assert len(scripted.prompts) == 3
+
+
+def test_unparseable_answer_falls_back_to_single_calls(provider):
+    provider(answer=lambda count: "Sure! Here are some quests")
+    prompts = asyncio.run(llm.create_networking_prompts_async(faces(2)))
+    assert all(prompt.startswith("single quest") for prompt in prompts)
+
+
+def test_fenced_json_is_accepted():
+    assert llm.parse_prompt_list('```json\n["a", " b ", 3, ""]\n```') == ["a", "b"]
+
+
+def test_deadline_serves_mock_prompts(provider):
+    provider(delay=1.0)
+    prompts = asyncio.run(llm.create_networking_prompts_async(faces(3), timeout=0.05))
+    assert all(prompt in llm.MOCK_NETWORKING_PROMPTS for prompt in prompts)
+    assert len(set(prompts)) == 3
+
+
+def test_provider_concurrency_is_capped():
+    class Slow(ScriptedProvider):
+        active = peak = 0
+
+        async def _complete(self, prompt: str, **options) -> str:
+            Slow.active += 1
+            Slow.peak = max(Slow.peak, Slow.active)
+            await asyncio.sleep(0.01)
+            Slow.active -= 1
+            return "quest"
+
+    slow = Slow()
+    slow.max_concurrency = 2
+    slow._semaphore = asyncio.Semaphore(2)
+
+    async def scenario():
+        return await asyncio.gather(*(slow.generate("p") for _ in range(6)))
+
+    assert asyncio.run(scenario()) == ["quest"] * 6
+    assert Slow.peak == 2
+
+
+def test_provider_missing_a_method_fails_when_created():
+    class Incomplete(llm.AsyncProvider):
+        def available(self) -> bool:
+            return True
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", 1)
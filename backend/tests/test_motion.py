@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+import pytest
+
+import motion
+from motion import MotionGate
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(motion.time, "monotonic", lambda: now[0])
+    return now
+
+
+def scene(level):
+    return np.full((24, 32), level, dtype=np.int16)
+
+
+def test_thumbnail_of_an_upload():
+    gate = MotionGate(size=(32, 24))
+    image = cv2.imencode(".jpg", np.full((480, 640, 3), 120, dtype=np.uint8))[1].tobytes()
+    thumbnail = gate.thumbnail(image)
+    assert thumbnail.shape == (24, 32) and thumbnail.dtype == np.int16
+    assert abs(int(thumbnail.mean()) - 120) <= 2
+
+
+def test_still_scene_reuses_the_last_result(clock):
+    gate = MotionGate(enabled=True, threshold=3, max_staleness=3)
+    assert gate.check("s", scene(100)) is None
+    gate.update("s", scene(100), {"objects": ["laptop"]})
+    clock[0] += 1
+    assert gate.check("s", scene(101)) == {"objects": ["laptop"]}
+    assert gate.decisions == {"skip": 1, "motion": 0, "stale": 0, "first": 1}
+
+
+def test_motion_and_staleness_force_inference(clock):
+    gate = MotionGate(enabled=True, threshold=3, max_staleness=3)
+    gate.update("s", scene(100), {"objects": []})
+    assert gate.check("s", scene(110)) is None
+    clock[0] += 4
+    assert gate.check("s", scene(100)) is None
+    assert gate.decisions["motion"] == 1 and gate.decisions["stale"] == 1
+
+
+def test_slow_drift_is_measured_against_the_inferred_frame(clock):
+    gate = MotionGate(enabled=True, threshold=3, max_staleness=60)
+    gate.update("s", scene(100), {"objects": []})
+    # Each step is below the threshold, but the total drift is not
+    assert gate.check("s", scene(102)) is not None
+    assert gate.check("s", scene(104)) is None
+
+
+def test_sessions_are_independent_and_idle_ones_expire(clock):
+    gate = MotionGate(enabled=True, idle_ttl=60, max_sessions=2)
+    gate.update("a", scene(100), {"session": "a"})
+    assert gate.check("b", scene(100)) is None
+    clock[0] += 61
+    assert gate.check("a", scene(100)) is None
+    assert gate.decisions["first"] == 2
+
+
+def test_oldest_session_makes_room(clock):
+    gate = MotionGate(enabled=True, max_sessions=2)
+    for key in "abc":
+        gate.update(key, scene(100), {"session": key})
+        clock[0] += 0.1
+    assert gate.stats()["sessions"] == 2
+    assert gate.check("a", scene(100)) is None
+    assert gate.check("c", scene(100)) == {"session": "c"}
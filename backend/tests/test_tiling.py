@@ -0,0 +1,58 @@
+import numpy as np
+
+import detect
+from detect import DecodedFrame, class_aware_nms, tile_grid
+
+
+def test_small_frame_is_one_tile():
+    assert tile_grid(640, 480, tile_size=640, overlap=0.2) == [(0, 0, 640, 480)]
+
+
+def test_tiles_cover_the_frame_with_overlap():
+    tiles = tile_grid(3840, 2160, tile_size=1280, overlap=0.2)
+    xs = sorted({x1 for x1, _, _, _ in tiles})
+    ys = sorted({y1 for _, y1, _, _ in tiles})
+    assert xs[0] == 0 and ys[0] == 0
+    assert max(x2 for _, _, x2, _ in tiles) == 3840 and max(y2 for _, _, _, y2 in tiles) == 2160
+    assert all(next_x - x <= 1280 * 0.8 for x, next_x in zip(xs, xs[1:]))
+    assert all(next_y - y <= 1280 * 0.8 for y, next_y in zip(ys, ys[1:]))
+    assert len(tiles) == len(xs) * len(ys)
+
+
+def test_nms_keeps_the_best_of_overlapping_boxes():
+    xyxy = np.array([[0, 0, 100, 100], [5, 5, 105, 105], [300, 300, 400, 400]], dtype=np.float32)
+    confidences = np.array([0.6, 0.9, 0.5], dtype=np.float32)
+    class_ids = np.array([0, 0, 0])
+    assert class_aware_nms(xyxy, confidences, class_ids, iou_threshold=0.5).tolist() == [1, 2]
+
+
+def test_nms_never_suppresses_across_classes():
+    xyxy = np.array([[0, 0, 100, 100], [0, 0, 100, 100]], dtype=np.float32)
+    confidences = np.array([0.9, 0.8], dtype=np.float32)
+    assert class_aware_nms(xyxy, confidences, np.array([0, 63]), iou_threshold=0.5).tolist() == [0, 1]
+    assert class_aware_nms(xyxy, confidences, np.array([5, 5]), iou_threshold=0.5).tolist() == [0]
+
+
+def test_nms_of_nothing():
+    empty = np.zeros((0, 4), dtype=np.float32)
+    assert class_aware_nms(empty, np.zeros(0), np.zeros(0, dtype=int)).tolist() == []
+
+
+def test_tiled_detections_are_shifted_merged_and_scaled(monkeypatch):
+    monkeypatch.setattr(detect, "YOLO_TILE_FULL_FRAME", True)
+    monkeypatch.setattr(detect, "tile_grid", lambda width, height: [(0, 0, 100, 100), (80, 0, 180, 100)])
+    box = np.array([[85, 10, 95, 20]], dtype=np.float32)
+
+    def fake_results(crops, *args):
+        assert [crop.shape[:2] for crop in crops] == [(100, 100), (100, 100), (100, 180)]
+        # The same object seen by both tiles (in tile coordinates) and by the full frame
+        return [(box, np.array([0.7]), np.array([2])),
+                (box - np.array([80, 0, 80, 0]), np.array([0.8]), np.array([2])),
+                (box, np.array([0.6]), np.array([2]))]
+
+    monkeypatch.setattr(detect, "_yolo_results", fake_results)
+    monkeypatch.setattr(detect, "_result_arrays", lambda raws: raws[0])
+    frame = DecodedFrame(np.zeros((100, 180, 3), dtype=np.uint8), "bgr", 360, 200)
+    xyxy, confidences, class_ids = detect._tiled_yolo_arrays(frame, 0.5, object(), None, 640)
+    assert xyxy.tolist() == [[170, 20, 190, 40]]
+    assert confidences.tolist() == [0.8] and class_ids.tolist() == [2]
@@ -0,0 +1,114 @@
+import asyncio
+
+import numpy as np
+
+import tracking
+from tracking import ObjectTracker, TrackerRegistry, iou_matrix
+
+LAPTOP = 63
+CUP = 41
+
+
+def boxes(*rows):
+    return np.array(rows, dtype=np.float32)
+
+
+def test_iou_matrix():
+    iou = iou_matrix(boxes([0, 0, 10, 10], [20, 20, 30, 30]), boxes([0, 0, 10, 10], [5, 0, 15, 10]))
+    assert np.allclose(iou, [[1.0, 1 / 3], [0.0, 0.0]])
+
+
+def test_moving_object_keeps_its_track_id():
+    tracker = ObjectTracker(keyframe_interval=1)
+    tracker.update(boxes([100, 100, 200, 200]), np.array([0.9]), np.array([LAPTOP]))
+    first = tracker.result()["detections"][0]["track_id"]
+    for shift in range(10, 60, 10):
+        tracker.update(boxes([100 + shift, 100, 200 + shift, 200]), np.array([0.9]), np.array([LAPTOP]))
+    detections = tracker.result()["detections"]
+    assert [d["track_id"] for d in detections] == [first]
+
+
+def test_tracks_are_propagated_between_keyframes():
+    tracker = ObjectTracker(keyframe_interval=10)
+    for shift in (0, 10, 20):
+        tracker.update(boxes([100 + shift, 100, 200 + shift, 200]), np.array([0.9]), np.array([LAPTOP]))
+    x_before = tracker.result()["detections"][0]["x"]
+    tracker.step()
+    detection = tracker.result()["detections"][0]
+    # The filter has learnt the box moves right and keeps moving it without a detection
+    assert detection["x"] > x_before
+    assert detection["confidence"] < 0.9
+
+
+def test_other_class_starts_a_new_track():
+    tracker = ObjectTracker(keyframe_interval=1)
+    tracker.update(boxes([0, 0, 100, 100]), np.array([0.9]), np.array([LAPTOP]))
+    tracker.update(boxes([0, 0, 100, 100]), np.array([0.9]), np.array([CUP]))
+    visible = tracker.result()["detections"]
+    assert [d["class_id"] for d in visible] == [CUP] and visible[0]["track_id"] == 2
+
+
+def test_unmatched_track_is_dropped_after_max_misses():
+    tracker = ObjectTracker(keyframe_interval=1, max_misses=2)
+    tracker.update(boxes([0, 0, 100, 100]), np.array([0.9]), np.array([LAPTOP]))
+    for _ in range(2):
+        tracker.update(boxes(), np.array([]), np.array([]))
+        assert tracker.result()["total_objects"] == 0 and len(tracker._track_ids) == 1
+    tracker.update(boxes(), np.array([]), np.array([]))
+    assert len(tracker._track_ids) == 0
+
+
+def test_keyframe_schedule():
+    tracker = ObjectTracker(keyframe_interval=3, min_confidence=0.3, confidence_decay=0.9)
+    assert tracker.needs_keyframe()
+    tracker.update(boxes([0, 0, 100, 100]), np.array([0.9]), np.array([LAPTOP]))
+    decisions = []
+    for _ in range(3):
+        decisions.append(tracker.needs_keyframe())
+        tracker.step()
+    assert decisions == [False, False, True]
+
+
+def test_decayed_confidence_forces_an_early_keyframe():
+    tracker = ObjectTracker(keyframe_interval=100, min_confidence=0.5, confidence_decay=0.5)
+    tracker.update(boxes([0, 0, 100, 100]), np.array([0.9]), np.array([LAPTOP]))
+    assert not tracker.needs_keyframe()
+    tracker.step()
+    assert tracker.needs_keyframe()
+
+
+def test_registry_keeps_one_tracker_per_session(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(tracking.time, "monotonic", lambda: clock[0])
+    registry = TrackerRegistry(max_sessions=2, idle_ttl=60)
+    a = registry.get("a")
+    assert registry.get("a") is a and registry.get("b") is not a
+    clock[0] += 61
+    assert registry.get("a") is not a
+
+
+def test_overlapping_frames_of_a_session_run_one_keyframe_in_order():
+    registry = TrackerRegistry()
+    yolo_calls = []
+    applied = []
+
+    async def frame(name, x, detect_seconds):
+        async with registry.session("s") as tracker:
+            if tracker.needs_keyframe():
+                yolo_calls.append(name)
+                await asyncio.sleep(detect_seconds)
+                tracker.update(boxes([x, 0, x + 100, 100]), np.array([0.9]), np.array([LAPTOP]))
+            else:
+                tracker.step()
+            applied.append(name)
+
+    async def scenario():
+        # The second frame arrives while the first one's slow YOLO call is still running
+        first = asyncio.ensure_future(frame("first", 0, 0.05))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(first, frame("second", 10, 0.0))
+
+    asyncio.run(scenario())
+    assert yolo_calls == ["first"]
+    assert applied == ["first", "second"]
+    assert registry.get("s").keyframes == 1 and registry.get("s").frames == 2
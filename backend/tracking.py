@@ -0,0 +1,251 @@
+"""
+Multi-frame object tracking for live camera sessions.
+
+YOLO runs only on keyframes; in between, boxes are propagated by a constant-velocity
+Kalman filter (SORT-style) and keep stable track ids, so the frontend boxes stop
+flickering and most frames cost a few matrix operations instead of a forward pass.
+A keyframe is forced every TRACKER_KEYFRAME_INTERVAL frames, or earlier once a
+propagated track's confidence has decayed below TRACKER_MIN_CONFIDENCE.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Tuple
+
+import numpy as np
+
+from detect import detection_result_from_arrays
+
+TRACKER_KEYFRAME_INTERVAL = int(os.getenv("TRACKER_KEYFRAME_INTERVAL", "5"))
+TRACKER_MIN_CONFIDENCE = float(os.getenv("TRACKER_MIN_CONFIDENCE", "0.3"))
+# Confidence of a track is multiplied by this for every frame without a detection
+TRACKER_CONFIDENCE_DECAY = float(os.getenv("TRACKER_CONFIDENCE_DECAY", "0.9"))
+TRACKER_IOU_THRESHOLD = float(os.getenv("TRACKER_IOU_THRESHOLD", "0.3"))
+# Keyframes a track may go unmatched before it is dropped
+TRACKER_MAX_MISSES = int(os.getenv("TRACKER_MAX_MISSES", "2"))
+TRACKER_SESSION_TTL = float(os.getenv("TRACKER_SESSION_TTL", "60"))
+TRACKER_MAX_SESSIONS = int(os.getenv("TRACKER_MAX_SESSIONS", "1024"))
+
+# Constant-velocity model over [cx, cy, w, h, vcx, vcy, vw, vh], one frame per step
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8)
+# Noise standard deviations relative to box height, as in DeepSORT / ByteTrack
+_STD_POSITION = 1.0 / 20.0
+_STD_VELOCITY = 1.0 / 160.0
+
+def _xyxy_to_cxcywh(xyxy: np.ndarray) -> np.ndarray:
+    wh = xyxy[:, 2:4] - xyxy[:, 0:2]
+    return np.concatenate([xyxy[:, 0:2] + wh / 2.0, wh], axis=1)
+
+def _cxcywh_to_xyxy(boxes: np.ndarray) -> np.ndarray:
+    half = boxes[:, 2:4] / 2.0
+    return np.concatenate([boxes[:, 0:2] - half, boxes[:, 0:2] + half], axis=1)
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two sets of xyxy boxes"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+def _greedy_match(iou: np.ndarray, threshold: float):
+    """Greedy highest-IoU-first assignment; returns (track_indices, detection_indices)"""
+    iou = iou.copy()
+    tracks, detections = [], []
+    while iou.size:
+        t, d = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[t, d] < threshold:
+            break
+        tracks.append(t)
+        detections.append(d)
+        iou[t, :] = -1.0
+        iou[:, d] = -1.0
+    return np.array(tracks, dtype=np.int64), np.array(detections, dtype=np.int64)
+
+class ObjectTracker:
+    """Kalman/IoU tracker for one camera session; all tracks are filtered in one vectorized pass"""
+
+    def __init__(self, keyframe_interval: int = TRACKER_KEYFRAME_INTERVAL,
+                 min_confidence: float = TRACKER_MIN_CONFIDENCE,
+                 confidence_decay: float = TRACKER_CONFIDENCE_DECAY,
+                 iou_threshold: float = TRACKER_IOU_THRESHOLD,
+                 max_misses: int = TRACKER_MAX_MISSES):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.min_confidence = min_confidence
+        self.confidence_decay = confidence_decay
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.frames = 0
+        self.keyframes = 0
+        self._frames_since_keyframe = None
+        self._next_track_id = 1
+        self._mean = np.zeros((0, 8))
+        self._covariance = np.zeros((0, 8, 8))
+        self._class_ids = np.zeros(0, dtype=np.int64)
+        self._confidences = np.zeros(0)
+        self._track_ids = np.zeros(0, dtype=np.int64)
+        self._misses = np.zeros(0, dtype=np.int64)
+        self._since_update = np.zeros(0, dtype=np.int64)
+
+    def needs_keyframe(self) -> bool:
+        """Whether the next frame should go through the detector"""
+        if self._frames_since_keyframe is None or self._frames_since_keyframe + 1 >= self.keyframe_interval:
+            return True
+        confidences = self._output_confidences()
+        visible = self._misses == 0
+        return bool(visible.any() and confidences[visible].min() < self.min_confidence)
+
+    def update(self, xyxy: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray):
+        """Keyframe: predict, associate detections with tracks, correct matched tracks and start new ones"""
+        self._advance(keyframe=True)
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        confidences = np.asarray(confidences, dtype=np.float64)
+        class_ids = np.asarray(class_ids).astype(np.int64)
+
+        iou = iou_matrix(_cxcywh_to_xyxy(self._mean[:, :4]), xyxy)
+        # Only boxes of the same class may continue a track
+        iou[self._class_ids[:, None] != class_ids[None, :]] = 0.0
+        matched_tracks, matched_detections = _greedy_match(iou, self.iou_threshold)
+
+        if len(matched_tracks):
+            self._correct(matched_tracks, _xyxy_to_cxcywh(xyxy[matched_detections]))
+            self._confidences[matched_tracks] = confidences[matched_detections]
+            self._since_update[matched_tracks] = 0
+            self._misses[matched_tracks] = 0
+
+        unmatched_tracks = np.setdiff1d(np.arange(len(self._track_ids)), matched_tracks)
+        self._misses[unmatched_tracks] += 1
+        self._keep(self._misses <= self.max_misses)
+
+        new = np.setdiff1d(np.arange(len(xyxy)), matched_detections)
+        if len(new):
+            self._start(xyxy[new], confidences[new], class_ids[new])
+
+    def step(self):
+        """Non-keyframe: propagate every track one frame ahead"""
+        self._advance(keyframe=False)
+
+    def result(self) -> Dict:
+        """Detection dict for the current frame, with a track_id on each detection"""
+        visible = self._misses == 0
+        xyxy = _cxcywh_to_xyxy(self._mean[visible, :4]).astype(np.float32)
+        return detection_result_from_arrays(xyxy, self._output_confidences()[visible],
+                                            self._class_ids[visible], track_ids=self._track_ids[visible])
+
+    def stats(self) -> Dict:
+        return {
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "tracks": int((self._misses == 0).sum())
+        }
+
+    def _output_confidences(self) -> np.ndarray:
+        return self._confidences * self.confidence_decay ** self._since_update
+
+    def _advance(self, keyframe: bool):
+        self.frames += 1
+        if keyframe:
+            self.keyframes += 1
+            self._frames_since_keyframe = 0
+        else:
+            self._frames_since_keyframe = (self._frames_since_keyframe or 0) + 1
+        if not len(self._track_ids):
+            return
+
+        heights = np.maximum(self._mean[:, 3], 1.0)
+        std = np.concatenate([np.repeat((_STD_POSITION * heights)[:, None], 4, axis=1),
+                              np.repeat((_STD_VELOCITY * heights)[:, None], 4, axis=1)], axis=1)
+        process_noise = np.einsum("ni,ij->nij", std ** 2, np.eye(8))
+        self._mean = self._mean @ _F.T
+        self._covariance = _F @ self._covariance @ _F.T + process_noise
+        # Keep boxes from collapsing when a shrinking velocity overshoots
+        self._mean[:, 2:4] = np.maximum(self._mean[:, 2:4], 1.0)
+        self._since_update += 1
+
+    def _correct(self, indices: np.ndarray, measurements: np.ndarray):
+        mean = self._mean[indices]
+        covariance = self._covariance[indices]
+        heights = np.maximum(mean[:, 3], 1.0)
+        measurement_noise = np.einsum("ni,ij->nij", np.repeat(((_STD_POSITION * heights) ** 2)[:, None], 4, axis=1), np.eye(4))
+
+        innovation_covariance = _H @ covariance @ _H.T + measurement_noise
+        gain = covariance @ _H.T @ np.linalg.inv(innovation_covariance)
+        innovation = measurements - mean @ _H.T
+        self._mean[indices] = mean + np.einsum("nij,nj->ni", gain, innovation)
+        self._covariance[indices] = (np.eye(8) - gain @ _H) @ covariance
+
+    def _start(self, xyxy: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray):
+        count = len(xyxy)
+        mean = np.zeros((count, 8))
+        mean[:, :4] = _xyxy_to_cxcywh(xyxy)
+        heights = np.maximum(mean[:, 3], 1.0)
+        std = np.concatenate([np.repeat((2 * _STD_POSITION * heights)[:, None], 4, axis=1),
+                              np.repeat((10 * _STD_VELOCITY * heights)[:, None], 4, axis=1)], axis=1)
+
+        self._mean = np.concatenate([self._mean, mean])
+        self._covariance = np.concatenate([self._covariance, np.einsum("ni,ij->nij", std ** 2, np.eye(8))])
+        self._class_ids = np.concatenate([self._class_ids, class_ids])
+        self._confidences = np.concatenate([self._confidences, confidences])
+        self._track_ids = np.concatenate([self._track_ids, np.arange(self._next_track_id, self._next_track_id + count)])
+        self._misses = np.concatenate([self._misses, np.zeros(count, dtype=np.int64)])
+        self._since_update = np.concatenate([self._since_update, np.zeros(count, dtype=np.int64)])
+        self._next_track_id += count
+
+    def _keep(self, mask: np.ndarray):
+        self._mean = self._mean[mask]
+        self._covariance = self._covariance[mask]
+        self._class_ids = self._class_ids[mask]
+        self._confidences = self._confidences[mask]
+        self._track_ids = self._track_ids[mask]
+        self._misses = self._misses[mask]
+        self._since_update = self._since_update[mask]
+
+class TrackerRegistry:
+    """Per-session trackers, evicted after TRACKER_SESSION_TTL seconds without frames.
+
+    Each session's tracker comes with an asyncio.Lock: frames of one session are applied
+    one at a time in arrival order, so a frame that arrives during a keyframe's YOLO call
+    waits for it and is propagated rather than starting another keyframe.
+    """
+
+    def __init__(self, max_sessions: int = TRACKER_MAX_SESSIONS, idle_ttl: float = TRACKER_SESSION_TTL):
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Tuple[float, ObjectTracker, asyncio.Lock]]" = OrderedDict()
+
+    def get(self, session_id: str) -> ObjectTracker:
+        return self._checkout(session_id)[0]
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[ObjectTracker]:
+        """The session's tracker, held exclusively until the frame's result has been applied"""
+        tracker, lock = self._checkout(session_id)
+        async with lock:
+            yield tracker
+
+    def _checkout(self, session_id: str) -> Tuple[ObjectTracker, asyncio.Lock]:
+        now = time.monotonic()
+        with self._lock:
+            while self._sessions:
+                oldest_id, (last_seen, _, _) = next(iter(self._sessions.items()))
+                if now - last_seen <= self.idle_ttl and len(self._sessions) < self.max_sessions:
+                    break
+                del self._sessions[oldest_id]
+
+            _, tracker, lock = self._sessions.pop(session_id, (now, None, None))
+            if tracker is None:
+                tracker, lock = ObjectTracker(), asyncio.Lock()
+            self._sessions[session_id] = (now, tracker, lock)
+            return tracker, lock
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)